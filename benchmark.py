@@ -0,0 +1,355 @@
+#################################################
+# Copyright (c) 2025 dyz131005
+# Licensed under the MIT License
+#################################################
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import queue
+from collections import Counter
+
+from clean_engine import ParallelScanner, DeletionEngine, LinkTracker, ProgressCounters, format_size
+
+def make_tree(base_dir, depth, fanout, files_per_dir):
+    """生成用于测试的目录树"""
+    count = 0
+    stack = [(base_dir, 0)]
+    while stack:
+        path, level = stack.pop()
+        os.makedirs(path, exist_ok=True)
+        for i in range(files_per_dir):
+            with open(os.path.join(path, f"file_{i}.tmp"), "wb") as f:
+                f.write(b"x" * 64)
+        count += 1
+        if level < depth:
+            for i in range(fanout):
+                name = f"cache_{i}" if i % 4 == 0 else f"dir_{i}"
+                stack.append((os.path.join(path, name), level + 1))
+    return count
+
+def bench_walk(root):
+    """基准：单线程 os.walk"""
+    start = time.perf_counter()
+    dirs = 0
+    for _, subdirs, _ in os.walk(root):
+        dirs += 1
+    elapsed = time.perf_counter() - start
+    return dirs, elapsed
+
+def bench_scan(args):
+    """测量并行遍历引擎的目录吞吐量"""
+    temp_dir = None
+    root = args.path
+    if not root:
+        temp_dir = tempfile.mkdtemp(prefix="adsCleanerBench_")
+        root = temp_dir
+        print(f"🔧 生成测试目录树: {root}")
+        count = make_tree(root, args.depth, args.fanout, args.files)
+        print(f"✅ 共 {count} 个目录")
+
+    try:
+        dirs, elapsed = bench_walk(root)
+        print(f"os.walk        : {dirs} 个目录, {elapsed:.3f} 秒, {dirs / elapsed:.0f} 目录/秒")
+        # 与 os.walk 对比时遍历全部目录，命中目录不再深入的收益单独列一行
+        runs = [(workers, False) for workers in args.workers] + [(max(args.workers), True)]
+        for workers, prune in runs:
+            scanner = ParallelScanner(
+                [root],
+                match_dir=lambda entry: "cache" if "cache" in entry.name.lower() else None,
+                max_workers=workers,
+                prune_matches=prune
+            )
+            matches = sum(1 for _ in scanner.scan())
+            stats = scanner.stats
+            label = f"scandir x{workers}" + ("+剪枝" if prune else "")
+            print(f"{label:<15}: {stats.dirs_scanned} 个目录, {stats.elapsed:.3f} 秒, "
+                  f"{stats.dirs_per_second:.0f} 目录/秒, 命中 {matches} 项")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def bench_delete(args):
+    """测量并发删除引擎在不同线程数下的文件吞吐量"""
+    base_dir = args.path or tempfile.gettempdir()
+    for workers in args.workers:
+        root = tempfile.mkdtemp(prefix="adsCleanerBench_", dir=base_dir)
+        try:
+            make_tree(root, args.depth, args.fanout, args.files)
+            engine = DeletionEngine(max_workers=workers)
+            result = engine.clear_directory(root)
+            print(f"workers x{workers:<3}: {result.files_deleted} 个文件, {result.dirs_removed} 个目录, "
+                  f"{result.elapsed:.3f} 秒, {result.files_per_second:.0f} 文件/秒")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+class SyscallCounter:
+    """插桩 os 模块的文件系统函数，统计调用次数
+
+    os.path.exists/isfile/isdir 等内部调用 os.stat/os.lstat，因此同样会被计入；
+    DirEntry.stat() 单独计为 entry.stat（Windows上使用目录项缓存，不产生系统调用）。
+    """
+    FUNCTIONS = ['stat', 'lstat', 'unlink', 'remove', 'rmdir', 'listdir', 'scandir',
+                 'rename', 'chmod', 'open']
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._originals = {}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _wrap(self, name, func):
+        counter = self
+
+        if name == 'scandir':
+            def wrapper(*args, **kwargs):
+                counter._count(name)
+                return _CountingScandir(func(*args, **kwargs), counter)
+        else:
+            def wrapper(*args, **kwargs):
+                counter._count(name)
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        for name in self.FUNCTIONS:
+            func = getattr(os, name)
+            self._originals[name] = func
+            setattr(os, name, self._wrap(name, func))
+        return self
+
+    def __exit__(self, *exc):
+        for name, func in self._originals.items():
+            setattr(os, name, func)
+        self._originals = {}
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+class _CountingScandir:
+    """包装 scandir 迭代器，统计 DirEntry.stat() 调用"""
+    def __init__(self, it, counter):
+        self._it = it
+        self._counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._it.close()
+
+    def __iter__(self):
+        for entry in self._it:
+            yield _CountingEntry(entry, self._counter)
+
+    def close(self):
+        self._it.close()
+
+class _CountingEntry:
+    """包装 DirEntry"""
+    def __init__(self, entry, counter):
+        self._entry = entry
+        self._counter = counter
+
+    def stat(self, *args, **kwargs):
+        self._counter._count('entry.stat')
+        return self._entry.stat(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+def legacy_clear(path):
+    """旧版 _clean_single_dir 的删除流程（用于对比）"""
+    for item in os.listdir(path):
+        item_path = os.path.join(path, item)
+        if os.path.isfile(item_path) or os.path.islink(item_path):
+            os.unlink(item_path)
+            if os.path.exists(item_path):
+                raise Exception("文件删除后仍然存在")
+        elif os.path.isdir(item_path):
+            shutil.rmtree(item_path)
+            if os.path.exists(item_path):
+                raise Exception("目录删除后仍然存在")
+
+def bench_syscalls(args):
+    """统计每删除一个文件产生的文件系统调用次数"""
+    base_dir = args.path or tempfile.gettempdir()
+
+    def run(label, clear):
+        root = tempfile.mkdtemp(prefix="adsCleanerBench_", dir=base_dir)
+        try:
+            make_tree(root, args.depth, args.fanout, args.files)
+            files = sum(len(names) for _, _, names in os.walk(root))
+            with SyscallCounter() as counter:
+                clear(root)
+            details = ", ".join(f"{name}={count}" for name, count in sorted(counter.counts.items()))
+            print(f"{label:<12}: {files} 个文件, 共 {counter.total} 次调用, "
+                  f"{counter.total / max(files, 1):.2f} 次/文件 ({details})")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    run("旧流程", legacy_clear)
+    run("新引擎", lambda root: DeletionEngine(max_workers=args.workers, track_bytes=False).clear_directory(root))
+    run("新引擎+字节统计", lambda root: DeletionEngine(max_workers=args.workers).clear_directory(root))
+    # 与界面相同的配置：统计字节数并按硬链接去重（补查链接信息经 os.lstat，插桩后计入）
+    run("新引擎+字节统计+硬链接", lambda root: DeletionEngine(
+        max_workers=args.workers, links=LinkTracker(resolve=lambda path: os.lstat(path))).clear_directory(root))
+
+def bench_cancel(args):
+    """测量删除过程中取消请求的响应延迟"""
+    base_dir = args.path or tempfile.gettempdir()
+    latencies = []
+    for i in range(args.rounds):
+        root = tempfile.mkdtemp(prefix="adsCleanerBench_", dir=base_dir)
+        try:
+            make_tree(root, args.depth, args.fanout, args.files)
+            canceled = threading.Event()
+            engine = DeletionEngine(max_workers=args.workers, is_canceled=canceled.is_set)
+            results = []
+            thread = threading.Thread(target=lambda: results.append(engine.clear_directory(root)))
+            thread.start()
+            time.sleep(args.delay)
+            cancel_time = time.perf_counter()
+            canceled.set()
+            thread.join()
+            latency = (time.perf_counter() - cancel_time) * 1000
+            latencies.append(latency)
+            result = results[0]
+            print(f"第 {i + 1} 轮: 取消前已删除 {result.files_deleted} 个文件 "
+                  f"({result.bytes_deleted} 字节), 取消延迟 {latency:.1f} ms")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    print(f"最大取消延迟: {max(latencies):.1f} ms, 平均: {sum(latencies) / len(latencies):.1f} ms")
+
+def bench_ui(args):
+    """测量挂接界面时的删除吞吐量：逐项信号 vs 定频采样共享计数
+
+    界面线程用一个普通线程模拟：旧流程中每个文件产生一次进度信号和一次心跳，
+    界面逐个处理；新流程中工作线程只累加计数，界面每秒采样 ui_hz 次。
+    """
+    base_dir = args.path or tempfile.gettempdir()
+
+    def per_item(root):
+        events = queue.Queue()
+        updates = [0]
+        status = [""]  # 模拟状态栏文本
+
+        def ui():
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                status[0] = f"{event[1]}: {event[0]}"
+                updates[0] += 1
+
+        def on_item(path, action):
+            events.put((path, action))
+            events.put(("", "心跳"))
+
+        thread = threading.Thread(target=ui)
+        thread.start()
+        try:
+            result = DeletionEngine(max_workers=args.workers, on_item=on_item).clear_directory(root)
+        finally:
+            events.put(None)
+            thread.join()
+        return result, updates[0]
+
+    def sampled(root):
+        counters = ProgressCounters()
+        stop = threading.Event()
+        updates = [0]
+        status = [""]  # 模拟状态栏文本
+
+        def ui():
+            while not stop.wait(1 / args.ui_hz):
+                snap = counters.snapshot()
+                status[0] = f"已删除 {snap.files} 个文件 ({format_size(snap.bytes)})"
+                updates[0] += 1
+
+        thread = threading.Thread(target=ui)
+        thread.start()
+        try:
+            result = DeletionEngine(max_workers=args.workers, progress=counters).clear_directory(root)
+        finally:
+            stop.set()
+            thread.join()
+        if counters.snapshot().files != result.files_deleted:
+            raise AssertionError("进度计数与删除结果不一致")
+        return result, updates[0]
+
+    for label, run in (("逐项信号", per_item), (f"定频采样 {args.ui_hz}Hz", sampled)):
+        root = tempfile.mkdtemp(prefix="adsCleanerBench_", dir=base_dir)
+        try:
+            make_tree(root, args.depth, args.fanout, args.files)
+            result, updates = run(root)
+            print(f"{label:<12}: {result.files_deleted} 个文件, {result.elapsed:.3f} 秒, "
+                  f"{result.files_per_second:.0f} 文件/秒, 界面更新 {updates} 次")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='adsCleaner 性能测试工具')
+    subparsers = parser.add_subparsers(dest='command')
+
+    scan_parser = subparsers.add_parser('scan', help='测量目录遍历吞吐量')
+    scan_parser.add_argument('path', nargs='?', help='要遍历的目录（默认生成临时目录树）')
+    scan_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='工作线程数')
+    scan_parser.add_argument('--depth', type=int, default=4, help='生成目录树的深度')
+    scan_parser.add_argument('--fanout', type=int, default=6, help='每层子目录数')
+    scan_parser.add_argument('--files', type=int, default=5, help='每个目录的文件数')
+    scan_parser.set_defaults(func=bench_scan)
+
+    delete_parser = subparsers.add_parser('delete', help='测量删除吞吐量（文件/秒 与 线程数）')
+    delete_parser.add_argument('path', nargs='?', help='生成测试文件的目录（默认系统临时目录）')
+    delete_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='工作线程数')
+    delete_parser.add_argument('--depth', type=int, default=3, help='生成目录树的深度')
+    delete_parser.add_argument('--fanout', type=int, default=5, help='每层子目录数')
+    delete_parser.add_argument('--files', type=int, default=100, help='每个目录的文件数')
+    delete_parser.set_defaults(func=bench_delete)
+
+    syscall_parser = subparsers.add_parser('syscalls', help='统计每个被删除文件的系统调用次数')
+    syscall_parser.add_argument('path', nargs='?', help='生成测试文件的目录（默认系统临时目录）')
+    syscall_parser.add_argument('--workers', type=int, default=4, help='工作线程数')
+    syscall_parser.add_argument('--depth', type=int, default=2, help='生成目录树的深度')
+    syscall_parser.add_argument('--fanout', type=int, default=4, help='每层子目录数')
+    syscall_parser.add_argument('--files', type=int, default=50, help='每个目录的文件数')
+    syscall_parser.set_defaults(func=bench_syscalls)
+
+    cancel_parser = subparsers.add_parser('cancel', help='测量取消删除的响应延迟')
+    cancel_parser.add_argument('path', nargs='?', help='生成测试文件的目录（默认系统临时目录）')
+    cancel_parser.add_argument('--workers', type=int, default=8, help='工作线程数')
+    cancel_parser.add_argument('--rounds', type=int, default=3, help='测试轮数')
+    cancel_parser.add_argument('--delay', type=float, default=0.1, help='开始删除后多久发出取消（秒）')
+    cancel_parser.add_argument('--depth', type=int, default=3, help='生成目录树的深度')
+    cancel_parser.add_argument('--fanout', type=int, default=6, help='每层子目录数')
+    cancel_parser.add_argument('--files', type=int, default=200, help='每个目录的文件数')
+    cancel_parser.set_defaults(func=bench_cancel)
+
+    ui_parser = subparsers.add_parser('ui', help='测量挂接界面时的删除吞吐量（逐项信号 vs 定频采样）')
+    ui_parser.add_argument('path', nargs='?', help='生成测试文件的目录（默认系统临时目录）')
+    ui_parser.add_argument('--workers', type=int, default=8, help='工作线程数')
+    ui_parser.add_argument('--ui-hz', type=int, default=15, help='界面采样频率（次/秒）')
+    ui_parser.add_argument('--depth', type=int, default=3, help='生成目录树的深度')
+    ui_parser.add_argument('--fanout', type=int, default=5, help='每层子目录数')
+    ui_parser.add_argument('--files', type=int, default=100, help='每个目录的文件数')
+    ui_parser.set_defaults(func=bench_ui)
+
+    args = parser.parse_args()
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 1
+    args.func(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
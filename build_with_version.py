@@ -163,7 +163,7 @@ def main():
         print("⚠️ 未检测到虚拟环境，但继续执行")
     
     # 检查必要文件
-    required_files = ['pkk.ico', 'newlog.txt', 'main.py', 'eye.ico']
+    required_files = ['pkk.ico', 'newlog.txt', 'main.py', 'clean_engine.py', 'eye.ico']
     for file in required_files:
         if os.path.exists(file):
             print(f"✅ {file} 存在")
@@ -0,0 +1,2713 @@
+#################################################
+# Copyright (c) 2025 dyz131005
+# Licensed under the MIT License
+#################################################
+
+"""adsCleaner 清理引擎 - 与界面无关的文件系统遍历、统计和删除逻辑
+
+只依赖标准库，可以在Linux上针对本地目录运行并测量吞吐量，
+Windows专用的扫描根目录由 main.py 中的配置提供。
+直接运行本文件可以无界面地生成和执行清理计划:
+    python clean_engine.py plan 临时文件=C:\\Windows\\Temp -o plan.json
+    python clean_engine.py run plan.json
+    python clean_engine.py handles handle_output.txt
+"""
+
+import os
+import re
+import sys
+import stat
+import json
+import argparse
+import queue
+import threading
+import time
+import bisect
+import heapq
+import fnmatch
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+# 扫描结果：路径、是否目录、命中的规则、原始DirEntry（复用其类型/stat缓存）
+ScanMatch = namedtuple('ScanMatch', ['path', 'is_dir', 'rule', 'entry'])
+
+# 结果队列结束标记
+_SCAN_DONE = object()
+
+# 系统关键文件（非实验箱模式下永不删除）
+PROTECTED_FILES = {
+    "ntoskrnl.exe", "hal.dll", "winload.exe", "winresume.exe",
+    "bootmgr", "pagefile.sys", "hiberfil.sys", "swapfile.sys"
+}
+
+
+def protection_reason(name, parent, allow_system=False):
+    """判断文件是否受保护，返回跳过原因；可以删除时返回None"""
+    if not allow_system and name.lower() in PROTECTED_FILES:
+        return "系统关键文件"
+    if name == "MEMORY.DMP" and "Windows" in parent:
+        return "系统内存转储文件"
+    return None
+
+
+class CleanRule:
+    """自动扫描规则：目录名关键字或文件通配符，可附加年龄/大小条件"""
+    def __init__(self, name, dir_keyword=None, file_glob=None, min_age_days=0, min_size=0):
+        if not dir_keyword and not file_glob:
+            raise ValueError(f"规则 {name} 必须指定目录关键字或文件通配符")
+        self.name = name
+        self.dir_keyword = dir_keyword
+        self.file_glob = file_glob
+        self.min_age_days = min_age_days
+        self.min_size = min_size
+        self._name_regex = re.compile(
+            re.escape(dir_keyword) if dir_keyword else fnmatch.translate(file_glob),
+            re.IGNORECASE
+        )
+
+    @property
+    def has_predicates(self):
+        return bool(self.min_age_days or self.min_size)
+
+    def matches_name(self, name):
+        """仅检查名称是否命中"""
+        if self.dir_keyword:
+            return self._name_regex.search(name) is not None
+        return self._name_regex.match(name) is not None
+
+    def check_predicates(self, entry, now):
+        """检查年龄/大小条件，stat信息来自DirEntry缓存"""
+        if not self.has_predicates:
+            return True
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            return False
+        if self.min_age_days and now - st.st_mtime < self.min_age_days * 86400:
+            return False
+        if self.min_size and not entry.is_dir(follow_symlinks=False) and st.st_size < self.min_size:
+            return False
+        return True
+
+    def __repr__(self):
+        return f"CleanRule({self.name!r})"
+
+
+class RuleMatcher:
+    """把多条规则编译成一个组合正则，一次遍历同时评估所有规则
+
+    目录规则和文件规则各自合并为一个带命名分组的正则，每个路径只匹配一次，
+    遍历次数与规则数量无关。
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._dir_rules = [rule for rule in self.rules if rule.dir_keyword]
+        self._file_rules = [rule for rule in self.rules if rule.file_glob]
+        self._dir_regex = self._compile(
+            [re.escape(rule.dir_keyword) for rule in self._dir_rules])
+        self._file_regex = self._compile(
+            [fnmatch.translate(rule.file_glob) for rule in self._file_rules])
+        self._now = time.time()
+
+    @staticmethod
+    def _compile(patterns):
+        if not patterns:
+            return None
+        combined = "|".join(f"(?P<r{i}>{pattern})" for i, pattern in enumerate(patterns))
+        return re.compile(combined, re.IGNORECASE)
+
+    @property
+    def has_dir_rules(self):
+        return bool(self._dir_rules)
+
+    @property
+    def has_file_rules(self):
+        return bool(self._file_rules)
+
+    def match_dir(self, entry):
+        """目录名匹配，返回命中的规则"""
+        if self._dir_regex is None:
+            return None
+        return self._resolve(self._dir_regex.search(entry.name), self._dir_rules, entry)
+
+    def match_file(self, entry):
+        """文件名匹配，返回命中的规则"""
+        if self._file_regex is None:
+            return None
+        return self._resolve(self._file_regex.match(entry.name), self._file_rules, entry)
+
+    def _resolve(self, m, rules, entry):
+        if m is None:
+            return None
+        rule = rules[int(m.lastgroup[1:])]
+        if rule.check_predicates(entry, self._now):
+            return rule
+        # 少见情况：首个命中的规则条件不满足，再逐条复核其余规则
+        for other in rules:
+            if other is not rule and other.matches_name(entry.name) \
+                    and other.check_predicates(entry, self._now):
+                return other
+        return None
+
+
+def normalize_path(path):
+    """规范化路径用于比较（绝对路径，Windows下忽略大小写）"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def is_subpath(path, parent):
+    """判断规范化后的 path 是否位于 parent 之内（含相等）"""
+    if path == parent:
+        return True
+    prefix = parent if parent.endswith(os.sep) else parent + os.sep
+    return path.startswith(prefix)
+
+
+def collapse_roots(roots):
+    """去重并合并嵌套的扫描根目录
+
+    返回 (保留的根目录列表, {被合并的根目录: 覆盖它的根目录})，
+    保留的根目录按原始顺序排列。
+    """
+    normalized = []
+    seen = set()
+    for root in roots:
+        norm = normalize_path(root)
+        if norm not in seen:
+            seen.add(norm)
+            normalized.append(norm)
+
+    kept = []
+    collapsed = {}
+    for norm in normalized:
+        parent = next((other for other in normalized
+                       if other != norm and is_subpath(norm, other)), None)
+        if parent is None:
+            kept.append(norm)
+        else:
+            # 找到最外层的覆盖根目录
+            while True:
+                outer = next((other for other in normalized
+                              if other != parent and is_subpath(parent, other)), None)
+                if outer is None:
+                    break
+                parent = outer
+            collapsed[norm] = parent
+    return kept, collapsed
+
+
+# 重解析点属性（符号链接、目录联接等），stat 模块在非 Windows 平台上同样定义了该常量
+_REPARSE_POINT = getattr(stat, 'FILE_ATTRIBUTE_REPARSE_POINT', 0x400)
+
+
+def is_link_entry(entry):
+    """目录项是否为符号链接或目录联接（junction），这类目录不应展开
+
+    DirEntry.is_junction 只在 Python 3.12+ 提供，旧版本中目录联接的
+    is_dir(follow_symlinks=False) 为真，这里改用 Windows 文件属性判断
+    （Windows 上 DirEntry.stat(follow_symlinks=False) 来自目录项缓存，不产生系统调用）。
+    """
+    if entry.is_symlink():
+        return True
+    if os.name != 'nt':
+        return False
+    try:
+        attributes = getattr(entry.stat(follow_symlinks=False), 'st_file_attributes', 0)
+    except OSError:
+        return False
+    return bool(attributes & _REPARSE_POINT)
+
+
+class ScanStats:
+    """扫描统计信息"""
+    def __init__(self):
+        self.dirs_scanned = 0
+        self.files_seen = 0
+        self.matches = 0
+        self.errors = 0
+        self.pruned_subtrees = 0  # 命中后不再深入的子树数量
+        self.collapsed_roots = {}  # 被合并的根目录 -> 覆盖它的根目录
+        self.dirs_by_root = {}  # 被合并的根目录 -> 其下（不含更内层被合并根目录）遍历的目录数
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    @property
+    def elapsed(self):
+        end = self.end_time or time.perf_counter()
+        return max(end - self.start_time, 0.0) if self.start_time else 0.0
+
+    @property
+    def dirs_per_second(self):
+        elapsed = self.elapsed
+        return self.dirs_scanned / elapsed if elapsed > 0 else 0.0
+
+    def saved_by_root(self):
+        """每个被合并的根目录节省的目录遍历次数（原先会被重复遍历的整棵子树）"""
+        saved = {}
+        for root in self.collapsed_roots:
+            saved[root] = sum(count for tag, count in self.dirs_by_root.items()
+                              if is_subpath(tag, root))
+        return saved
+
+    def summary(self):
+        """返回统计摘要文本"""
+        text = (f"扫描 {self.dirs_scanned} 个目录、{self.files_seen} 个文件，"
+                f"命中 {self.matches} 项，错误 {self.errors} 次，"
+                f"用时 {self.elapsed:.2f} 秒 ({self.dirs_per_second:.0f} 目录/秒)")
+        if self.collapsed_roots:
+            saved = self.saved_by_root()
+            details = "，".join(f"{root} 节省 {count} 个目录" for root, count in saved.items())
+            text += f"；合并 {len(self.collapsed_roots)} 个嵌套根目录（{details}）"
+        if self.pruned_subtrees:
+            text += f"；剪枝 {self.pruned_subtrees} 个已命中子树"
+        return text
+
+
+class ParallelScanner:
+    """基于os.scandir的并行目录遍历器
+
+    使用固定数量的工作线程并发遍历目录，匹配项通过 scan() 边找边产出。
+    match_dir / match_file 接收 DirEntry，返回命中的规则（未命中返回None）。
+    嵌套的根目录会被合并，prune_matches 为真时命中的目录不再深入遍历
+    （其内容交给清理流程处理）。
+    """
+    def __init__(self, roots, match_dir=None, match_file=None, max_workers=8,
+                 follow_symlinks=False, is_canceled=None, on_error=None,
+                 max_buffered=1000, prune_matches=True):
+        self.roots = list(roots)
+        self.match_dir = match_dir
+        self.match_file = match_file
+        self.max_workers = max(1, int(max_workers))
+        self.follow_symlinks = follow_symlinks
+        self.is_canceled = is_canceled or (lambda: False)
+        self.on_error = on_error
+        self.prune_matches = prune_matches
+        self.stats = ScanStats()
+        self._collapsed = {}
+
+        self._dirs = queue.Queue()
+        # 结果队列有上限，消费者处理较慢时反压工作线程，保证内存平稳
+        self._results = queue.Queue(maxsize=max_buffered)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stopped = False
+        self._threads = []
+
+    def scan(self):
+        """开始遍历并逐个产出 ScanMatch"""
+        self.stats = ScanStats()
+        self.stats.start_time = time.perf_counter()
+        self._stopped = False
+
+        roots, collapsed = collapse_roots(root for root in self.roots if os.path.isdir(root))
+        self._collapsed = collapsed
+        self.stats.collapsed_roots = dict(collapsed)
+        self.stats.dirs_by_root = {root: 0 for root in collapsed}
+        if not roots:
+            self.stats.end_time = time.perf_counter()
+            return
+
+        with self._lock:
+            self._pending = len(roots)
+        for root in roots:
+            self._dirs.put((root, None))
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"scan-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._results.get()
+                if item is _SCAN_DONE:
+                    break
+                yield item
+        finally:
+            # 消费者提前退出时通知工作线程停止并清空结果队列，避免阻塞
+            self._stopped = True
+            self._drain_results()
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+            self.stats.end_time = time.perf_counter()
+
+    def _worker(self):
+        """工作线程：不断取出目录并遍历"""
+        while True:
+            item = self._dirs.get()
+            if item is None:
+                return
+            try:
+                if not self._stopped and not self.is_canceled():
+                    self._scan_dir(*item)
+            finally:
+                self._finish_dir()
+
+    def _finish_dir(self):
+        """目录处理完毕，全部完成时通知所有线程退出"""
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            for _ in self._threads:
+                self._dirs.put(None)
+            self._put_result(_SCAN_DONE, force=True)
+
+    def _push_dir(self, path, tag):
+        # tag 记录该目录位于哪个被合并的根目录之下，用于统计节省量
+        if self._collapsed:
+            norm = normalize_path(path)
+            if norm in self._collapsed:
+                tag = norm
+        with self._lock:
+            self._pending += 1
+        self._dirs.put((path, tag))
+
+    def _scan_dir(self, path, tag):
+        """遍历单个目录，复用DirEntry中的类型信息"""
+        files = 0
+        matches = 0
+        pruned = 0
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if self._stopped:
+                        break
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=self.follow_symlinks)
+                        if is_dir and not self.follow_symlinks and self._is_link(entry):
+                            is_dir = False
+                    except OSError:
+                        is_dir = False
+
+                    if is_dir:
+                        rule = self.match_dir(entry) if self.match_dir else None
+                        if rule:
+                            matches += 1
+                            self._put_result(ScanMatch(entry.path, True, rule, entry))
+                            if self.prune_matches:
+                                # 命中的目录会被整体清理，无需再深入遍历
+                                pruned += 1
+                                continue
+                        self._push_dir(entry.path, tag)
+                    else:
+                        files += 1
+                        rule = self.match_file(entry) if self.match_file else None
+                        if rule:
+                            matches += 1
+                            self._put_result(ScanMatch(entry.path, False, rule, entry))
+        except OSError as e:
+            with self._lock:
+                self.stats.errors += 1
+            if self.on_error:
+                self.on_error(path, e)
+
+        with self._lock:
+            self.stats.dirs_scanned += 1
+            self.stats.files_seen += files
+            self.stats.matches += matches
+            self.stats.pruned_subtrees += pruned
+            if tag is not None:
+                self.stats.dirs_by_root[tag] += 1
+
+    @staticmethod
+    def _is_link(entry):
+        """符号链接和目录联接（junction）都不跟随，防止循环"""
+        return is_link_entry(entry)
+
+    def _put_result(self, item, force=False):
+        """放入结果队列，消费者已退出时丢弃"""
+        while True:
+            if self._stopped and not force:
+                return
+            try:
+                self._results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if force and self._stopped:
+                    return
+
+    def _drain_results(self):
+        while True:
+            try:
+                self._results.get_nowait()
+            except queue.Empty:
+                return
+
+
+def format_size(size):
+    """把字节数格式化为易读文本"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class SizeTally:
+    """文件数量、逻辑字节数和实际占用的磁盘空间统计（未给出占用时按逻辑大小计）"""
+    __slots__ = ('files', 'bytes', 'allocated')
+
+    def __init__(self, files=0, size=0, allocated=None):
+        self.files = files
+        self.bytes = size
+        self.allocated = size if allocated is None else allocated
+
+    def add(self, size, allocated=None):
+        self.files += 1
+        self.bytes += size
+        self.allocated += size if allocated is None else allocated
+
+    def merge(self, other):
+        self.files += other.files
+        self.bytes += other.bytes
+        self.allocated += other.allocated
+
+    def copy(self):
+        return SizeTally(self.files, self.bytes, self.allocated)
+
+    def __repr__(self):
+        return f"SizeTally(files={self.files}, bytes={self.bytes}, allocated={self.allocated})"
+
+
+class AllocationBackend:
+    """查询文件实际占用的磁盘空间（含簇尾空闲、压缩和稀疏文件的影响）"""
+    def allocated(self, st, path):
+        raise NotImplementedError
+
+
+class PosixAllocation(AllocationBackend):
+    """st_blocks 以512字节为单位"""
+    def allocated(self, st, path):
+        blocks = getattr(st, 'st_blocks', None)
+        return blocks * 512 if blocks is not None else st.st_size
+
+
+# 只有压缩和稀疏文件的实际数据量与逻辑大小不同
+_COMPRESSED_OR_SPARSE = (getattr(stat, 'FILE_ATTRIBUTE_COMPRESSED', 0x800)
+                         | getattr(stat, 'FILE_ATTRIBUTE_SPARSE_FILE', 0x200))
+
+
+class WindowsAllocation(AllocationBackend):
+    """GetCompressedFileSizeW（压缩和稀疏文件的实际数据量）按所在卷的簇大小向上取整
+
+    只对带压缩或稀疏属性的文件查询，其余文件直接按逻辑大小取整；
+    需要在文件删除之前调用；查询失败时按逻辑大小计。
+    """
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        self._dword = wintypes.DWORD
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._get_size = kernel32.GetCompressedFileSizeW
+        self._get_size.argtypes = [wintypes.LPCWSTR, ctypes.POINTER(wintypes.DWORD)]
+        self._get_size.restype = wintypes.DWORD
+        self._get_free_space = kernel32.GetDiskFreeSpaceW
+        self._clusters = {}  # 卷根目录 -> 簇大小
+
+    def cluster_size(self, path):
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        size = self._clusters.get(drive)
+        if size is None:
+            ctypes = self._ctypes
+            sectors, sector_bytes, free, total = (self._dword() for _ in range(4))
+            if self._get_free_space(drive + "\\", ctypes.byref(sectors), ctypes.byref(sector_bytes),
+                                    ctypes.byref(free), ctypes.byref(total)):
+                size = sectors.value * sector_bytes.value
+            else:
+                size = 4096
+            self._clusters[drive] = size
+        return size
+
+    def allocated(self, st, path):
+        cluster = self.cluster_size(path)
+        if not getattr(st, 'st_file_attributes', _COMPRESSED_OR_SPARSE) & _COMPRESSED_OR_SPARSE:
+            return -(-st.st_size // cluster) * cluster
+        ctypes = self._ctypes
+        high = self._dword()
+        ctypes.set_last_error(0)
+        low = self._get_size(path, ctypes.byref(high))
+        if low == 0xFFFFFFFF and ctypes.get_last_error():
+            return st.st_size
+        size = (high.value << 32) | low
+        return -(-size // cluster) * cluster
+
+
+_DEFAULT_ALLOCATION = None
+
+
+def default_allocation():
+    """当前平台的默认实现（进程内共享，簇大小只查询一次）"""
+    global _DEFAULT_ALLOCATION
+    if _DEFAULT_ALLOCATION is None:
+        _DEFAULT_ALLOCATION = WindowsAllocation() if os.name == 'nt' else PosixAllocation()
+    return _DEFAULT_ALLOCATION
+
+
+class LinkTracker:
+    """硬链接感知的字节统计
+
+    同一文件（设备号+inode/文件ID）的多个硬链接只在最后一个链接被删除（或统计到）时
+    计入其字节数，链接数为1的文件直接计入，不占用内存。只登记链接数大于1的文件，
+    键压缩为一个整数，值为尚未遇到的链接数；登记数达到 max_entries 后新出现的多链接
+    文件不再计入字节数（宁可少报，不会多报），数量记在 untracked 中。
+
+    Windows 上 DirEntry.stat() 不填充 st_ino/st_nlink（均为0），此时用 os.lstat 补查。
+    同一个实例可在多个线程和多个分类间共享，跨分类的同一文件也只计一次。
+    """
+    def __init__(self, max_entries=500000, resolve=os.lstat):
+        self.max_entries = max_entries
+        self.resolve = resolve
+        self.untracked = 0
+        self._remaining = {}  # (设备号 << 64 | inode) -> 剩余链接数
+        self._lock = threading.Lock()
+
+    def identify(self, st, path):
+        """补全 st_ino/st_nlink（Windows 目录项），需要在删除之前调用"""
+        if st.st_ino == 0 and self.resolve is not None:
+            try:
+                return self.resolve(path)
+            except OSError:
+                pass
+        return st
+
+    def release(self, st):
+        """登记删除（或统计到）这个链接，返回是否为最后一个链接（此时才真正释放空间）"""
+        if st.st_nlink <= 1:
+            return True
+        key = (st.st_dev << 64) | st.st_ino
+        with self._lock:
+            remaining = self._remaining.get(key)
+            if remaining is None:
+                if len(self._remaining) >= self.max_entries:
+                    self.untracked += 1
+                    return False
+                remaining = st.st_nlink
+            remaining -= 1
+            if remaining > 0:
+                self._remaining[key] = remaining
+                return False
+            self._remaining.pop(key, None)
+        return True
+
+    def __len__(self):
+        return len(self._remaining)
+
+
+def iter_tree_files(path, is_canceled=None, on_error=None):
+    """遍历目录树中的所有文件，产出 (DirEntry, stat)；path为文件时产出其自身"""
+    is_canceled = is_canceled or (lambda: False)
+    try:
+        st = os.stat(path, follow_symlinks=False)
+    except OSError as e:
+        if on_error:
+            on_error(path, e)
+        return
+    if not os.path.isdir(path) or os.path.islink(path):
+        yield None, st
+        return
+
+    stack = [path]
+    while stack:
+        if is_canceled():
+            return
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            # 目录联接不展开，避免统计到联接目标的内容
+                            if not is_link_entry(entry):
+                                stack.append(entry.path)
+                        else:
+                            yield entry, entry.stat(follow_symlinks=False)
+                    except OSError as e:
+                        if on_error:
+                            on_error(entry.path, e)
+        except OSError as e:
+            if on_error:
+                on_error(current, e)
+
+
+def _flatten_paths(paths):
+    """把 路径 / [路径, [路径, ...]] 展开为路径列表"""
+    if isinstance(paths, str):
+        return [paths]
+    flat = []
+    for path in paths:
+        flat.extend(_flatten_paths(path) if isinstance(path, (list, tuple)) else [path])
+    return flat
+
+
+class SizeEstimator:
+    """并行估算各清理分类的可释放空间（只读预览，不删除任何文件）
+
+    categories 为 {分类: [路径, ...]}，各路径在线程池中并行统计，
+    on_progress(分类, 路径, SizeTally, 是否完成) 会定期收到部分统计结果，
+    大目录不会阻塞界面显示。字节数按硬链接去重（见 LinkTracker），
+    track_links 为假时直接累加 st_size；同时统计 allocation（AllocationBackend，
+    默认按当前平台）给出的实际占用空间。
+    """
+    def __init__(self, categories, max_workers=4, is_canceled=None,
+                 on_progress=None, progress_interval=0.2, track_links=True, allocation=None):
+        self.categories = {name: _flatten_paths(paths) for name, paths in categories.items()}
+        self.max_workers = max(1, int(max_workers))
+        self.is_canceled = is_canceled or (lambda: False)
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.track_links = track_links
+        self.allocation = allocation or default_allocation()
+        self.links = None
+        self.results = {}
+
+    def run(self):
+        """统计所有分类，返回 {分类: {路径: SizeTally}}"""
+        # 各分类共享同一个链接表，同一文件出现在多个分类中时只计一次
+        self.links = LinkTracker() if self.track_links else None
+        self.results = {name: {path: SizeTally() for path in paths if path}
+                        for name, paths in self.categories.items()}
+        jobs = [(name, path) for name, paths in self.results.items() for path in paths]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._size_path, name, path) for name, path in jobs]
+            for future in futures:
+                future.result()
+        return self.results
+
+    def totals(self):
+        """各分类的合计"""
+        totals = {}
+        for name, paths in self.results.items():
+            total = SizeTally()
+            for tally in paths.values():
+                total.merge(tally)
+            totals[name] = total
+        return totals
+
+    def _size(self, st, path):
+        """文件计入的 (逻辑字节数, 占用空间)，多个硬链接只在最后一个时计入"""
+        if self.links is not None:
+            st = self.links.identify(st, path)
+            if not self.links.release(st):
+                return 0, 0
+        return st.st_size, self.allocation.allocated(st, path)
+
+    def _size_path(self, category, path):
+        tally = self.results[category][path]
+        last_report = time.perf_counter()
+        for entry, st in iter_tree_files(path, self.is_canceled):
+            tally.add(*self._size(st, entry.path if entry is not None else path))
+            if self.on_progress and tally.files % 256 == 0:
+                now = time.perf_counter()
+                if now - last_report >= self.progress_interval:
+                    last_report = now
+                    self.on_progress(category, path, tally.copy(), False)
+        if self.on_progress:
+            self.on_progress(category, path, tally.copy(), True)
+
+
+# 清理计划条目: [路径, 类型('f'文件/'d'目录), 大小（仅用于执行前校验）, 修改时间(ns), 规则索引,
+#               保护原因或None, 占用空间（已按硬链接去重）, 逻辑大小（已按硬链接去重）]
+PLAN_FILE, PLAN_DIR = 'f', 'd'
+PLAN_VERSION = 3
+
+
+class CleanupPlan:
+    """可序列化的清理计划
+
+    计划阶段记录每个待删除条目的大小、修改时间、命中的规则以及保护判定，
+    执行阶段直接消费计划，只做廉价的重新校验而不再遍历磁盘。
+    """
+    def __init__(self, rules=None, entries=None, allow_system=False, created=None):
+        self.rules = list(rules or [])
+        self.entries = list(entries or [])
+        self.allow_system = allow_system
+        self.created = created or time.time()
+
+    def rule_index(self, name):
+        """获取规则在规则表中的索引，不存在时追加"""
+        try:
+            return self.rules.index(name)
+        except ValueError:
+            self.rules.append(name)
+            return len(self.rules) - 1
+
+    def totals(self):
+        """按规则汇总可删除文件（不含受保护文件）"""
+        totals = {name: SizeTally() for name in self.rules}
+        for path, kind, _, _, rule, reason, allocated, freed in self.entries:
+            if kind == PLAN_FILE and reason is None:
+                totals[self.rules[rule]].add(freed, allocated)
+        return totals
+
+    def protected_count(self):
+        return sum(1 for entry in self.entries if entry[5] is not None)
+
+    def to_dict(self):
+        return {
+            "version": PLAN_VERSION,
+            "created": self.created,
+            "allow_system": self.allow_system,
+            "rules": self.rules,
+            "entries": self.entries
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        version = data.get("version")
+        if version not in (1, 2, PLAN_VERSION):
+            raise ValueError(f"不支持的清理计划版本: {version}")
+        entries = [list(entry) for entry in data["entries"]]
+        if version == 1:
+            # 旧版计划没有记录占用空间，按逻辑大小计
+            for entry in entries:
+                entry.append(entry[2])
+        if version in (1, 2):
+            # 旧版计划没有记录去重后的大小，按原始大小计
+            for entry in entries:
+                entry.append(entry[2])
+        return cls(data["rules"], entries, data.get("allow_system", False), data.get("created"))
+
+    def save(self, file_path):
+        """保存计划到磁盘（紧凑JSON）"""
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, file_path):
+        """从磁盘加载计划"""
+        with open(file_path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def iter_plan_entries(path, allow_system=False, is_canceled=None, on_error=None):
+    """按删除顺序遍历目录内容，产出 (路径, 类型, stat, 保护原因)
+
+    文件先于其所在目录产出（后序），目录本身（path）不会被产出；
+    path 为文件时产出其自身。
+    """
+    is_canceled = is_canceled or (lambda: False)
+    try:
+        st = os.stat(path, follow_symlinks=False)
+    except OSError as e:
+        if on_error:
+            on_error(path, e)
+        return
+    if not os.path.isdir(path) or os.path.islink(path):
+        parent, name = os.path.split(path)
+        yield path, PLAN_FILE, st, protection_reason(name, parent, allow_system)
+        return
+
+    # 栈元素: (目录路径, stat, 是否已展开)
+    stack = [(path, st, False)]
+    while stack:
+        if is_canceled():
+            return
+        current, current_st, expanded = stack.pop()
+        if expanded:
+            if current != path:
+                yield current, PLAN_DIR, current_st, None
+            continue
+        stack.append((current, current_st, True))
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        entry_st = entry.stat(follow_symlinks=False)
+                        if entry.is_dir(follow_symlinks=False):
+                            if is_link_entry(entry):
+                                # 目录联接只删除联接本身，不展开其目标
+                                yield entry.path, PLAN_DIR, entry_st, None
+                            else:
+                                stack.append((entry.path, entry_st, False))
+                        else:
+                            yield (entry.path, PLAN_FILE, entry_st,
+                                   protection_reason(entry.name, current, allow_system))
+                    except OSError as e:
+                        if on_error:
+                            on_error(entry.path, e)
+        except OSError as e:
+            if on_error:
+                on_error(current, e)
+
+
+class PlanBuilder(SizeEstimator):
+    """计划阶段：并行统计各分类的同时生成清理计划"""
+    def __init__(self, categories, allow_system=False, **kwargs):
+        super().__init__(categories, **kwargs)
+        self.allow_system = allow_system
+        self.plan = None
+        self._entries = {}
+
+    def run(self):
+        """生成计划，返回 CleanupPlan"""
+        self.plan = CleanupPlan(allow_system=self.allow_system)
+        self._entries = {}
+        for name in self.categories:
+            self.plan.rule_index(name)
+        super().run()
+        # 按分类/路径顺序合并各线程的结果
+        for name, paths in self.results.items():
+            for path in paths:
+                self.plan.entries.extend(self._entries.get((name, path), []))
+        return self.plan
+
+    def _size_path(self, category, path):
+        rule = self.plan.rule_index(category)
+        entries = self._entries.setdefault((category, path), [])
+        tally = self.results[category][path]
+        last_report = time.perf_counter()
+        for item_path, kind, st, reason in iter_plan_entries(
+                path, self.allow_system, self.is_canceled):
+            deletable = kind == PLAN_FILE and reason is None
+            size, allocated = self._size(st, item_path) if deletable else (0, 0)
+            entries.append([item_path, kind, st.st_size if kind == PLAN_FILE else 0,
+                            st.st_mtime_ns, rule, reason, allocated, size])
+            if not deletable:
+                continue
+            tally.add(size, allocated)
+            if self.on_progress and tally.files % 256 == 0:
+                now = time.perf_counter()
+                if now - last_report >= self.progress_interval:
+                    last_report = now
+                    self.on_progress(category, path, tally.copy(), False)
+        if self.on_progress:
+            self.on_progress(category, path, tally.copy(), True)
+
+
+class PlanResult:
+    """计划执行结果"""
+    def __init__(self):
+        self.deleted = SizeTally()
+        self.freed = {}  # 规则名 -> SizeTally
+        self.dirs_removed = 0
+        self.skipped = {}  # 跳过原因 -> 数量
+        self.failed = []  # (路径, 错误)
+
+    def skip(self, reason):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def summary(self):
+        """返回结果摘要文本"""
+        text = (f"已删除 {self.deleted.files} 个文件 (占用 {format_size(self.deleted.allocated)}, "
+                f"大小 {format_size(self.deleted.bytes)})、"
+                f"{self.dirs_removed} 个目录，失败 {len(self.failed)} 项")
+        if self.skipped:
+            text += "，跳过: " + "，".join(f"{reason} {count} 项"
+                                          for reason, count in self.skipped.items())
+        return text
+
+
+class PlanExecutor:
+    """执行阶段：按计划删除，删除前用lstat校验大小和修改时间"""
+    def __init__(self, plan, is_canceled=None, on_item=None, on_failure=None, progress=None, links=None,
+                 allocation=None):
+        self.plan = plan
+        self.is_canceled = is_canceled or (lambda: False)
+        self.on_item = on_item  # on_item(路径, 动作, 说明)
+        self.on_failure = on_failure  # on_failure(路径, 类型, 异常) 返回真表示已处理
+        self.progress = progress  # ProgressCounters
+        self.links = links  # LinkTracker，释放的字节数按硬链接去重
+        self.allocation = allocation or default_allocation()  # 统计实际占用的磁盘空间
+        self.result = PlanResult()
+
+    def run(self):
+        """执行计划，返回 PlanResult"""
+        self.result = PlanResult()
+        for path, kind, size, mtime_ns, rule, reason, *_ in self.plan.entries:
+            if self.is_canceled():
+                break
+            if reason is not None:
+                self.result.skip(reason)
+                continue
+            if kind == PLAN_FILE:
+                self._delete_file(path, size, mtime_ns, self.plan.rules[rule])
+            else:
+                self._remove_dir(path)
+        return self.result
+
+    def _notify(self, path, action, detail=""):
+        if self.on_item:
+            self.on_item(path, action, detail)
+
+    def _delete_file(self, path, size, mtime_ns, rule_name):
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            self.result.skip("已不存在")
+            return
+        except OSError as e:
+            self._fail(path, PLAN_FILE, e)
+            return
+        if st.st_size != size or st.st_mtime_ns != mtime_ns:
+            # 计划生成后文件被修改，不再删除
+            self.result.skip("计划后已变化")
+            self._notify(path, "跳过", "计划生成后文件已变化")
+            return
+        # 占用空间需要在删除之前查询
+        allocated = self.allocation.allocated(st, path)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            self.result.skip("已不存在")
+            return
+        except OSError as e:
+            self._fail(path, PLAN_FILE, e)
+            return
+        # lstat 的结果包含链接数，只有删除最后一个链接才真正释放空间
+        if self.links is not None and not self.links.release(st):
+            size = allocated = 0
+        self.result.deleted.add(size, allocated)
+        self.result.freed.setdefault(rule_name, SizeTally()).add(size, allocated)
+        if self.progress is not None:
+            self.progress.add_file(size, allocated)
+        self._notify(path, "已删除文件")
+
+    def _remove_dir(self, path):
+        try:
+            os.rmdir(path)
+        except FileNotFoundError:
+            self.result.skip("已不存在")
+            return
+        except OSError as e:
+            if os.path.isdir(path) and os.listdir(path):
+                # 目录中有受保护或新产生的文件
+                self.result.skip("目录非空")
+                return
+            self._fail(path, PLAN_DIR, e)
+            return
+        self.result.dirs_removed += 1
+        if self.progress is not None:
+            self.progress.add_dir()
+        self._notify(path, "已删除目录")
+
+    def _fail(self, path, kind, error):
+        if self.on_failure and self.on_failure(path, kind, error):
+            return
+        self.result.failed.append((path, str(error)))
+        self._notify(path, "失败", str(error))
+
+
+# 是否支持基于目录句柄的相对路径操作（POSIX支持，Windows不支持）
+_DIR_FD_SUPPORTED = (
+    os.open in os.supports_dir_fd and os.unlink in os.supports_dir_fd
+    and os.rmdir in os.supports_dir_fd and os.scandir in os.supports_fd
+)
+_DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_NOFOLLOW', 0)
+
+
+def _clear_readonly(path, dir_fd=None):
+    """清除只读属性（Windows上只读文件/目录无法删除），成功返回True"""
+    if os.name != 'nt':
+        return False
+    try:
+        os.chmod(path, stat.S_IWRITE, dir_fd=dir_fd)
+        return True
+    except OSError:
+        return False
+
+
+def _lexists(path, dir_fd=None):
+    try:
+        os.lstat(path, dir_fd=dir_fd)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+
+
+def unlink_path(path, dir_fd=None):
+    """删除单个文件，只调用一次unlink并依据错误码判断结果
+
+    返回True表示本次删除成功，False表示文件本来就不存在。
+    拒绝访问时先清除只读属性重试一次，仍失败（Windows上删除挂起也会报此错误）
+    才额外检查一次文件是否仍存在。
+    """
+    try:
+        os.unlink(path, dir_fd=dir_fd)
+        return True
+    except FileNotFoundError:
+        return False
+    except PermissionError:
+        if _clear_readonly(path, dir_fd):
+            try:
+                os.unlink(path, dir_fd=dir_fd)
+                return True
+            except FileNotFoundError:
+                return False
+            except PermissionError:
+                pass
+        if not _lexists(path, dir_fd):
+            return False
+        raise
+
+
+def rmdir_path(path, dir_fd=None):
+    """删除空目录，拒绝访问时清除只读属性后重试一次"""
+    try:
+        os.rmdir(path, dir_fd=dir_fd)
+        return True
+    except FileNotFoundError:
+        return False
+    except PermissionError:
+        if not _clear_readonly(path, dir_fd):
+            raise
+        os.rmdir(path, dir_fd=dir_fd)
+        return True
+
+
+class DeleteResult:
+    """删除引擎执行结果"""
+    def __init__(self):
+        self.files_deleted = 0
+        self.bytes_deleted = 0
+        self.allocated_deleted = 0  # 实际释放的磁盘空间
+        self.dirs_removed = 0
+        self.skipped = []  # (路径, 原因)
+        self.failed = []  # (路径, 类型, 异常)
+        self.canceled = False
+        self.elapsed = 0.0
+
+    @property
+    def files_per_second(self):
+        return self.files_deleted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        """返回结果摘要文本"""
+        text = (f"删除 {self.files_deleted} 个文件 (占用 {format_size(self.allocated_deleted)}, "
+                f"大小 {format_size(self.bytes_deleted)})、"
+                f"{self.dirs_removed} 个目录，跳过 {len(self.skipped)} 项，失败 {len(self.failed)} 项，"
+                f"用时 {self.elapsed:.2f} 秒 ({self.files_per_second:.0f} 文件/秒)")
+        if self.canceled:
+            text += "，已取消（重新执行即可从中断处继续）"
+        return text
+
+
+class _DirNode:
+    """删除过程中的目录节点，pending 为尚未完成的子项数量（含列目录占位）"""
+    __slots__ = ('path', 'name', 'parent', 'pending', 'failed', 'fd')
+
+    def __init__(self, path, name, parent):
+        self.path = path
+        self.name = name
+        self.parent = parent
+        self.pending = 1
+        self.failed = False
+        self.fd = None
+
+
+class DeletionEngine:
+    """并发删除引擎（取代 shutil.rmtree）
+
+    调用线程用 os.scandir 遍历目录树，文件交给固定大小的线程池并发删除；
+    目录在其所有子项完成后自底向上删除。受保护文件通过 protect(名称, 父目录)
+    判定并跳过，删除失败逐项记录在结果中，由调用方决定后续处理。
+    每个条目之间都会检查取消标志，只读文件就地清除属性后重试；平台支持时
+    使用基于目录句柄的相对路径操作。删除是幂等的，取消后重新执行即可继续。
+    on_progress(文件数, 字节数) 按 progress_interval 节流回调；传入 progress（ProgressCounters）
+    时工作线程直接累加共享计数，由界面按固定频率采样。
+    on_error(路径, 'f'|'d', 异常) 在删除失败时于工作线程中调用（例如强力删除），
+    返回 True 表示条目已被删除，否则按失败记录。
+    传入 links（LinkTracker）时字节数按硬链接去重，只在删除最后一个链接时计入；
+    统计字节数时同时通过 allocation（AllocationBackend）统计实际占用的磁盘空间。
+    """
+    def __init__(self, max_workers=8, is_canceled=None, protect=None,
+                 on_item=None, on_progress=None, progress_interval=0.2,
+                 track_bytes=True, max_queued=1000, max_open_dirs=64, on_error=None,
+                 progress=None, links=None, allocation=None):
+        self.max_workers = max(1, int(max_workers))
+        self.is_canceled = is_canceled or (lambda: False)
+        self.protect = protect
+        self.on_item = on_item  # on_item(路径, 动作)
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.progress = progress
+        self.links = links
+        self.allocation = allocation or default_allocation()
+        self.progress_interval = progress_interval
+        self.track_bytes = track_bytes
+        self.max_queued = max_queued
+        self.use_dir_fd = _DIR_FD_SUPPORTED
+        self._lock = threading.Lock()
+        self._fd_slots = threading.BoundedSemaphore(max_open_dirs)
+        self._jobs = None
+        self._result = None
+        self._last_progress = 0.0
+
+    def clear_directory(self, path, remove_root=False):
+        """删除目录中的全部内容，remove_root 为真时同时删除目录本身"""
+        self._result = result = DeleteResult()
+        start = time.perf_counter()
+        self._jobs = queue.Queue(maxsize=self.max_queued)
+        threads = [
+            threading.Thread(target=self._worker, name=f"delete-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        root = _DirNode(path, path, None)
+        # 根目录默认保留，标记为失败即可避免被 rmdir
+        root.failed = not remove_root
+        try:
+            self._walk(root)
+        finally:
+            for _ in threads:
+                self._jobs.put(None)
+            for thread in threads:
+                thread.join()
+            result.elapsed = time.perf_counter() - start
+            result.canceled = bool(self.is_canceled())
+            self._report_progress(force=True)
+        return result
+
+    def _open_dir(self, node):
+        """为目录打开句柄供相对路径操作使用，不支持或句柄数达到上限时返回None"""
+        if not self.use_dir_fd or not self._fd_slots.acquire(blocking=False):
+            return None
+        try:
+            parent = node.parent
+            if parent is not None and parent.fd is not None:
+                return os.open(node.name, _DIR_OPEN_FLAGS, dir_fd=parent.fd)
+            return os.open(node.path, _DIR_OPEN_FLAGS)
+        except OSError:
+            self._fd_slots.release()
+            return None
+
+    def _close_dir(self, node):
+        if node.fd is not None:
+            os.close(node.fd)
+            node.fd = None
+            self._fd_slots.release()
+
+    def _walk(self, root):
+        """深度优先遍历，文件入队，子目录压栈"""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if self.is_canceled():
+                node.failed = True
+                self._release(node)
+                continue
+            node.fd = self._open_dir(node)
+            try:
+                with os.scandir(node.path if node.fd is None else node.fd) as it:
+                    for entry in it:
+                        if self.is_canceled():
+                            node.failed = True
+                            break
+                        # 基于句柄遍历时 entry.path 只有名称，这里统一拼出完整路径
+                        path = os.path.join(node.path, entry.name)
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            is_dir = False
+                        if is_dir and not is_link_entry(entry):
+                            child = _DirNode(path, entry.name, node)
+                            self._acquire(node)
+                            stack.append(child)
+                            continue
+                        reason = self.protect(entry.name, node.path) if self.protect else None
+                        if reason:
+                            node.failed = True
+                            with self._lock:
+                                self._result.skipped.append((path, reason))
+                            self._notify(path, f"跳过{reason}")
+                            continue
+                        st = None
+                        if self.track_bytes and not is_dir:
+                            try:
+                                st = entry.stat(follow_symlinks=False)
+                            except OSError:
+                                pass
+                        self._acquire(node)
+                        self._jobs.put((node, entry.name, path, is_dir, st))
+            except OSError as e:
+                node.failed = True
+                self._record_failure(node.path, 'd', e)
+            # 列目录完成，释放占位
+            self._release(node)
+
+    def _worker(self):
+        """工作线程：删除文件（以及目录联接/符号链接）"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            node, name, path, is_link_dir, st = job
+            ok = False
+            # 每个条目之前检查取消标志，取消后只释放计数不再删除
+            if not self.is_canceled():
+                target, dir_fd = (name, node.fd) if node.fd is not None else (path, None)
+                allocated = 0
+                if st is not None:
+                    # 删除之前补全链接信息并查询占用空间，删除后已无法查询；
+                    # 已知只有一个链接的文件不必补全（Windows 目录项的 st_ino/st_nlink 为0，
+                    # 仍需补查），占用空间只对压缩和稀疏文件实际查询（见 WindowsAllocation）
+                    if self.links is not None and not (st.st_ino != 0 and st.st_nlink <= 1):
+                        st = self.links.identify(st, path)
+                    allocated = self.allocation.allocated(st, path)
+                try:
+                    # 类型来自DirEntry，删除时不再重复stat
+                    try:
+                        if is_link_dir:
+                            deleted = rmdir_path(target, dir_fd)
+                        else:
+                            deleted = unlink_path(target, dir_fd)
+                    except FileNotFoundError:
+                        raise
+                    except OSError as e:
+                        if not self._fallback(path, 'f', e):
+                            raise
+                        deleted = True
+                    ok = True
+                    if deleted:
+                        size = st.st_size if st is not None else 0
+                        if st is not None and self.links is not None and not self.links.release(st):
+                            size = allocated = 0
+                        with self._lock:
+                            self._result.files_deleted += 1
+                            self._result.bytes_deleted += size
+                            self._result.allocated_deleted += allocated
+                        if self.progress is not None:
+                            self.progress.add_file(size, allocated)
+                        self._notify(path, "已删除文件")
+                        self._report_progress()
+                except FileNotFoundError:
+                    ok = True
+                except OSError as e:
+                    self._record_failure(path, 'f', e)
+            if not ok:
+                node.failed = True
+            self._release(node)
+
+    def _acquire(self, node):
+        with self._lock:
+            node.pending += 1
+
+    def _release(self, node):
+        """子项完成，目录的全部子项完成后自底向上删除"""
+        while node is not None:
+            with self._lock:
+                node.pending -= 1
+                if node.pending > 0:
+                    return
+            parent = node.parent
+            # 先关闭自身句柄，再通过父目录句柄删除
+            self._close_dir(node)
+            if not node.failed:
+                if parent is not None and parent.fd is not None:
+                    target, dir_fd = node.name, parent.fd
+                else:
+                    target, dir_fd = node.path, None
+                try:
+                    try:
+                        removed = rmdir_path(target, dir_fd)
+                    except FileNotFoundError:
+                        raise
+                    except OSError as e:
+                        if not self._fallback(node.path, 'd', e):
+                            raise
+                        removed = True
+                    if removed:
+                        with self._lock:
+                            self._result.dirs_removed += 1
+                        if self.progress is not None:
+                            self.progress.add_dir()
+                        self._notify(node.path, "已删除目录")
+                except OSError as e:
+                    node.failed = True
+                    self._record_failure(node.path, 'd', e)
+            if node.failed and parent is not None:
+                parent.failed = True
+            node = parent
+
+    def _report_progress(self, force=False):
+        """节流回调进度（文件数和字节数）"""
+        if not self.on_progress:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        self.on_progress(self._result.files_deleted, self._result.bytes_deleted)
+
+    def _fallback(self, path, kind, error):
+        """删除失败时交给 on_error 处理，返回条目是否已被删除"""
+        if self.on_error is None or self.is_canceled():
+            return False
+        try:
+            return bool(self.on_error(path, kind, error))
+        except Exception:
+            return False
+
+    def _record_failure(self, path, kind, error):
+        with self._lock:
+            self._result.failed.append((path, kind, error))
+
+    def _notify(self, path, action):
+        if self.on_item:
+            self.on_item(path, action)
+
+
+class OpenFileIndex:
+    """系统范围的打开文件索引：规范化路径 -> 占用该路径的进程PID集合
+
+    每次运行只遍历一次全部进程建立快照（可在后台线程中进行），之后的占用查询
+    都是字典查找；快照超过 ttl 秒后在后台刷新，也可以调用 invalidate() 按需刷新。
+    除了精确路径查询，还支持查询某个目录下所有被占用的路径。
+    process_iter 可注入，默认使用 psutil.process_iter。
+    """
+    def __init__(self, ttl=30, process_iter=None):
+        self.ttl = ttl
+        self._process_iter = process_iter
+        self._lock = threading.Lock()
+        self._paths = {}  # 规范化路径 -> {pid}
+        self._sorted_paths = []  # 用于目录前缀查询
+        self._names = {}  # pid -> 进程名
+        self._built_at = 0.0
+        self._builder = None
+        self.builds = 0
+
+    def refresh_async(self):
+        """在后台线程中重建快照（已有重建在进行时直接返回）"""
+        with self._lock:
+            if self._builder is not None and self._builder.is_alive():
+                return self._builder
+            self._builder = threading.Thread(target=self.build, name="open-file-index", daemon=True)
+            self._builder.start()
+            return self._builder
+
+    def invalidate(self):
+        """标记快照过期，下次查询时后台刷新"""
+        with self._lock:
+            self._built_at = 0.0
+
+    def build(self):
+        """遍历所有进程，建立路径 -> PID 映射"""
+        process_iter = self._process_iter
+        errors = ()
+        if process_iter is None:
+            import psutil
+            process_iter = psutil.process_iter
+            errors = (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess)
+
+        paths = {}
+        names = {}
+        for proc in process_iter(['pid', 'name', 'exe', 'open_files']):
+            try:
+                info = proc.info
+                pid = info.get('pid', proc.pid)
+                names[pid] = info.get('name') or '未知进程'
+                exe_path = info.get('exe')
+                if exe_path:
+                    paths.setdefault(normalize_path(exe_path), set()).add(pid)
+                for f in info.get('open_files') or ():
+                    paths.setdefault(normalize_path(f.path), set()).add(pid)
+            except errors:
+                continue
+
+        with self._lock:
+            self._paths = paths
+            self._sorted_paths = sorted(paths)
+            self._names = names
+            self._built_at = time.monotonic()
+            self.builds += 1
+
+    def _ensure_fresh(self):
+        """首次查询时等待快照建立，过期后在后台刷新并继续使用旧快照"""
+        with self._lock:
+            built_at = self._built_at
+            builder = self._builder
+        if self.builds == 0:
+            if builder is None:
+                builder = self.refresh_async()
+            builder.join()
+        elif time.monotonic() - built_at > self.ttl:
+            self.refresh_async()
+
+    def pids_for(self, path):
+        """占用指定路径的进程PID集合"""
+        self._ensure_fresh()
+        with self._lock:
+            return set(self._paths.get(normalize_path(path), ()))
+
+    def pids_under(self, dir_path):
+        """目录（含自身）下所有被占用的路径，返回 {路径: {pid}}"""
+        self._ensure_fresh()
+        root = normalize_path(dir_path)
+        prefix = root if root.endswith(os.sep) else root + os.sep
+        with self._lock:
+            result = {}
+            if root in self._paths:
+                result[root] = set(self._paths[root])
+            start = bisect.bisect_left(self._sorted_paths, prefix)
+            for path in self._sorted_paths[start:]:
+                if not path.startswith(prefix):
+                    break
+                result[path] = set(self._paths[path])
+            return result
+
+    def process_name(self, pid):
+        with self._lock:
+            return self._names.get(pid, '未知进程')
+
+    def discard_pids(self, pids):
+        """进程被结束后从索引中移除，无需重新遍历全部进程"""
+        pids = set(pids)
+        if not pids:
+            return
+        with self._lock:
+            for path in list(self._paths):
+                remaining = self._paths[path] - pids
+                if remaining:
+                    self._paths[path] = remaining
+                else:
+                    del self._paths[path]
+            self._sorted_paths = sorted(self._paths)
+            for pid in pids:
+                self._names.pop(pid, None)
+
+
+# 外部命令的执行结果
+CommandResult = namedtuple('CommandResult', ['returncode', 'stdout', 'stderr'])
+
+
+class CommandRunner:
+    """执行外部命令（Windows下不弹出控制台窗口）
+
+    需要调用外部工具的组件都通过它执行命令，离线测试时可以换成返回预置输出的替身。
+    """
+    def run(self, args, timeout=None):
+        import subprocess
+        kwargs = {}
+        if os.name == 'nt':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        result = subprocess.run(args, capture_output=True, text=True, timeout=timeout, **kwargs)
+        return CommandResult(result.returncode, result.stdout, result.stderr)
+
+
+# handle.exe 输出中的一个文件句柄
+HandleEntry = namedtuple('HandleEntry', ['process', 'pid', 'handle', 'path'])
+
+# 例: chrome.exe  pid: 1234  type: File  (可选的用户名)  1A4: C:\Temp\a.tmp
+_HANDLE_LINE = re.compile(
+    r'^\s*(?P<process>\S.*?)\s+pid:\s*(?P<pid>\d+)\s+type:\s*File\s+'
+    r'(?:.*?\s)?(?P<handle>[0-9A-Fa-f]+):\s+(?P<path>.+?)\s*$'
+)
+
+
+def parse_handle_output(text):
+    """解析 handle.exe 的输出，返回 HandleEntry 列表（忽略标题和非文件句柄）"""
+    entries = []
+    for line in text.splitlines():
+        match = _HANDLE_LINE.match(line)
+        if match:
+            entries.append(HandleEntry(
+                match.group('process'),
+                int(match.group('pid')),
+                match.group('handle').upper(),
+                match.group('path')
+            ))
+    return entries
+
+
+class HandleCloser:
+    """在目标进程中直接关闭句柄（DuplicateHandle + DUPLICATE_CLOSE_SOURCE）
+
+    每个进程只打开一次，不需要为每个句柄启动 handle.exe；无法打开的进程
+    （例如受保护进程）返回空列表，由调用方改用 handle.exe 关闭。
+    """
+    PROCESS_DUP_HANDLE = 0x0040
+    DUPLICATE_CLOSE_SOURCE = 0x1
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._open_process = kernel32.OpenProcess
+        self._open_process.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        self._open_process.restype = wintypes.HANDLE
+        self._duplicate = kernel32.DuplicateHandle
+        self._duplicate.argtypes = [wintypes.HANDLE, wintypes.HANDLE, wintypes.HANDLE,
+                                    ctypes.POINTER(wintypes.HANDLE), wintypes.DWORD,
+                                    wintypes.BOOL, wintypes.DWORD]
+        self._duplicate.restype = wintypes.BOOL
+        self._close_handle = kernel32.CloseHandle
+        self._close_handle.argtypes = [wintypes.HANDLE]
+
+    def close(self, pid, handles):
+        """关闭进程 pid 中的句柄（十六进制字符串），返回成功关闭的句柄"""
+        process = self._open_process(self.PROCESS_DUP_HANDLE, False, pid)
+        if not process:
+            return []
+        closed = []
+        try:
+            for handle in handles:
+                if self._duplicate(process, int(handle, 16), None, None, 0, False,
+                                   self.DUPLICATE_CLOSE_SOURCE):
+                    closed.append(handle)
+        finally:
+            self._close_handle(process)
+        return closed
+
+
+class HandleIndex:
+    """按目录（或整个系统）批量查询 handle.exe 得到的句柄索引
+
+    每个目录只运行一次 handle.exe，把输出解析为 规范化路径 -> [HandleEntry]，
+    之后同一目录下的文件都直接查索引；handle.exe 在锁外运行，其他线程查询已索引的
+    范围不必等待。关闭句柄时按进程分批交给 closer（HandleCloser，Windows下默认启用），
+    closer 关闭不了的句柄再逐个用 handle.exe 关闭。
+    scope 为 "run" 时第一次查询就列出系统中全部文件句柄，整个运行期间只调用一次。
+    """
+    def __init__(self, handle_exe, runner=None, scope="directory", timeout=60, closer=None):
+        self.handle_exe = handle_exe
+        self.runner = runner or CommandRunner()
+        self.scope = scope
+        self.timeout = timeout
+        if closer is None and os.name == 'nt':
+            closer = HandleCloser()
+        self.closer = closer
+        self._lock = threading.Lock()
+        self._handles = {}  # 规范化路径 -> [HandleEntry]
+        self._scopes = []  # 已查询过的目录（规范化），None 表示整个系统
+        self._pending = {}  # 正在查询的范围 -> threading.Event
+        self.lookups = 0
+
+    def _covered(self, path):
+        for scope in self._scopes:
+            if scope is None or is_subpath(path, scope):
+                return True
+        return False
+
+    def ensure(self, path):
+        """保证 path 所在范围已经查询过（必要时运行一次 handle.exe）"""
+        norm = normalize_path(path)
+        target = None if self.scope == "run" else norm
+        while True:
+            with self._lock:
+                if self._covered(norm):
+                    return
+                pending = self._pending.get(target)
+                if pending is None:
+                    pending = self._pending[target] = threading.Event()
+                    break
+            # 同一范围正在由其他线程查询，等它完成（失败时由本线程重试）
+            pending.wait()
+
+        try:
+            args = [self.handle_exe, '-accepteula', '-nobanner']
+            if target is not None:
+                args.append(target)
+            result = self.runner.run(args, timeout=self.timeout)
+            if result.returncode != 0 and "No matching handles found" not in result.stdout:
+                raise RuntimeError(result.stderr.strip() or f"handle.exe 返回 {result.returncode}")
+            entries = parse_handle_output(result.stdout)
+            with self._lock:
+                self.lookups += 1
+                for entry in entries:
+                    self._handles.setdefault(normalize_path(entry.path), []).append(entry)
+                self._scopes.append(target)
+        finally:
+            with self._lock:
+                del self._pending[target]
+            pending.set()
+
+    def handles_for(self, path):
+        """占用指定文件的句柄列表"""
+        self.ensure(os.path.dirname(os.path.abspath(path)))
+        with self._lock:
+            return list(self._handles.get(normalize_path(path), ()))
+
+    def handles_under(self, dir_path):
+        """目录（含自身）下所有文件的句柄列表"""
+        self.ensure(dir_path)
+        root = normalize_path(dir_path)
+        with self._lock:
+            return [entry for path, entries in self._handles.items()
+                    if is_subpath(path, root) for entry in entries]
+
+    def _close_with_handle_exe(self, entry):
+        try:
+            result = self.runner.run(
+                [self.handle_exe, '-accepteula', '-nobanner', '-c', entry.handle,
+                 '-p', str(entry.pid), '-y'],
+                timeout=self.timeout
+            )
+        except Exception:
+            return False
+        return result.returncode == 0
+
+    def close(self, entries):
+        """批量关闭句柄，返回成功关闭的 HandleEntry 列表"""
+        by_pid = {}  # pid -> {句柄: HandleEntry}
+        for entry in entries:
+            by_pid.setdefault(entry.pid, {}).setdefault(entry.handle, entry)
+
+        closed = []
+        for pid, handles in by_pid.items():
+            done = set()
+            if self.closer is not None:
+                try:
+                    done.update(self.closer.close(pid, list(handles)))
+                except Exception:
+                    pass
+            for handle, entry in handles.items():
+                if handle in done or self._close_with_handle_exe(entry):
+                    closed.append(entry)
+
+        # 已关闭的句柄从索引中移除
+        closed_keys = {(entry.pid, entry.handle) for entry in closed}
+        with self._lock:
+            for path in list(self._handles):
+                remaining = [e for e in self._handles[path] if (e.pid, e.handle) not in closed_keys]
+                if remaining:
+                    self._handles[path] = remaining
+                else:
+                    del self._handles[path]
+        return closed
+
+
+class TimeBudget:
+    """时间预算：seconds 为 None 或 0 表示不限时
+
+    子预算的截止时间不会晚于父预算（例如单个文件的预算不会超出所在任务和整个运行的预算），
+    用完时 reason() 说明是哪一级预算耗尽。
+    """
+    def __init__(self, seconds=None, label="", parent=None):
+        self.seconds = seconds or None
+        self.label = label
+        self.parent = parent
+        self.started = time.monotonic()
+        self.deadline = self.started + self.seconds if self.seconds else None
+
+    def child(self, seconds=None, label=""):
+        return TimeBudget(seconds, label, parent=self)
+
+    def _limiting(self):
+        """截止时间最早的一级预算"""
+        limiting = self if self.deadline is not None else None
+        budget = self.parent
+        while budget is not None:
+            if budget.deadline is not None and (limiting is None or budget.deadline < limiting.deadline):
+                limiting = budget
+            budget = budget.parent
+        return limiting
+
+    def remaining(self):
+        """剩余秒数，不限时返回 None"""
+        limiting = self._limiting()
+        if limiting is None:
+            return None
+        return max(0.0, limiting.deadline - time.monotonic())
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def timeout(self, default=None):
+        """用于外部命令的超时：不超过剩余预算"""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return remaining if default is None else min(default, remaining)
+
+    def reason(self):
+        limiting = self._limiting()
+        label = limiting.label if limiting else self.label
+        return f"超出{label}时间预算 ({limiting.seconds if limiting else 0:g} 秒)"
+
+
+def format_duration(seconds):
+    """格式化时长，例如 1:05:09 或 3:07"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+# 日志级别
+JOURNAL_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+_JOURNAL_LEVEL_NAMES = {value: name for name, value in JOURNAL_LEVELS.items()}
+# 复用编码器，避免 json.dumps 每次按参数重新创建
+_JOURNAL_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def error_code(error):
+    """异常的错误码（winerror 优先，其次 errno，否则为异常类型名）"""
+    return getattr(error, 'winerror', None) or getattr(error, 'errno', None) or type(error).__name__
+
+
+class RunJournal:
+    """清理过程的结构化日志（JSON Lines，边产生边写入磁盘）
+
+    每行一条记录: {"t": 时间戳, "lvl": 级别, "msg": 消息, "act": 动作, "path": 路径,
+    "bytes": 字节数, "err": 错误码}，没有的字段省略。低于 level 的记录在格式化之前
+    就被丢弃，消息可以用 % 占位符和参数延迟格式化。多线程写入安全。
+    """
+    def __init__(self, path, level="INFO"):
+        self.path = path
+        self.level = JOURNAL_LEVELS.get(level, level)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8', buffering=1 << 16)
+        self.counts = {name: 0 for name in JOURNAL_LEVELS}
+
+    @classmethod
+    def create(cls, directory, level="INFO", keep=10):
+        """在目录中新建以时间命名的日志文件，只保留最近 keep 个"""
+        os.makedirs(directory, exist_ok=True)
+        old = sorted(name for name in os.listdir(directory)
+                     if name.startswith("run-") and name.endswith(".jsonl"))
+        for name in old[:max(0, len(old) - keep + 1)]:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass  # 例如仍在日志查看器中打开，下次再清理
+        name = time.strftime("run-%Y%m%d-%H%M%S") + f"-{os.getpid()}.jsonl"
+        return cls(os.path.join(directory, name), level)
+
+    def enabled(self, level):
+        return JOURNAL_LEVELS.get(level, level) >= self.level
+
+    def write(self, level, msg, *args, action=None, path=None, size=None, error=None):
+        """写入一条记录，级别未启用时返回 None（不做任何格式化）"""
+        value = JOURNAL_LEVELS.get(level, level)
+        if value < self.level:
+            return None
+        if args:
+            msg = msg % args
+        record = {"t": round(time.time(), 3), "lvl": _JOURNAL_LEVEL_NAMES.get(value, str(value)), "msg": msg}
+        if action is not None:
+            record["act"] = action
+        if path is not None:
+            record["path"] = path
+        if size is not None:
+            record["bytes"] = size
+        if error is not None:
+            record["err"] = error_code(error)
+        line = _JOURNAL_ENCODER.encode(record)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self.counts[record["lvl"]] = self.counts.get(record["lvl"], 0) + 1
+        return record
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def iter_journal(path, min_level=None):
+    """逐条读取日志文件中的记录（不整体载入内存）"""
+    threshold = JOURNAL_LEVELS.get(min_level, min_level) or 0
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if JOURNAL_LEVELS.get(record.get("lvl"), 0) >= threshold:
+                yield record
+
+
+@lru_cache(maxsize=4096)
+def _format_timestamp(second):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+
+
+def format_journal_record(record):
+    """把日志记录格式化为界面显示的文本行"""
+    return f"[{_format_timestamp(int(record.get('t', 0)))}] {record.get('msg', '')}"
+
+
+class JournalIndex:
+    """运行日志文件的行偏移索引，供日志查看器按行号随机读取
+
+    只在内存中保存每行的起始偏移和级别（约 9 字节/行），记录内容按需从文件读取；
+    refresh() 增量索引新追加的完整行。filter() 按级别和路径子串筛选出行号列表。
+    """
+    _LEVEL_MARK = b'"lvl":"'
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array('q')
+        self.levels = array('b')
+        self._indexed = 0  # 已索引到的文件位置
+        self._reader = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _level_of(self, line):
+        start = line.find(self._LEVEL_MARK)
+        if start < 0:
+            return 0
+        start += len(self._LEVEL_MARK)
+        end = line.find(b'"', start)
+        return JOURNAL_LEVELS.get(line[start:end].decode('ascii', 'replace'), 0)
+
+    def refresh(self):
+        """索引文件中新追加的完整行，返回新增行数"""
+        added = 0
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._indexed)
+                pos = self._indexed
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # 尚未写完的行下次再索引
+                    self.offsets.append(pos)
+                    self.levels.append(self._level_of(line))
+                    pos += len(line)
+                    added += 1
+                self._indexed = pos
+        except OSError:
+            pass
+        return added
+
+    def record(self, row):
+        """读取第 row 行的记录"""
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        self._reader.seek(self.offsets[row])
+        try:
+            return json.loads(self._reader.readline())
+        except ValueError:
+            return {}
+
+    def filter(self, min_level=None, path_substring=None, start=0):
+        """返回从第 start 行起满足条件的行号列表；路径子串（忽略大小写）同时匹配路径字段和消息"""
+        threshold = JOURNAL_LEVELS.get(min_level, min_level) or 0
+        needle = (path_substring or "").lower()
+        rows = array('q')
+        count = len(self.offsets)
+        if not needle:
+            for row in range(start, count):
+                if self.levels[row] >= threshold:
+                    rows.append(row)
+            return rows
+        if start >= count:
+            return rows
+        # 日志中的字符串经过JSON转义（例如路径中的反斜杠），粗筛时按同样方式转义；
+        # bytes.lower() 只转换ASCII字母，含非ASCII字符时不做粗筛
+        prefilter = _JOURNAL_ENCODER.encode(needle)[1:-1].encode('utf-8') if needle.isascii() else None
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[start])
+            for row in range(start, count):
+                line = f.readline()
+                if self.levels[row] < threshold:
+                    continue
+                # 先在原始字节上粗筛，命中后再解析确认
+                if prefilter is not None and prefilter not in line.lower():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                text = f"{record.get('path', '')}\n{record.get('msg', '')}".lower()
+                if needle in text:
+                    rows.append(row)
+        return rows
+
+    def iter_lines(self, rows=None):
+        """按行号顺序流式输出格式化后的文本行（rows 为 None 时输出全部）"""
+        if rows is None:
+            with open(self.path, 'rb') as f:
+                for _ in range(len(self.offsets)):
+                    line = f.readline()
+                    try:
+                        yield format_journal_record(json.loads(line))
+                    except ValueError:
+                        continue
+            return
+        for row in rows:
+            yield format_journal_record(self.record(row))
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+class MessageBatcher:
+    """把逐条产生的消息攒成批次投递（例如从工作线程发往界面的日志和警告）
+
+    后台线程每 flush_interval 秒或攒满 max_records 条时调用一次 deliver(批次)，
+    产生消息的线程只做一次加锁追加。指定 merge_key 时同一键的消息合并计数，
+    批次中的元素为 (最近一条消息, 条数)，否则为消息本身。
+    """
+    def __init__(self, deliver, flush_interval=0.1, max_records=500, merge_key=None):
+        self.deliver = deliver
+        self.flush_interval = flush_interval
+        self.max_records = max_records
+        self.merge_key = merge_key
+        self._cond = threading.Condition()
+        self._records = []
+        self._merged = {}  # 键 -> [最近一条消息, 条数]
+        self._pending = 0
+        self._closed = False
+        self._thread = None
+
+    def start(self):
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="message-batcher", daemon=True)
+        self._thread.start()
+
+    def add(self, record):
+        with self._cond:
+            if self.merge_key is not None:
+                key = self.merge_key(record)
+                merged = self._merged.get(key)
+                if merged is None:
+                    self._merged[key] = [record, 1]
+                else:
+                    merged[0] = record
+                    merged[1] += 1
+            else:
+                self._records.append(record)
+            self._pending += 1
+            if self._pending >= self.max_records:
+                self._cond.notify()
+
+    def _take(self):
+        if self.merge_key is not None:
+            batch = [tuple(item) for item in self._merged.values()]
+            self._merged = {}
+        else:
+            batch = self._records
+            self._records = []
+        self._pending = 0
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._pending >= self.max_records,
+                                    timeout=self.flush_interval)
+                batch = self._take() if self._pending else None
+                closed = self._closed
+            if batch:
+                self.deliver(batch)
+            if closed:
+                return
+
+    def flush(self):
+        """立即在调用线程中投递已缓存的消息"""
+        with self._cond:
+            batch = self._take() if self._pending else None
+        if batch:
+            self.deliver(batch)
+
+    def close(self):
+        """停止后台线程并投递剩余消息"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+ProgressSnapshot = namedtuple('ProgressSnapshot', ['files', 'bytes', 'dirs', 'tasks_done', 'tasks_total',
+                                                   'current', 'elapsed', 'fraction', 'eta', 'allocated'])
+
+
+class ProgressCounters:
+    """工作线程与界面共享的进度计数（无锁）
+
+    每个写入线程只写自己的计数槽（按线程ID登记，列表 [文件数, 字节数, 目录数, 占用空间]），
+    因此计数不会丢失也不需要加锁；界面线程以固定频率调用 snapshot() 汇总各槽，
+    不再需要逐项发送信号。当前项和任务进度是单次赋值，读到的总是某个完整的值。
+
+    设置了各任务预计的 (文件数, 字节数) 时，总进度按文件数和字节数加权而不是按任务数：
+    已完成的任务以实际完成量计，进行中的任务超出预计时按实际量放大；剩余时间按
+    已测得的 文件/秒 和 字节/秒 分别估算，取较长者。
+    """
+    def __init__(self, tasks_total=0):
+        self.reset(tasks_total)
+
+    def reset(self, tasks_total=0, estimates=None):
+        """开始新的运行；estimates 为每个任务预计的 (文件数, 字节数)，None 表示未知"""
+        self._slots = {}
+        self._start = time.perf_counter()
+        self._task_base = (0, 0, 0)
+        self._weights = None
+        self.tasks_total = tasks_total
+        self.tasks_done = 0
+        self.current = ""
+        if estimates is not None:
+            self.tasks_total = len(estimates)
+            known = [estimate for estimate in estimates if estimate is not None]
+            if known:
+                # 未知的任务按已知任务的平均值计
+                default = (sum(files for files, _ in known) // len(known),
+                           sum(size for _, size in known) // len(known))
+                self._weights = [tuple(estimate) if estimate is not None else default
+                                 for estimate in estimates]
+
+    def _slot(self):
+        ident = threading.get_ident()
+        slot = self._slots.get(ident)
+        if slot is None:
+            # 字典插入在 GIL 下是原子的，每个线程只会插入自己的键
+            slot = self._slots[ident] = [0, 0, 0, 0]
+        return slot
+
+    def add_file(self, size=0, allocated=None):
+        slot = self._slot()
+        slot[0] += 1
+        slot[1] += size
+        slot[3] += size if allocated is None else allocated
+
+    def add_dir(self):
+        self._slot()[2] += 1
+
+    def _totals(self):
+        files = size = dirs = allocated = 0
+        for slot in list(self._slots.values()):
+            files += slot[0]
+            size += slot[1]
+            dirs += slot[2]
+            allocated += slot[3]
+        return files, size, dirs, allocated
+
+    def begin_task(self, label):
+        """开始下一个任务（在任务之间调用，此时没有删除线程在写计数）"""
+        files, size, _, allocated = self._totals()
+        self._task_base = (files, size, allocated)
+        self.current = label
+
+    def end_task(self, skipped=False):
+        """结束当前任务，用实际完成量替换预计值，返回本任务的 (文件数, 字节数, 占用空间)"""
+        if skipped:
+            actual = (0, 0, 0)
+        else:
+            files, size, _, allocated = self._totals()
+            base = self._task_base
+            actual = (files - base[0], size - base[1], allocated - base[2])
+        weights = self._weights
+        if weights is not None and self.tasks_done < len(weights):
+            weights[self.tasks_done] = actual[:2]
+        self.tasks_done += 1
+        return actual
+
+    def _estimate(self, files, size, elapsed):
+        """按任务权重计算 (完成比例, 剩余秒数或None)"""
+        done, total, weights = self.tasks_done, self.tasks_total, self._weights
+        if not weights:
+            fraction = done / total if total else 0.0
+            eta = elapsed * (1 - fraction) / fraction if fraction else None
+            return fraction, eta
+        remaining = [0, 0]
+        if done < len(weights):
+            base = self._task_base
+            current = weights[done]
+            remaining = [max(current[0] - (files - base[0]), 0),
+                         max(current[1] - (size - base[1]), 0)]
+            for weight in weights[done + 1:]:
+                remaining[0] += weight[0]
+                remaining[1] += weight[1]
+        fractions = []
+        etas = []
+        for finished, left in ((files, remaining[0]), (size, remaining[1])):
+            if finished + left:
+                fractions.append(finished / (finished + left))
+            if finished and left:
+                # 剩余量 / 实测吞吐量
+                etas.append(left * elapsed / finished)
+        if not fractions:
+            fraction = done / total if total else 0.0
+        else:
+            fraction = sum(fractions) / len(fractions)
+        if etas:
+            eta = max(etas)
+        else:
+            eta = 0.0 if done >= total else None
+        return fraction, eta
+
+    def snapshot(self):
+        files, size, dirs, allocated = self._totals()
+        elapsed = time.perf_counter() - self._start
+        fraction, eta = self._estimate(files, size, elapsed)
+        return ProgressSnapshot(files, size, dirs, self.tasks_done, self.tasks_total,
+                                self.current, elapsed, fraction, eta, allocated)
+
+
+def format_progress(snapshot):
+    """格式化进度快照，例如 "42% - 已删除 1200 个文件 (释放 35.2 MB), 800 文件/秒, 剩余约 0:12\""""
+    text = f"{int(snapshot.fraction * 100)}%"
+    if snapshot.files or snapshot.dirs:
+        text += f" - 已删除 {snapshot.files} 个文件 (释放 {format_size(snapshot.allocated)})"
+        if snapshot.elapsed > 0:
+            text += f", {snapshot.files / snapshot.elapsed:.0f} 文件/秒"
+    if snapshot.eta is not None and snapshot.fraction < 1:
+        text += f", 剩余约 {format_duration(snapshot.eta)}"
+    return text
+
+
+def _save_json(path, data):
+    """先写临时文件再替换，避免中途失败留下损坏的文件；失败时返回 False"""
+    temp_path = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        return False
+
+
+def _load_json(path):
+    """读取JSON对象，文件不存在或已损坏时返回空字典"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+class ProgressHistory:
+    """按任务记录上次实际清理的 (文件数, 字节数)，作为下次运行的进度权重
+
+    以JSON保存在本地，最多保留 max_entries 个任务，读写失败时当作没有历史数据。
+    """
+    def __init__(self, path, max_entries=500):
+        self.path = path
+        self.max_entries = max_entries
+        self._data = _load_json(path)
+
+    def estimate(self, key):
+        value = self._data.get(key)
+        if isinstance(value, list) and len(value) == 2:
+            return int(value[0]), int(value[1])
+        return None
+
+    def record(self, key, files, size):
+        # 重新插入，字典顺序即最近使用顺序
+        self._data.pop(key, None)
+        self._data[key] = [files, size]
+        while len(self._data) > self.max_entries:
+            del self._data[next(iter(self._data))]
+
+    def save(self):
+        """写入磁盘，失败时返回 False"""
+        return _save_json(self.path, self._data)
+
+
+class FreedSpaceStore:
+    """累计释放空间的本地存储（小JSON文件，启动时直接读取）
+
+    记录清理次数以及总计和各分类累计删除的文件数、字节数和占用空间，
+    数值来自删除时已经取得的文件大小，而不是磁盘可用空间的变化。
+    """
+    def __init__(self, path):
+        self.path = path
+        data = _load_json(path)
+        self.runs = int(data.get("runs", 0))
+        self.total = SizeTally(*data.get("total", (0, 0)))
+        self.categories = {name: SizeTally(*value)
+                           for name, value in data.get("categories", {}).items()}
+
+    def add_run(self, tallies):
+        """累加一次清理的 {分类: SizeTally}"""
+        for name, tally in tallies.items():
+            self.categories.setdefault(name, SizeTally()).merge(tally)
+            self.total.merge(tally)
+        self.runs += 1
+
+    def save(self):
+        return _save_json(self.path, {
+            "runs": self.runs,
+            "total": [self.total.files, self.total.bytes, self.total.allocated],
+            "categories": {name: [tally.files, tally.bytes, tally.allocated]
+                           for name, tally in self.categories.items()}
+        })
+
+
+class RetryQueue:
+    """延迟重试队列（指数退避，有次数上限）
+
+    被占用或暂时删除失败的项放入队列后立即返回，工作线程继续处理其他任务；
+    process_due() 在任务间隙处理已到期的项，drain() 在运行结束时处理剩余的项，
+    最终仍然失败的项才交给调用方做后续处理。
+    process(item) 返回 True 表示处理成功。
+    """
+    def __init__(self, process, base_delay=0.5, max_delay=8.0, max_attempts=5):
+        self.process = process
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._heap = []  # (到期时间, 序号, 项, 已尝试次数)
+        self._counter = 0
+        self.succeeded = 0
+        self.retries = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+    def _delay(self, attempts):
+        return min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+
+    def add(self, item, attempts=1):
+        """加入队列，第 attempts 次重试在退避时间之后进行"""
+        with self._lock:
+            self._counter += 1
+            heapq.heappush(self._heap, (time.monotonic() + self._delay(attempts), self._counter, item, attempts))
+
+    def _pop_due(self, now):
+        with self._lock:
+            if self._heap and self._heap[0][0] <= now:
+                return heapq.heappop(self._heap)
+            return None
+
+    def _run(self, entry, exhausted):
+        _, _, item, attempts = entry
+        # process_due 可能同时在多个删除线程中调用，计数与队列一样在锁内更新
+        with self._lock:
+            self.retries += 1
+        try:
+            ok = self.process(item)
+        except Exception:
+            ok = False
+        if ok:
+            with self._lock:
+                self.succeeded += 1
+        elif attempts >= self.max_attempts:
+            exhausted.append(item)
+        else:
+            self.add(item, attempts + 1)
+
+    def process_due(self):
+        """处理所有已到期的项（不等待），返回达到重试上限的项"""
+        exhausted = []
+        now = time.monotonic()
+        while True:
+            entry = self._pop_due(now)
+            if entry is None:
+                return exhausted
+            self._run(entry, exhausted)
+
+    def drain(self, is_canceled=None, poll_interval=0.1):
+        """处理队列直到为空，返回达到重试上限的项；取消时剩余的项原样返回"""
+        exhausted = []
+        while True:
+            if is_canceled and is_canceled():
+                with self._lock:
+                    exhausted.extend(entry[2] for entry in self._heap)
+                    self._heap = []
+                return exhausted
+            with self._lock:
+                if not self._heap:
+                    return exhausted
+                wait = self._heap[0][0] - time.monotonic()
+            if wait > 0:
+                time.sleep(min(wait, poll_interval))
+                continue
+            exhausted.extend(self.process_due())
+
+    def summary(self):
+        return f"延迟重试: 共重试 {self.retries} 次, 成功 {self.succeeded} 项"
+
+
+class StrategyCache:
+    """强力删除方法的自适应选择（每次运行一个实例）
+
+    以 (错误类别, 所在目录) 为键记住上次成功的删除方法，之后同一目录中遇到同类错误时
+    优先尝试该方法，避免对每个文件重复走完整个失败链。
+    同时记录每个目录最近一次出现的错误类别，使后续文件无需先失败一次就能选出方法。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._winners = {}  # (错误类别, 目录) -> 方法名
+        self._last_error = {}  # 目录 -> 错误类别
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+
+    @staticmethod
+    def classify(exc):
+        """错误类别：异常类型加上 winerror/errno"""
+        code = getattr(exc, 'winerror', None) or getattr(exc, 'errno', None)
+        name = type(exc).__name__
+        return f"{name}:{code}" if code else name
+
+    def last_error(self, parent):
+        with self._lock:
+            return self._last_error.get(parent)
+
+    def note_error(self, parent, error_class):
+        with self._lock:
+            self._last_error[parent] = error_class
+
+    def order(self, error_class, parent, methods):
+        """按缓存调整方法顺序，返回 (方法列表, 缓存中的首选方法或None)"""
+        with self._lock:
+            self.lookups += 1
+            preferred = self._winners.get((error_class, parent))
+        if preferred is None or preferred not in methods:
+            return list(methods), None
+        return [preferred] + [m for m in methods if m != preferred], preferred
+
+    def record(self, error_class, parent, method, preferred=None):
+        """记录成功的方法，并统计首选方法是否命中"""
+        with self._lock:
+            if preferred is not None and method == preferred:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._winners[(error_class, parent)] = method
+
+    def summary(self):
+        with self._lock:
+            total = self.hits + self.misses
+            rate = self.hits / total * 100 if total else 0
+            return (f"删除方法缓存: 命中 {self.hits} 次, 未命中 {self.misses} 次 "
+                    f"(命中率 {rate:.0f}%), 已学习 {len(self._winners)} 个目录/错误组合")
+
+
+class SecurityBackend:
+    """文件安全设置的平台接口
+
+    OwnershipManager 只通过它访问系统安全API；Windows实现见 main.py，
+    在其他平台上可以用记录调用的替身验证缓存逻辑。
+    """
+    def lookup_sid(self, username):
+        """解析账户名，返回SID"""
+        raise NotImplementedError
+
+    def build_descriptor(self, sid, inherit=False):
+        """构造以 sid 为所有者并授予其完全控制权限的安全描述符；
+        inherit 为 True 时权限可被子文件和子目录继承"""
+        raise NotImplementedError
+
+    def apply(self, path, descriptor):
+        """把安全描述符（所有者和DACL）应用到路径"""
+        raise NotImplementedError
+
+
+class OwnershipManager:
+    """获取文件所有权（每次运行一个实例）
+
+    账户SID和两种安全描述符（文件用、目录继承用）只构造一次；
+    目录已经以继承方式获取所有权后，其直接子项不再逐个设置
+    （对父目录拥有完全控制即包含删除子项的权限）。SetFileSecurity 不会把可继承的
+    权限下推到已存在的子项，删除子项的权限也只作用于直接子项，因此更深层的条目
+    仍需各自处理（或对其所在目录再调用 take_directory）。
+    """
+    def __init__(self, backend, username):
+        self.backend = backend
+        self.username = username
+        self._lock = threading.Lock()
+        self._sid = None
+        self._descriptors = {}  # inherit -> 安全描述符
+        self._dirs = set()  # 已获取所有权的目录（规范化）
+        self.applied = 0
+        self.skipped = 0
+
+    def _descriptor(self, inherit):
+        with self._lock:
+            if self._sid is None:
+                self._sid = self.backend.lookup_sid(self.username)
+            descriptor = self._descriptors.get(inherit)
+            if descriptor is None:
+                descriptor = self.backend.build_descriptor(self._sid, inherit=inherit)
+                self._descriptors[inherit] = descriptor
+            return descriptor
+
+    def _count(self, applied):
+        with self._lock:
+            if applied:
+                self.applied += 1
+            else:
+                self.skipped += 1
+
+    def _covered(self, path):
+        """path 的父目录是否已获取所有权（只覆盖直接子项）"""
+        with self._lock:
+            return os.path.dirname(path) in self._dirs
+
+    def take(self, path):
+        """获取文件所有权；所在目录已处理过时直接返回 False"""
+        norm = normalize_path(path)
+        if self._covered(norm):
+            self._count(False)
+            return False
+        self.backend.apply(path, self._descriptor(False))
+        self._count(True)
+        return True
+
+    def take_directory(self, dir_path):
+        """以可继承的权限获取目录的所有权（每个目录只处理一次）
+
+        父目录已处理过也仍然设置：父目录的权限只允许删除本目录，不包含其中的子项。
+        """
+        norm = normalize_path(dir_path)
+        with self._lock:
+            if norm in self._dirs:
+                return False
+        self.backend.apply(dir_path, self._descriptor(True))
+        self._count(True)
+        with self._lock:
+            self._dirs.add(norm)
+        return True
+
+    def summary(self):
+        return f"所有权设置: 实际设置 {self.applied} 次, 因目录已处理跳过 {self.skipped} 次"
+
+
+class ForceDeleteBatch:
+    """强力模式下命令行删除的批处理
+
+    收集需要用 takeown/icacls/del 兜底删除的路径，按所在目录分组、每组最多 shard_size 项
+    生成批处理脚本，每个脚本只启动一次 cmd。脚本把每项的结果按 "OK 序号" / "FAIL 序号"
+    写入结果文件，run() 读取后返回 {路径: 是否已删除}。
+    命令通过 runner 执行，launcher 是加在 cmd 前面的命令（例如以SYSTEM权限运行的psexec）。
+    """
+    def __init__(self, runner=None, launcher=None, shard_size=200, timeout=120, script_dir=None):
+        self.runner = runner or CommandRunner()
+        self.launcher = list(launcher or ())
+        self.shard_size = shard_size
+        self.timeout = timeout
+        self.script_dir = script_dir
+        self._lock = threading.Lock()
+        self._items = {}  # 规范化路径 -> (原始路径, 是否目录)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, path, is_dir=False):
+        with self._lock:
+            self._items.setdefault(normalize_path(path), (path, is_dir))
+
+    def shards(self):
+        """按目录分组并分片，子目录中的项排在父目录之前"""
+        with self._lock:
+            items = list(self._items.values())
+        groups = {}
+        for path, is_dir in items:
+            parent = os.path.dirname(os.path.abspath(path))
+            groups.setdefault(parent, []).append((path, is_dir))
+
+        shards = []
+        for parent in sorted(groups, key=lambda p: p.count(os.sep), reverse=True):
+            # 同一目录中先删文件再删子目录
+            group = sorted(groups[parent], key=lambda item: item[1])
+            for i in range(0, len(group), self.shard_size):
+                shards.append(group[i:i + self.shard_size])
+        return shards
+
+    @staticmethod
+    def render_script(items, result_path):
+        """生成批处理脚本内容，items 为 [(路径, 是否目录)]"""
+        def quote(path):
+            # 批处理中 % 需要转义，路径本身都放在引号内
+            return '"' + path.replace('%', '%%') + '"'
+
+        result = quote(result_path)
+        lines = ['@echo off', 'chcp 65001 >nul', f'type nul > {result}']
+        for i, (path, is_dir) in enumerate(items):
+            target = quote(path)
+            if is_dir:
+                lines.append(f'takeown /f {target} /r /d y >nul 2>&1')
+                lines.append(f'icacls {target} /grant administrators:F /t /c >nul 2>&1')
+                lines.append(f'rd /s /q {target} >nul 2>&1')
+            else:
+                lines.append(f'takeown /f {target} >nul 2>&1')
+                lines.append(f'icacls {target} /grant administrators:F >nul 2>&1')
+                lines.append(f'del /f /q /a {target} >nul 2>&1')
+            # 重定向写在前面，避免 "序号>>" 被当成句柄重定向
+            lines.append(f'if exist {target} (>>{result} echo FAIL {i}) else (>>{result} echo OK {i})')
+        return '\r\n'.join(lines) + '\r\n'
+
+    @staticmethod
+    def parse_results(text, items):
+        """解析结果文件，返回 {路径: 是否已删除}；没有结果的项视为失败"""
+        results = {path: False for path, _ in items}
+        for line in text.splitlines():
+            parts = line.split()
+            if len(parts) != 2 or not parts[1].isdigit():
+                continue
+            index = int(parts[1])
+            if index < len(items):
+                results[items[index][0]] = parts[0] == 'OK'
+        return results
+
+    def run(self, is_canceled=None, budget=None):
+        """执行全部脚本并清空队列，返回 {路径: 是否已删除}
+
+        budget 为 TimeBudget 时，每个脚本的超时不超过剩余预算，预算耗尽后不再启动新脚本。
+        """
+        import tempfile
+        import uuid
+        shards = self.shards()
+        with self._lock:
+            self._items = {}
+
+        script_dir = self.script_dir or tempfile.gettempdir()
+        results = {}
+        for items in shards:
+            if (is_canceled and is_canceled()) or (budget is not None and budget.expired()):
+                results.update((path, False) for path, _ in items)
+                continue
+            name = uuid.uuid4().hex[:8]
+            script_path = os.path.join(script_dir, f"del_{name}.bat")
+            result_path = os.path.join(script_dir, f"del_{name}.txt")
+            try:
+                # 脚本已使用 \r\n 换行，写入时不再转换
+                with open(script_path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(self.render_script(items, result_path))
+                try:
+                    timeout = budget.timeout(self.timeout) if budget is not None else self.timeout
+                    self.runner.run(self.launcher + ['cmd', '/c', script_path], timeout=timeout)
+                except Exception:
+                    pass  # 超时等情况下仍读取已写入的结果
+                try:
+                    with open(result_path, 'r', encoding='utf-8', errors='replace') as f:
+                        text = f.read()
+                except OSError:
+                    text = ''
+                results.update(self.parse_results(text, items))
+            finally:
+                for path in (script_path, result_path):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+        return results
+
+
+def parse_category_args(values):
+    """解析命令行中的 分类=路径 参数"""
+    categories = {}
+    for value in values:
+        if "=" in value:
+            name, path = value.split("=", 1)
+        else:
+            name, path = "自定义路径", value
+        categories.setdefault(name, []).append(path)
+    return categories
+
+
+def cmd_plan(args):
+    """生成清理计划并保存"""
+    builder = PlanBuilder(parse_category_args(args.category),
+                          allow_system=args.allow_system, max_workers=args.workers)
+    plan = builder.run()
+    plan.save(args.output)
+    for name, tally in plan.totals().items():
+        print(f"{name}: {tally.files} 个文件, 占用 {format_size(tally.allocated)} (大小 {format_size(tally.bytes)})")
+    print(f"受保护条目: {plan.protected_count()}")
+    print(f"✅ 清理计划已保存: {args.output} ({len(plan.entries)} 个条目)")
+    return 0
+
+
+def cmd_run(args):
+    """无界面执行已保存的清理计划"""
+    plan = CleanupPlan.load(args.plan)
+    print(f"📋 加载清理计划: {args.plan} ({len(plan.entries)} 个条目)")
+    for name, tally in plan.totals().items():
+        print(f"{name}: {tally.files} 个文件, 占用 {format_size(tally.allocated)} (大小 {format_size(tally.bytes)})")
+    if args.dry_run:
+        return 0
+
+    def on_item(path, action, detail):
+        if args.verbose or action == "失败":
+            print(f"{action}: {path} {detail}".rstrip())
+
+    # 计划中已记录每个文件的大小，进度权重是准确的
+    totals = SizeTally()
+    for tally in plan.totals().values():
+        totals.merge(tally)
+    progress = ProgressCounters()
+    progress.reset(estimates=[(totals.files, totals.bytes)])
+    progress.begin_task(args.plan)
+    stop = threading.Event()
+
+    def report():
+        while not stop.wait(args.progress_interval):
+            print(format_progress(progress.snapshot()), file=sys.stderr, flush=True)
+
+    reporter = None
+    if args.progress_interval > 0:
+        reporter = threading.Thread(target=report, name="progress-reporter", daemon=True)
+        reporter.start()
+    try:
+        result = PlanExecutor(plan, on_item=on_item, progress=progress, links=LinkTracker()).run()
+    finally:
+        stop.set()
+        if reporter is not None:
+            reporter.join()
+    progress.end_task()
+    print(f"✅ {result.summary()} ({format_progress(progress.snapshot())})")
+    return 1 if result.failed else 0
+
+
+def cmd_handles(args):
+    """解析保存下来的 handle.exe 输出（用于离线检查解析结果）"""
+    with open(args.capture, 'r', encoding=args.encoding, errors='replace') as f:
+        entries = parse_handle_output(f.read())
+    for entry in entries:
+        print(f"{entry.pid}\t{entry.handle}\t{entry.process}\t{entry.path}")
+    print(f"共 {len(entries)} 个文件句柄")
+    return 0
+
+
+def main(argv=None):
+    """无界面运行入口"""
+    parser = argparse.ArgumentParser(description='adsCleaner 无界面清理工具')
+    subparsers = parser.add_subparsers(dest='command')
+
+    plan_parser = subparsers.add_parser('plan', help='生成清理计划（不删除文件）')
+    plan_parser.add_argument('category', nargs='+', help='分类=路径，可重复')
+    plan_parser.add_argument('-o', '--output', required=True, help='计划文件保存路径')
+    plan_parser.add_argument('--workers', type=int, default=4, help='并行统计线程数')
+    plan_parser.add_argument('--allow-system', action='store_true', help='不保护系统关键文件')
+    plan_parser.set_defaults(func=cmd_plan)
+
+    run_parser = subparsers.add_parser('run', help='执行已保存的清理计划')
+    run_parser.add_argument('plan', help='计划文件路径')
+    run_parser.add_argument('--dry-run', action='store_true', help='只显示计划内容')
+    run_parser.add_argument('-v', '--verbose', action='store_true', help='显示每个条目')
+    run_parser.add_argument('--progress-interval', type=float, default=1.0,
+                            help='向标准错误输出进度和剩余时间的间隔（秒），0 表示不输出')
+    run_parser.set_defaults(func=cmd_run)
+
+    handles_parser = subparsers.add_parser('handles', help='解析保存的 handle.exe 输出')
+    handles_parser.add_argument('capture', help='handle.exe 输出文件')
+    handles_parser.add_argument('--encoding', default='utf-8', help='输出文件编码')
+    handles_parser.set_defaults(func=cmd_handles)
+
+    args = parser.parse_args(argv)
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 1
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
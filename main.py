@@ -5,6 +5,7 @@
 
 import sys
 import os
+import re
 import ctypes
 import winreg
 import psutil
@@ -26,14 +27,49 @@ import zipfile
 import tempfile
 import queue
 import configparser
+from clean_engine import (
+    ParallelScanner,
+    CleanRule,
+    RuleMatcher,
+    PlanBuilder,
+    PlanExecutor,
+    CleanupPlan,
+    DeletionEngine,
+    OpenFileIndex,
+    HandleIndex,
+    ForceDeleteBatch,
+    StrategyCache,
+    RetryQueue,
+    TimeBudget,
+    MessageBatcher,
+    RunJournal,
+    SecurityBackend,
+    OwnershipManager,
+    JournalIndex,
+    LinkTracker,
+    default_allocation,
+    ProgressCounters,
+    ProgressHistory,
+    SizeEstimator,
+    SizeTally,
+    FreedSpaceStore,
+    JOURNAL_LEVELS,
+    unlink_path,
+    protection_reason,
+    normalize_path,
+    format_journal_record,
+    format_progress,
+    format_size,
+    format_duration
+)
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QLabel, QComboBox, QGroupBox, QCheckBox, QProgressBar, QFileDialog,
     QListWidget, QStackedWidget, QMessageBox, QAction, QSystemTrayIcon, QMenu,
     QDialog, QTextEdit, QScrollArea, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit,
-    QInputDialog, QFormLayout
+    QInputDialog, QFormLayout, QTreeWidget, QTreeWidgetItem, QListView
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QPoint
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QPoint, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QIcon, QTextCursor, QFont, QColor, QMouseEvent, QTextOption
 
 # 强制绕过GIL锁的优化 - 在导入PyQt5之前执行
@@ -101,13 +137,107 @@ TOOLS_CONFIG = {
     }
 }
 
+# 自动扫描配置（扫描根目录支持环境变量，由并行遍历引擎使用）
+AUTO_SCAN_CONFIG = {
+    "roots": [
+        'C:\\',
+        'C:\\Users',
+        'C:\\Program Files',
+        'C:\\Program Files (x86)',
+        'C:\\Windows',
+        '%LOCALAPPDATA%',
+        '%APPDATA%'
+    ],
+    "max_workers": 8  # 并行遍历线程数
+}
+
+# 删除引擎配置
+DELETE_CONFIG = {
+    "max_workers": 8  # 并发删除线程数
+}
+
+# 打开文件索引配置（强力模式下用于查找占用文件的进程）
+OPEN_FILE_INDEX_CONFIG = {
+    "ttl": 30  # 快照有效期（秒），过期后后台刷新
+}
+
+# handle.exe 批量查询配置
+HANDLE_CONFIG = {
+    "scope": "directory"  # "directory": 每个目录查询一次; "run": 每次运行只查询一次全部句柄
+}
+
+# 强力模式命令行批量删除配置
+FORCE_BATCH_CONFIG = {
+    "shard_size": 200,  # 每个批处理脚本最多处理的路径数
+    "timeout": 120  # 每个脚本的超时时间（秒）
+}
+
+# 被占用文件的延迟重试配置（指数退避）
+RETRY_CONFIG = {
+    "base_delay": 0.5,  # 首次重试前等待（秒）
+    "max_delay": 8,  # 单次等待上限（秒）
+    "max_attempts": 5  # 最多重试次数
+}
+
+# 工作线程向界面投递日志和警告的批量配置
+LOG_BATCH_CONFIG = {
+    "flush_interval": 0.1,  # 最长攒批时间（秒）
+    "max_records": 500  # 攒满多少条立即投递
+}
+
+# 运行日志配置（JSON Lines，边清理边写入磁盘）
+JOURNAL_CONFIG = {
+    "dir": os.path.join(os.environ.get('LOCALAPPDATA', tempfile.gettempdir()), 'adsCleaner', 'logs'),
+    "level": "INFO",  # DEBUG 时额外记录强力模式的每个步骤
+    "keep": 10  # 保留最近几次运行的日志
+}
+
+# 进度显示配置：界面按固定频率采样进度计数
+PROGRESS_CONFIG = {
+    "ui_hz": 15,  # 每秒刷新次数（10~20）
+    "precount_seconds": 2,  # 开始前快速预统计各任务文件数和大小的时间上限，0 表示只用历史数据
+    "history": os.path.join(os.environ.get('LOCALAPPDATA', tempfile.gettempdir()), 'adsCleaner',
+                            'progress_history.json')  # 各任务上次实际清理量
+}
+
+# 硬链接去重：同一文件的多个链接只在删除最后一个时计入释放空间
+LINK_CONFIG = {
+    "max_entries": 500000  # 最多同时登记的多链接文件数（约数十MB内存），超出后不再计入
+}
+
+# 累计清理统计（按分类记录实际删除的文件数和字节数）
+FREED_SPACE_CONFIG = {
+    "path": os.path.join(os.environ.get('LOCALAPPDATA', tempfile.gettempdir()), 'adsCleaner', 'freed_space.json')
+}
+
+# 时间预算（秒），None 表示不限时
+BUDGET_CONFIG = {
+    "per_file": 30,  # 强力模式下单个文件
+    "per_task": 900,  # 单个清理任务（分类）
+    "per_run": 3600  # 整个清理过程
+}
+
+# 强力删除方法（按默认尝试顺序），"batch" 为命令行批量删除
+FORCE_DELETE_METHODS = ["rename", "delete_on_close", "disposition", "batch"]
+
+# 不会被结束的系统关键进程
+CRITICAL_PROCESSES = {'system', 'svchost.exe', 'explorer.exe', 'wininit.exe', 'csrss.exe'}
+
+# 自动扫描规则：深度清理选项 -> 规则列表（目录关键字/文件通配符/年龄/大小条件）
+AUTO_SCAN_RULES = {
+    "自动扫描temp文件夹": [CleanRule("temp", dir_keyword="temp")],
+    "自动扫描cache文件夹": [CleanRule("cache", dir_keyword="cache")]
+}
+
 class DiskSpaceWidget(QWidget):
     """磁盘空间显示组件"""
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.space_before_clean = 0
+        # 累计清理统计保存在本地小文件中，启动时直接读取
+        self.store = FreedSpaceStore(FREED_SPACE_CONFIG["path"])
         self.init_ui()
         self.update_disk_space()
+        self.show_saved_space()
         
     def init_ui(self):
         """初始化UI"""
@@ -153,9 +283,9 @@ class DiskSpaceWidget(QWidget):
         
         # 右侧：清理统计
         right_layout = QVBoxLayout()
-        self.cleaned_label = QLabel("本次清理: -- MB")
+        self.cleaned_label = QLabel("本次清理: --")
         self.cleaned_label.setStyleSheet("color: green; font-weight: bold;")
-        self.space_saved_label = QLabel("累计节省: -- MB")
+        self.space_saved_label = QLabel("累计节省: --")
         self.space_saved_label.setStyleSheet("color: blue;")
         right_layout.addWidget(self.cleaned_label)
         right_layout.addWidget(self.space_saved_label)
@@ -191,82 +321,234 @@ class DiskSpaceWidget(QWidget):
             print(f"更新磁盘空间失败: {e}")
             return 0, 0
     
-    def set_space_before_clean(self):
-        """设置清理前的空间基准"""
-        try:
-            usage = psutil.disk_usage('C:')
-            self.space_before_clean = usage.free
-        except Exception as e:
-            print(f"设置清理前空间基准失败: {e}")
-            self.space_before_clean = 0
+    def show_cleaned_space(self, freed):
+        """显示本次清理量并累加到本地存储
+
+        freed 为 {分类: SizeTally}，来自删除时已取得的文件大小，
+        不受其他进程同时写入磁盘的影响。
+        """
+        total = SizeTally()
+        for tally in freed.values():
+            total.merge(tally)
+        # 显示实际释放的磁盘空间（占用空间），逻辑大小见提示
+        self.cleaned_label.setText(f"本次清理: {format_size(total.allocated)}")
+        self.cleaned_label.setToolTip(self.format_categories(freed))
+        
+        self.store.add_run(freed)
+        if not self.store.save():
+            print(f"保存累计清理统计失败: {self.store.path}")
+        self.show_saved_space()
     
-    def update_cleaned_space(self):
-        """更新清理后的空间统计"""
-        if self.space_before_clean == 0:
-            return
-            
-        try:
-            usage = psutil.disk_usage('C:')
-            space_cleaned = usage.free - self.space_before_clean
-            
-            if space_cleaned > 0:
-                space_cleaned_mb = space_cleaned / (1024**2)
-                self.cleaned_label.setText(f"本次清理: {space_cleaned_mb:.1f} MB")
-                
-                # 更新累计节省（简化处理，实际应该持久化存储）
-                current_text = self.space_saved_label.text()
-                if "累计节省" in current_text:
-                    try:
-                        current_saved = float(current_text.split(":")[1].split("MB")[0].strip())
-                        total_saved = current_saved + space_cleaned_mb
-                    except:
-                        total_saved = space_cleaned_mb
-                else:
-                    total_saved = space_cleaned_mb
-                
-                self.space_saved_label.setText(f"累计节省: {total_saved:.1f} MB")
-        except Exception as e:
-            print(f"更新清理空间统计失败: {e}")
+    def show_saved_space(self):
+        """显示累计节省的空间"""
+        self.space_saved_label.setText(f"累计节省: {format_size(self.store.total.allocated)}")
+        self.space_saved_label.setToolTip(
+            f"共清理 {self.store.runs} 次, {self.store.total.files} 个文件\n"
+            + self.format_categories(self.store.categories))
+    
+    @staticmethod
+    def format_categories(tallies):
+        """按占用空间从大到小列出各分类"""
+        ranked = sorted(tallies.items(), key=lambda item: item[1].allocated, reverse=True)
+        return "\n".join(f"{name}: {tally.files} 个文件, 占用 {format_size(tally.allocated)} "
+                         f"(大小 {format_size(tally.bytes)})"
+                         for name, tally in ranked)
+
+class Win32SecurityBackend(SecurityBackend):
+    """基于pywin32的文件安全设置"""
+    def lookup_sid(self, username):
+        sid, domain, _ = win32security.LookupAccountName("", username)
+        return sid
+
+    def build_descriptor(self, sid, inherit=False):
+        sd = win32security.SECURITY_DESCRIPTOR()
+        
+        # 设置新的所有者
+        sd.SetSecurityDescriptorOwner(sid, False)
+        
+        # 设置新的DACL - 使用 GENERIC_ALL 而不是 FILE_ALL_ACCESS
+        # GENERIC_ALL 包括所有标准权限
+        dacl = win32security.ACL()
+        if inherit:
+            dacl.AddAccessAllowedAceEx(
+                win32security.ACL_REVISION,
+                win32security.OBJECT_INHERIT_ACE | win32security.CONTAINER_INHERIT_ACE,
+                win32con.GENERIC_ALL,
+                sid
+            )
+        else:
+            dacl.AddAccessAllowedAce(win32security.ACL_REVISION, win32con.GENERIC_ALL, sid)
+        sd.SetSecurityDescriptorDacl(1, dacl, 0)
+        return sd
+
+    def apply(self, path, descriptor):
+        # 应用新的安全描述符
+        win32security.SetFileSecurity(
+            path,
+            win32security.DACL_SECURITY_INFORMATION | win32security.OWNER_SECURITY_INFORMATION,
+            descriptor
+        )
 
 class CleanerWorker(QThread):
     """清理工作线程，负责在后台执行清理任务"""
-    progress = pyqtSignal(int)
-    message = pyqtSignal(str)
     finished = pyqtSignal()
     error = pyqtSignal(str)
     warning = pyqtSignal(str)
-    detailed_log = pyqtSignal(str)  # 新增详细日志信号
+    journal_grew = pyqtSignal()  # 运行日志有新内容（界面从日志文件读取）
     task_completed = pyqtSignal()  # 新增任务完成信号
-    heartbeat = pyqtSignal()  # 心跳信号
     space_updated = pyqtSignal()  # 空间更新信号
 
-    def __init__(self, tasks, force_mode=False):
+    def __init__(self, tasks, force_mode=False, budgets=None, journal=None, history=None, estimates=None,
+                 categories=None, task_paths=None):
         super().__init__()
         self.tasks = tasks
-        self.is_canceled = False
+        self.canceled = False  # 用户是否请求取消
         self.force_mode = force_mode  # 是否启用强制模式
-        self.log_buffer = []  # 日志缓冲区
+        self.journal = journal  # 运行日志（写入磁盘，不在内存中保留）
         self.tools_installed = False  # 工具是否已安装
         self.current_task_index = 0  # 当前任务索引
         self.last_activity_time = time.time()  # 最后活动时间
         self.task_queue = queue.Queue()  # 任务队列
         self.batch_size = 50  # 每批处理文件数量
-        self.cleaned_size = 0  # 清理的文件大小统计
+        self.cleaned_size = 0  # 本次实际删除的字节数（逻辑大小）
+        # 每个任务所属的分类；为 None 的任务自行调用 record_freed 按分类记录（例如清理计划）
+        self.categories = categories or [None] * len(tasks)
+        # 每个任务要预统计的路径；参数不是路径的任务（回收站、自动扫描等）为空列表
+        self.task_paths = task_paths or [[] for _ in tasks]
+        self.freed = {}  # 分类 -> SizeTally
+        self.freed_lock = threading.Lock()
+        # 整个运行共享一个链接表，跨分类的同一文件也只计一次
+        self.links = LinkTracker(LINK_CONFIG["max_entries"])
+        self.between_tasks = None  # 任务间隙的回调（例如处理到期的延迟重试）
+        self.finalize = None  # 所有任务结束后的回调（取消或预算耗尽时同样执行）
+        self.budgets = budgets or {}
+        self.run_budget = TimeBudget(self.budgets.get("per_run"), "本次运行")
+        self.task_budget = None
+        self.skipped = []  # 因预算耗尽而跳过的项 (路径或任务, 原因)
+        # 进度计数由工作线程无锁累加，界面按固定频率采样，不再逐项发送信号
+        self.progress_counters = ProgressCounters(len(tasks))
+        self.history = history  # ProgressHistory，各任务上次实际清理量
+        self.estimates = estimates  # 调用方给出的各任务预计 (文件数, 字节数)，例如来自清理计划
+        
+        # 日志只写入运行日志，界面按批次收到一次"有新内容"的通知后从文件读取；
+        # 警告先在工作线程中缓存，按批次发往界面，避免每个文件一次跨线程信号
+        self.log_batcher = MessageBatcher(
+            self.deliver_logs,
+            flush_interval=LOG_BATCH_CONFIG["flush_interval"],
+            max_records=LOG_BATCH_CONFIG["max_records"],
+            merge_key=lambda _: None
+        )
+        self.warning_batcher = MessageBatcher(
+            self.deliver_warnings,
+            flush_interval=LOG_BATCH_CONFIG["flush_interval"],
+            max_records=LOG_BATCH_CONFIG["max_records"],
+            merge_key=lambda message: re.split(r'[:：\s]', message, 1)[0]
+        )
         
         # 填充任务队列
         for task in tasks:
             self.task_queue.put(task)
 
-    def log(self, message):
-        """记录日志并发送信号"""
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        self.log_buffer.append(log_entry)
-        self.detailed_log.emit(log_entry)
+    @property
+    def is_canceled(self):
+        """用户取消或当前任务的时间预算已耗尽"""
+        return self.canceled or (self.task_budget is not None and self.task_budget.expired())
+
+    def file_budget(self):
+        """单个文件的时间预算（不超出当前任务和整个运行的预算）"""
+        parent = self.task_budget or self.run_budget
+        return parent.child(self.budgets.get("per_file"), "单个文件")
+
+    def skip(self, item, reason):
+        """记录因预算耗尽而跳过的项"""
+        self.skipped.append((item, reason))
+        self.log(f"已跳过 {item}: {reason}")
+
+    def record_freed(self, category, files, size, allocated):
+        """按分类累加实际删除的文件数、字节数和占用空间（可从任意线程调用）"""
+        with self.freed_lock:
+            self.freed.setdefault(category, SizeTally()).merge(SizeTally(files, size, allocated))
+            self.cleaned_size += size
+
+    def log(self, message, *args, level="INFO", **fields):
+        """记录日志：写入运行日志，按批次通知界面读取
+
+        message 可以带 % 占位符，参数在级别启用时才格式化；fields 为结构化字段
+        （action、path、size、error）。
+        """
         self.last_activity_time = time.time()  # 更新最后活动时间
+        if self.journal is not None and self.journal.write(level, message, *args, **fields) is not None:
+            self.log_batcher.add(None)
+
+    def deliver_logs(self, _batch):
+        """日志文件有新内容：先刷到磁盘，再通知界面读取"""
+        self.journal.flush()
+        self.journal_grew.emit()
+
+    def warn(self, message):
+        """记录警告，同类警告合并计数后按批次发往界面"""
+        self.warning_batcher.add(message)
+
+    def deliver_warnings(self, merged):
+        """投递一批警告：每类只显示最近一条及同类条数"""
+        lines = []
+        for message, count in merged:
+            if count > 1:
+                message = f"{message} (共 {count} 条同类警告)"
+            lines.append(message)
+        self.warning.emit("\n".join(lines))
+
+    @staticmethod
+    def task_key(func, args):
+        """任务在进度历史中的键，参数不是路径的任务不记录"""
+        if args and isinstance(args[0], (str, list)):
+            return f"{func.__name__}:{args[0]}"
+        return None
+
+    def estimate_tasks(self, tasks):
+        """预计每个任务的 (文件数, 字节数)
+
+        在 precount_seconds 内并行快速预统计各任务的路径（task_paths），统计完整的直接采用；
+        超时未完成的取部分统计和历史数据中的较大者，都没有时为 None。
+        """
+        if self.estimates is not None:
+            return list(self.estimates)
+        categories = {index: paths for index, paths in enumerate(self.task_paths[:len(tasks)]) if paths}
+        
+        counted = {}
+        seconds = PROGRESS_CONFIG["precount_seconds"]
+        if categories and seconds:
+            budget = TimeBudget(seconds, "预统计")
+            complete = {}
+            
+            def on_progress(category, path, tally, finished):
+                if finished:
+                    complete[(category, path)] = not budget.expired() and not self.canceled
+            
+            estimator = SizeEstimator(
+                categories,
+                is_canceled=lambda: self.canceled or budget.expired(),
+                on_progress=on_progress
+            )
+            estimator.run()
+            for index, tally in estimator.totals().items():
+                done = all(complete.get((index, path)) for path in estimator.results[index])
+                counted[index] = ((tally.files, tally.bytes), done)
+        
+        estimates = []
+        for index, (func, args) in enumerate(tasks):
+            key = self.task_key(func, args)
+            previous = self.history.estimate(key) if self.history and key else None
+            estimate, done = counted.get(index, (None, False))
+            if not done and previous is not None:
+                estimate = previous if estimate is None else tuple(map(max, estimate, previous))
+            estimates.append(estimate)
+        return estimates
 
     def run(self):
         """执行清理任务 - 确保UI响应性"""
+        self.log_batcher.start()
+        self.warning_batcher.start()
         try:
             # 确保工具已安装
             if not self.install_required_tools():
@@ -274,46 +556,75 @@ class CleanerWorker(QThread):
             
             total = self.task_queue.qsize()
             processed = 0
-            
-            # 心跳定时器 - 增加频率
-            heartbeat_timer = QTimer()
-            heartbeat_timer.setInterval(500)  # 增加到500毫秒
-            heartbeat_timer.timeout.connect(self.check_heartbeat)
-            heartbeat_timer.start()
+            # 按预计的文件数和字节数加权计算总进度
+            estimates = self.estimate_tasks(list(self.task_queue.queue))
+            self.progress_counters.reset(total, estimates)
+            self.run_budget = TimeBudget(self.budgets.get("per_run"), "本次运行")
             
             # 顺序执行任务
-            while not self.task_queue.empty() and not self.is_canceled:
+            while not self.task_queue.empty() and not self.canceled:
                 func, args = self.task_queue.get()
+                label = args[0] if args else func.__name__
+                category = self.categories[processed] if processed < len(self.categories) else None
+                
+                # 整个运行的预算耗尽后跳过剩余任务
+                if self.run_budget.expired():
+                    self.skip(label, f"{self.run_budget.reason()}，任务未执行")
+                    processed += 1
+                    self.progress_counters.end_task(skipped=True)
+                    continue
                 
                 # 执行任务
+                self.progress_counters.begin_task(label)
+                self.task_budget = self.run_budget.child(self.budgets.get("per_task"), "单个任务")
                 try:
                     func(*args)
                 except Exception as e:
                     self.log(f"任务执行失败: {e}")
+                completed = not self.canceled and not self.task_budget.expired()
+                if self.task_budget.expired() and not self.canceled:
+                    self.skip(label, f"{self.task_budget.reason()}，任务未完成")
+                self.task_budget = None
                 
-                # 更新进度
+                # 更新进度（界面定时采样），完整执行的任务记入历史供下次估算
                 processed += 1
-                progress_value = int(processed / total * 100)
-                self.progress.emit(progress_value)
-                self.message.emit(f"清理中: {args[0] if args else func.__name__} ({progress_value}%)")
+                files, size, allocated = self.progress_counters.end_task()
+                if category is not None and files:
+                    self.record_freed(category, files, size, allocated)
+                key = self.task_key(func, args)
+                if self.history and key and completed:
+                    self.history.record(key, files, size)
                 
                 # 定期发送空间更新信号
                 if processed % 5 == 0:  # 每5个任务更新一次空间显示
                     self.space_updated.emit()
                 
-                # 增加UI响应性 - 更频繁地处理事件
-                self.heartbeat.emit()
-                time.sleep(0.005)  # 减少延迟
+                # 利用任务间隙处理已到期的延迟重试，而不是阻塞等待
+                if self.between_tasks:
+                    try:
+                        self.between_tasks()
+                    except Exception as e:
+                        self.log(f"处理延迟重试失败: {e}")
                 
                 # 检查是否被取消
-                if self.is_canceled:
+                if self.canceled:
                     break
             
-            if self.is_canceled:
+            # 收尾工作（例如延迟重试和批量删除）受整个运行的预算约束
+            if self.finalize:
+                self.task_budget = self.run_budget.child(None, "收尾")
+                try:
+                    self.finalize()
+                except Exception as e:
+                    self.log(f"收尾任务执行失败: {e}")
+                self.task_budget = None
+            
+            if self.history:
+                self.history.save()
+            
+            if self.canceled:
                 self.log("清理任务已被用户取消")
-                self.message.emit("清理已取消!")
             else:
-                self.message.emit("清理完成!")
                 self.log("所有清理任务已完成")
                 # 最后更新一次空间显示
                 self.space_updated.emit()
@@ -321,17 +632,11 @@ class CleanerWorker(QThread):
             self.log(f"清理过程中发生异常: {str(e)}")
             self.error.emit(str(e))
         finally:
-            heartbeat_timer.stop()
+            # 投递剩余的日志和警告后再通知完成
+            self.log_batcher.close()
+            self.warning_batcher.close()
             self.finished.emit()
 
-    def check_heartbeat(self):
-        """检查心跳，防止假死"""
-        current_time = time.time()
-        if current_time - self.last_activity_time > 10:  # 10秒无活动
-            self.log("检测到可能假死，发送心跳信号")
-            self.heartbeat.emit()
-            self.last_activity_time = current_time
-
     def execute_task(self, func, args):
         """执行单个任务并发送完成信号"""
         try:
@@ -343,13 +648,9 @@ class CleanerWorker(QThread):
 
     def cancel(self):
         """取消清理任务"""
-        self.is_canceled = True
+        self.canceled = True
         self.log("用户请求取消清理任务")
 
-    def get_logs(self):
-        """获取完整日志"""
-        return "\n".join(self.log_buffer)
-
     def install_required_tools(self):
         """安装必要的工具（handle.exe, psexec.exe）"""
         if not self.force_mode:
@@ -394,7 +695,7 @@ class CleanerWorker(QThread):
                         self.log(f"工具 {config['exe']} 安装成功")
                 else:
                     self.log(f"未找到工具 {tool_name} 的压缩包")
-                    self.warning.emit(
+                    self.warn(
                         "文件可能被篡改或是测试版，请下载完整版\n"
                         f"下载地址: <a href='https://github.com/dyz131005/adsCleaner/releases'>"
                         "https://github.com/dyz131005/adsCleaner/releases</a>"
@@ -453,12 +754,47 @@ class CleanerWorker(QThread):
         
         return None
 
-class ErrorLogDialog(QDialog):
-    """错误日志对话框"""
-    def __init__(self, logs, parent=None):
+class PreviewWorker(QThread):
+    """预览工作线程，统计各分类可释放空间并生成清理计划，不删除任何文件"""
+    partial = pyqtSignal(str, str, int, object, object, bool)  # 分类, 路径, 文件数, 字节数, 占用空间, 是否完成
+    finished = pyqtSignal()
+
+    def __init__(self, categories, max_workers=4):
+        super().__init__()
+        self.categories = categories
+        self.max_workers = max_workers
+        self.is_canceled = False
+        self.plan = None
+
+    def run(self):
+        """并行统计所有分类"""
+        builder = PlanBuilder(
+            self.categories,
+            max_workers=self.max_workers,
+            is_canceled=lambda: self.is_canceled,
+            on_progress=self.on_progress
+        )
+        try:
+            plan = builder.run()
+            if not self.is_canceled:
+                self.plan = plan
+        finally:
+            self.finished.emit()
+
+    def on_progress(self, category, path, tally, done):
+        """转发部分统计结果到界面"""
+        self.partial.emit(category, path, tally.files, tally.bytes, tally.allocated, done)
+
+    def cancel(self):
+        """取消预览"""
+        self.is_canceled = True
+
+class PreviewDialog(QDialog):
+    """清理预览对话框，按分类和路径显示可释放空间"""
+    def __init__(self, categories, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("清理日志")
-        self.setGeometry(300, 300, 800, 600)
+        self.setWindowTitle("清理预览 - 统计中")
+        self.setGeometry(300, 300, 800, 500)
         
         # 去掉问号按钮
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
@@ -468,26 +804,250 @@ class ErrorLogDialog(QDialog):
         
         layout = QVBoxLayout()
         
-        # 创建文本编辑框
-        self.text_edit = QTextEdit()
-        self.text_edit.setReadOnly(False)
-        self.text_edit.setFont(QFont("Consolas", 9))
-        self.text_edit.setPlainText(logs)
-        self.text_edit.setTextInteractionFlags(Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard)
-        self.text_edit.setLineWrapMode(QTextEdit.NoWrap)  # 不自动换行
-        self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)  # 需要时显示水平滚动条
+        self.tree = QTreeWidget()
+        # 占用空间是删除后磁盘实际收回的空间（含簇尾空闲、压缩和稀疏文件的影响）
+        self.tree.setHeaderLabels(["分类 / 路径", "文件数", "占用空间", "大小"])
+        self.tree.setColumnWidth(0, 520)
+        layout.addWidget(self.tree)
         
-        # 添加闪烁光标
-        cursor = self.text_edit.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.text_edit.setTextCursor(cursor)
+        self.total_label = QLabel("合计: 0 个文件, 0 B")
+        self.total_label.setStyleSheet("font-weight: bold;")
+        layout.addWidget(self.total_label)
         
-        # 创建滚动区域
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setWidget(self.text_edit)
+        btn_layout = QHBoxLayout()
+        self.save_plan_btn = QPushButton("保存清理计划")
+        self.save_plan_btn.clicked.connect(self.save_plan)
+        self.save_plan_btn.setEnabled(False)
+        self.run_plan_btn = QPushButton("按此计划清理")
+        self.run_plan_btn.clicked.connect(self.accept)
+        self.run_plan_btn.setEnabled(False)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(self.save_plan_btn)
+        btn_layout.addWidget(self.run_plan_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
         
-        layout.addWidget(scroll_area)
+        # 预先建立分类和路径节点，统计结果到达后直接更新
+        self.category_items = {}
+        self.path_items = {}
+        self.path_totals = {}
+        for category, paths in categories.items():
+            category_item = QTreeWidgetItem([category, "0", "0 B", "0 B"])
+            self.tree.addTopLevelItem(category_item)
+            self.category_items[category] = category_item
+            for path in ([paths] if isinstance(paths, str) else paths):
+                if not path:
+                    continue
+                path_item = QTreeWidgetItem([path, "0", "统计中...", ""])
+                category_item.addChild(path_item)
+                self.path_items[(category, path)] = path_item
+                self.path_totals[(category, path)] = (0, 0, 0)
+            category_item.setExpanded(True)
+        
+        self.worker = PreviewWorker(categories)
+        self.worker.partial.connect(self.update_partial)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.start()
+    
+    def update_partial(self, category, path, files, size, allocated, done):
+        """更新某个路径的部分统计结果"""
+        key = (category, path)
+        if key not in self.path_items:
+            return
+        self.path_totals[key] = (files, size, allocated)
+        suffix = "" if done else " ..."
+        self.path_items[key].setText(1, str(files))
+        self.path_items[key].setText(2, format_size(allocated) + suffix)
+        self.path_items[key].setText(3, format_size(size) + suffix)
+        
+        # 重新汇总分类和总计
+        cat_totals = [t for (c, _), t in self.path_totals.items() if c == category]
+        self.category_items[category].setText(1, str(sum(t[0] for t in cat_totals)))
+        self.category_items[category].setText(2, format_size(sum(t[2] for t in cat_totals)))
+        self.category_items[category].setText(3, format_size(sum(t[1] for t in cat_totals)))
+        
+        total_files = sum(t[0] for t in self.path_totals.values())
+        total_size = sum(t[1] for t in self.path_totals.values())
+        total_allocated = sum(t[2] for t in self.path_totals.values())
+        self.total_label.setText(f"合计: {total_files} 个文件, 占用 {format_size(total_allocated)} "
+                                 f"(大小 {format_size(total_size)})")
+    
+    def on_finished(self):
+        """统计完成"""
+        self.setWindowTitle("清理预览 - 已完成")
+        if self.worker.plan:
+            self.save_plan_btn.setEnabled(True)
+            self.run_plan_btn.setEnabled(True)
+    
+    def get_plan(self):
+        """获取预览生成的清理计划"""
+        return self.worker.plan
+    
+    def save_plan(self):
+        """保存清理计划到文件，可稍后审核或无界面执行"""
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存清理计划", "清理计划.json", "清理计划 (*.json)")
+        if file_path:
+            try:
+                self.worker.plan.save(file_path)
+                QMessageBox.information(self, "成功", f"清理计划已保存到: {file_path}")
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"保存清理计划失败: {str(e)}")
+    
+    def closeEvent(self, event):
+        """关闭时停止统计"""
+        if self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait(2000)
+        event.accept()
+
+class LogListModel(QAbstractListModel):
+    """运行日志的列表模型：只保存行偏移索引，可见行按需从日志文件读取并格式化"""
+    LEVEL_COLORS = {
+        JOURNAL_LEVELS["WARNING"]: QColor(200, 120, 0),
+        JOURNAL_LEVELS["ERROR"]: QColor(200, 0, 0)
+    }
+    CACHE_SIZE = 2000  # 缓存已格式化的行数
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.journal_index = None
+        self.rows = None  # 筛选后的行号，None 表示显示全部
+        self.min_level = None
+        self.path_filter = ""
+        self._cache = {}
+
+    def set_journal(self, path):
+        """切换到新的日志文件"""
+        self.beginResetModel()
+        if self.journal_index is not None:
+            self.journal_index.close()
+        self.journal_index = JournalIndex(path) if path else None
+        if self.journal_index is not None:
+            self.journal_index.refresh()
+        self._cache = {}
+        self.rows = self._filtered_rows(0)
+        self.endResetModel()
+
+    def _filtered_rows(self, start):
+        if self.journal_index is None or (not self.min_level and not self.path_filter):
+            return None
+        return self.journal_index.filter(self.min_level, self.path_filter, start)
+
+    def set_filter(self, min_level=None, path_filter=""):
+        """按级别和路径子串筛选"""
+        self.beginResetModel()
+        self.min_level = min_level
+        self.path_filter = path_filter
+        self._cache = {}
+        self.rows = self._filtered_rows(0)
+        self.endResetModel()
+
+    def refresh(self):
+        """追加日志文件中新写入的行"""
+        if self.journal_index is None:
+            return
+        start = len(self.journal_index)
+        first = self.rowCount()
+        if not self.journal_index.refresh():
+            return
+        if self.rows is None:
+            last = len(self.journal_index) - 1
+            new_rows = None
+        else:
+            new_rows = self._filtered_rows(start)
+            if not new_rows:
+                return
+            last = first + len(new_rows) - 1
+        self.beginInsertRows(QModelIndex(), first, last)
+        if new_rows is not None:
+            self.rows.extend(new_rows)
+        self.endInsertRows()
+
+    def line_number(self, row):
+        return self.rows[row] if self.rows is not None else row
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.journal_index is None:
+            return 0
+        return len(self.rows) if self.rows is not None else len(self.journal_index)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self.journal_index is None:
+            return None
+        line = self.line_number(index.row())
+        if role == Qt.DisplayRole:
+            text = self._cache.get(line)
+            if text is None:
+                if len(self._cache) >= self.CACHE_SIZE:
+                    self._cache = {}
+                text = format_journal_record(self.journal_index.record(line))
+                self._cache[line] = text
+            return text
+        if role == Qt.ForegroundRole:
+            return self.LEVEL_COLORS.get(self.journal_index.levels[line])
+        return None
+
+    def iter_lines(self, rows=None):
+        """流式输出格式化后的行（rows 为视图行号，None 表示当前筛选结果的全部行）"""
+        if self.journal_index is None:
+            return iter(())
+        if rows is None:
+            rows = self.rows
+        else:
+            rows = [self.line_number(row) for row in rows]
+        return self.journal_index.iter_lines(rows)
+
+class ErrorLogDialog(QDialog):
+    """错误日志对话框 - 虚拟化列表，只绘制可见行"""
+    LEVEL_FILTERS = [("全部", None), ("信息及以上", "INFO"), ("警告及以上", "WARNING"), ("仅错误", "ERROR")]
+
+    def __init__(self, journal_path=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("清理日志")
+        self.setGeometry(300, 300, 800, 600)
+        
+        # 去掉问号按钮
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        
+        if parent:
+            self.setWindowIcon(parent.windowIcon())
+        
+        layout = QVBoxLayout()
+        
+        # 筛选条件
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("级别:"))
+        self.level_combo = QComboBox()
+        for text, _ in self.LEVEL_FILTERS:
+            self.level_combo.addItem(text)
+        self.level_combo.currentIndexChanged.connect(self.apply_filter)
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addWidget(QLabel("路径包含:"))
+        self.path_edit = QLineEdit()
+        self.path_edit.setPlaceholderText("输入路径片段筛选")
+        filter_layout.addWidget(self.path_edit)
+        self.count_label = QLabel("")
+        filter_layout.addWidget(self.count_label)
+        layout.addLayout(filter_layout)
+        
+        # 输入停顿后再筛选，避免每个字符都扫描一次日志文件
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(300)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.path_edit.textChanged.connect(self.filter_timer.start)
+        
+        # 日志列表：固定行高，只有可见行会读取和绘制
+        self.model = LogListModel(self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setFont(QFont("Consolas", 9))
+        self.list_view.setSelectionMode(QListView.ExtendedSelection)
+        self.list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)  # 需要时显示水平滚动条
+        layout.addWidget(self.list_view)
         
         # 添加按钮
         btn_layout = QHBoxLayout()
@@ -504,32 +1064,56 @@ class ErrorLogDialog(QDialog):
         
         layout.addLayout(btn_layout)
         self.setLayout(layout)
+        
+        self.set_journal(journal_path)
+    
+    def set_journal(self, journal_path):
+        """显示指定的运行日志文件"""
+        self.model.set_journal(journal_path)
+        self.update_count()
+    
+    def apply_filter(self):
+        """按级别和路径子串筛选"""
+        _, level = self.LEVEL_FILTERS[self.level_combo.currentIndex()]
+        self.model.set_filter(level, self.path_edit.text().strip())
+        self.update_count()
     
-    def append_log(self, log_entry):
-        """追加日志条目"""
-        self.text_edit.append(log_entry)
-        # 滚动到底部
-        cursor = self.text_edit.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.text_edit.setTextCursor(cursor)
+    def update_count(self):
+        total = len(self.model.journal_index) if self.model.journal_index is not None else 0
+        self.count_label.setText(f"{self.model.rowCount()} / {total} 行")
+    
+    def append_log(self):
+        """日志文件有新内容时刷新（已在底部时自动滚动到底部）"""
+        scroll_bar = self.list_view.verticalScrollBar()
+        at_bottom = scroll_bar.value() >= scroll_bar.maximum()
+        self.model.refresh()
+        self.update_count()
+        if at_bottom:
+            self.list_view.scrollToBottom()
+    
+    def selected_rows(self):
+        rows = sorted(index.row() for index in self.list_view.selectionModel().selectedIndexes())
+        return rows or None
     
     def copy_logs(self):
-        """复制日志到剪贴板"""
+        """复制选中的日志（未选中时复制当前筛选结果）到剪贴板"""
         clipboard = QApplication.clipboard()
-        clipboard.setText(self.text_edit.toPlainText())
+        clipboard.setText("\n".join(self.model.iter_lines(self.selected_rows())))
         QMessageBox.information(self, "成功", "日志已复制到剪贴板")
     
     def save_logs(self):
-        """保存日志到文件"""
+        """保存当前筛选结果到文件（从日志文件流式写出）"""
         file_path, _ = QFileDialog.getSaveFileName(self, "保存日志", "清理日志.txt", "文本文件 (*.txt)")
         if file_path:
             try:
                 with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(self.text_edit.toPlainText())
+                    for line in self.model.iter_lines():
+                        f.write(line + "\n")
                 QMessageBox.information(self, "成功", f"日志已保存到: {file_path}")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"保存日志失败: {str(e)}")
 
+
 class UpdateLogDialog(QDialog):
     """更新日志对话框"""
     def __init__(self, parent=None):
@@ -834,6 +1418,13 @@ class DiskCleanerApp(QMainWindow):
         self.disk_usage = None
         self.log_dialog = None
         self.worker = None
+        self.open_file_index = None
+        self.handle_index = None
+        self.force_delete_batch = None
+        self.strategy_cache = None
+        self.retry_queue = None
+        self.ownership = None
+        self.force_state_lock = threading.Lock()  # 删除线程可能同时首次获取上面这些对象
         self.failed_files = []
         
         self.setWindowTitle("adsC盘清理大师")
@@ -860,6 +1451,14 @@ class DiskCleanerApp(QMainWindow):
         self.disk_usage_timer.timeout.connect(self.update_disk_usage)
         self.disk_usage_timer.start(5000)  # 每5秒更新一次
         
+        # 清理过程中显示剩余时间预算
+        self.budget_timer = QTimer()
+        self.budget_timer.timeout.connect(self.update_budget_display)
+        
+        # 清理过程中按固定频率采样进度计数
+        self.progress_timer = QTimer()
+        self.progress_timer.timeout.connect(self.update_progress_display)
+        
         # 重置强力模式状态，不保存配置
         self.force_mode_activated = False
         self.developer_force_mode = False
@@ -904,14 +1503,23 @@ class DiskCleanerApp(QMainWindow):
         
         # 公共组件
         self.progress_bar = QProgressBar()
+        self.budget_label = QLabel("")
         self.status_label = QLabel("就绪")
         self.status_label.setStyleSheet("font-weight: bold;")
+        # 警告单独显示，不会被按固定频率刷新的进度覆盖
+        self.warning_label = QLabel("")
+        self.warning_label.setStyleSheet("color: #d35400;")
+        self.warning_label.setWordWrap(True)
         
         # 添加到主布局
         main_layout.addLayout(mode_layout)
         main_layout.addWidget(self.stacked_widget)
-        main_layout.addWidget(self.progress_bar)
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.budget_label)
+        main_layout.addLayout(progress_layout)
         main_layout.addWidget(self.status_label)
+        main_layout.addWidget(self.warning_label)
         
         # 操作按钮
         btn_layout = QHBoxLayout()
@@ -925,6 +1533,10 @@ class DiskCleanerApp(QMainWindow):
         # 添加创建系统还原点按钮
         self.restore_point_btn = QPushButton("创建系统还原点")
         self.restore_point_btn.clicked.connect(self.create_system_restore_point)
+        # 预览可释放空间（不删除文件）
+        self.preview_btn = QPushButton("预览可释放空间")
+        self.preview_btn.clicked.connect(self.show_preview)
+        btn_layout.addWidget(self.preview_btn)
         btn_layout.addWidget(self.clean_btn)
         btn_layout.addWidget(self.cancel_btn)
         btn_layout.addWidget(self.uninstall_btn)
@@ -1160,6 +1772,10 @@ class DiskCleanerApp(QMainWindow):
         restore_action = QAction('创建系统还原点', self)
         restore_action.triggered.connect(self.create_system_restore_point)
         tools_menu.addAction(restore_action)
+        # 执行已保存的清理计划
+        plan_action = QAction('执行清理计划...', self)
+        plan_action.triggered.connect(self.load_and_run_plan)
+        tools_menu.addAction(plan_action)
         
         help_menu = menubar.addMenu('帮助')
         
@@ -1253,10 +1869,16 @@ class DiskCleanerApp(QMainWindow):
         # 重置失败文件列表
         self.failed_files = []
         
-        # 设置清理前的空间基准
-        self.disk_space_widget.set_space_before_clean()
-        
         tasks = []
+        categories = []  # 与 tasks 一一对应的分类名，用于统计各分类的清理量
+        task_paths = []  # 与 tasks 一一对应的待清理路径，用于开始前预统计
+        
+        def add_task(category, func, args, paths=()):
+            tasks.append((func, args))
+            categories.append(category)
+            # 部分分类对应多个路径（例如 Office 缓存），预统计时展开
+            task_paths.append([item for path in paths
+                               for item in (path if isinstance(path, list) else [path])])
         mode = self.mode_combo.currentIndex()
         
         # 检查是否激活了开发者强力模式
@@ -1269,12 +1891,12 @@ class DiskCleanerApp(QMainWindow):
                     paths = self.get_normal_path(text)
                     if text == "回收站":
                         # 特殊处理回收站
-                        tasks.append((self.empty_recycle_bin, []))
+                        add_task(text, self.empty_recycle_bin, [])
                     elif isinstance(paths, list):
                         for path in paths:
-                            tasks.append((self.clean_directory, [path, force_mode]))
+                            add_task(text, self.clean_directory, [path, force_mode], [path])
                     else:
-                        tasks.append((self.clean_directory, [path, force_mode]))
+                        add_task(text, self.clean_directory, [path, force_mode], [path])
         
         # 高级模式任务
         elif mode == 1:
@@ -1282,43 +1904,47 @@ class DiskCleanerApp(QMainWindow):
             if force_mode and self.path_list.count() == 1:
                 path = self.path_list.item(0).text()
                 # 修复：传递正确的参数
-                tasks.append((self.force_clean_directory, [path]))
+                add_task("自定义路径", self.force_clean_directory, [path], [path])
             else:
                 for i, (text, _) in enumerate(self.advanced_checks):
                     if self.advanced_checkboxes[i].isChecked():
                         path = self.get_advanced_path(text)
-                        tasks.append((self.clean_directory, [path, force_mode]))
+                        add_task(text, self.clean_directory, [path, force_mode], [path])
                 
                 # 添加自定义路径
                 for i in range(self.path_list.count()):
                     path = self.path_list.item(i).text()
-                    tasks.append((self.clean_directory, [path, force_mode]))
+                    add_task("自定义路径", self.clean_directory, [path, force_mode], [path])
         
         # 深度清理模式任务
         elif mode == 2:
             force_mode = hasattr(self, 'force_mode_check') and self.force_mode_check.isChecked()
+            scan_options = []
             for i, (text, _) in enumerate(self.deep_clean_checks):
                 if self.deep_clean_checkboxes[i].isChecked():
-                    if text == "自动扫描temp文件夹":
-                        tasks.append((self.clean_temp_folders, [force_mode]))
-                    elif text == "自动扫描cache文件夹":
-                        tasks.append((self.clean_cache_folders, [force_mode]))
+                    if text in AUTO_SCAN_RULES:
+                        # 所有自动扫描选项合并为一次遍历
+                        scan_options.append(text)
                     else:
                         path = self.get_deep_clean_path(text)
                         if path:
                             # 修复：传递正确的参数
                             if force_mode:
-                                tasks.append((self.force_clean_directory, [path]))
+                                add_task(text, self.force_clean_directory, [path], [path])
                             else:
-                                tasks.append((self.clean_directory, [path, force_mode]))
+                                add_task(text, self.clean_directory, [path, force_mode], [path])
+            if scan_options:
+                tasks.insert(0, (self.scan_and_clean_rules, [scan_options, force_mode]))
+                categories.insert(0, "自动扫描")
+                task_paths.insert(0, [])  # 参数是扫描选项而不是路径，不做预统计
             
             # 添加自定义路径
             custom_path = self.deep_custom_path_edit.text().strip()
             if custom_path and custom_path != "&*dyz!!!!dyz*&":
                 if force_mode:
-                    tasks.append((self.force_clean_directory, [custom_path]))
+                    add_task("自定义路径", self.force_clean_directory, [custom_path], [custom_path])
                 else:
-                    tasks.append((self.clean_directory, [custom_path, force_mode]))
+                    add_task("自定义路径", self.clean_directory, [custom_path, force_mode], [custom_path])
         
         if not tasks:
             QMessageBox.warning(self, "警告", "请至少选择一个清理选项")
@@ -1351,43 +1977,187 @@ class DiskCleanerApp(QMainWindow):
             if msg_box.clickedButton() != confirm_btn:
                 return
         
+        self.run_tasks(tasks, force_mode, categories=categories, task_paths=task_paths)
+
+    def run_tasks(self, tasks, force_mode=False, estimates=None, categories=None, task_paths=None):
+        """启动工作线程执行清理任务"""
         self.clean_btn.setEnabled(False)
         self.cancel_btn.setEnabled(True)
         self.progress_bar.setValue(0)
         self.status_label.setText("正在准备清理...")
+        self.warning_label.setText("")
+        
+        # 运行日志写入磁盘，日志对话框直接从日志文件读取
+        journal = None
+        for journal_dir in (JOURNAL_CONFIG["dir"], os.path.join(tempfile.gettempdir(), 'adsCleanerLogs')):
+            try:
+                journal = RunJournal.create(journal_dir, JOURNAL_CONFIG["level"], JOURNAL_CONFIG["keep"])
+                break
+            except OSError as e:
+                print(f"创建运行日志失败: {e}")
         
         # 创建日志对话框（如果不存在）
         if not self.log_dialog:
-            self.log_dialog = ErrorLogDialog("", self)
+            self.log_dialog = ErrorLogDialog(None, self)
             self.log_dialog.setWindowTitle("清理日志 - 进行中")
         
-        # 清空日志并显示
-        self.log_dialog.text_edit.clear()
+        # 切换到本次运行的日志并显示
+        self.log_dialog.set_journal(journal.path if journal else None)
         self.log_dialog.show()
         
-        # 创建并启动工作线程
-        self.worker = CleanerWorker(tasks, force_mode)
-        self.worker.progress.connect(self.progress_bar.setValue)
-        self.worker.message.connect(self.status_label.setText)
+        # 索引、缓存和队列都只属于一次运行，上一次运行的状态不再沿用
+        self.reset_run_state()
+        
+        self.worker = CleanerWorker(tasks, force_mode, budgets=BUDGET_CONFIG, journal=journal,
+                                    history=ProgressHistory(PROGRESS_CONFIG["history"]), estimates=estimates,
+                                    categories=categories, task_paths=task_paths)
         self.worker.finished.connect(self.on_clean_finished)
         self.worker.error.connect(self.show_error)
         self.worker.warning.connect(self.show_warning)
-        self.worker.detailed_log.connect(self.log_dialog.append_log)
-        self.worker.heartbeat.connect(self.heartbeat)
+        self.worker.journal_grew.connect(self.log_dialog.append_log)
         self.worker.space_updated.connect(self.update_disk_space_display)
+        if force_mode:
+            # 强力模式的共享状态在工作线程启动前建好，删除线程只读取
+            self.prepare_force_state()
+            self.worker.between_tasks = self.process_due_retries
+            # 所有任务结束后统一处理延迟重试和收集到的命令行删除
+            self.worker.finalize = self.finish_force_mode
         self.worker.start()
+        self.budget_timer.start(1000)
+        self.update_budget_display()
+        self.progress_timer.start(int(1000 / PROGRESS_CONFIG["ui_hz"]))
+
+    def update_budget_display(self):
+        """在进度条旁显示当前任务和整个运行的剩余时间预算"""
+        if not self.worker or not self.worker.isRunning():
+            self.budget_label.setText("")
+            return
+        parts = []
+        task_budget = self.worker.task_budget
+        if task_budget is not None and task_budget.remaining() is not None:
+            parts.append(f"任务剩余 {format_duration(task_budget.remaining())}")
+        run_remaining = self.worker.run_budget.remaining()
+        if run_remaining is not None:
+            parts.append(f"总剩余 {format_duration(run_remaining)}")
+        self.budget_label.setText(" | ".join(parts))
+
+    def collect_preview_categories(self):
+        """收集当前模式下选中的分类及其路径，用于预览"""
+        categories = {}
+        mode = self.mode_combo.currentIndex()
+        
+        if mode == 0:
+            for i, (text, _) in enumerate(self.normal_checks):
+                if self.normal_checkboxes[i].isChecked() and text != "回收站":
+                    categories[text] = self.get_normal_path(text)
+        elif mode == 1:
+            for i, (text, _) in enumerate(self.advanced_checks):
+                if self.advanced_checkboxes[i].isChecked():
+                    categories[text] = self.get_advanced_path(text)
+            custom_paths = [self.path_list.item(i).text() for i in range(self.path_list.count())]
+            if custom_paths:
+                categories["自定义路径"] = custom_paths
+        elif mode == 2:
+            for i, (text, _) in enumerate(self.deep_clean_checks):
+                # 自动扫描项需要遍历整个磁盘，不参与预览
+                if self.deep_clean_checkboxes[i].isChecked() and text not in AUTO_SCAN_RULES:
+                    categories[text] = self.get_deep_clean_path(text)
+            custom_path = self.deep_custom_path_edit.text().strip()
+            if custom_path and custom_path != "&*dyz!!!!dyz*&":
+                categories["自定义路径"] = [custom_path]
+        
+        # 去掉空路径的分类
+        return {name: paths for name, paths in categories.items() if paths}
+
+    def show_preview(self):
+        """显示清理预览（并行统计各分类可释放空间）"""
+        categories = self.collect_preview_categories()
+        if not categories:
+            QMessageBox.warning(self, "警告", "请至少选择一个可预览的清理选项")
+            return
+        dialog = PreviewDialog(categories, self)
+        if dialog.exec_() == QDialog.Accepted and dialog.get_plan():
+            self.start_plan_clean(dialog.get_plan())
+
+    def start_plan_clean(self, plan):
+        """按清理计划执行删除，不再重新遍历磁盘"""
+        if self.worker and self.worker.isRunning():
+            QMessageBox.warning(self, "警告", "清理操作正在进行中")
+            return
+        self.failed_files = []
+        # 计划中已记录每个文件的大小，直接作为进度权重
+        totals = plan.totals().values()
+        estimate = (sum(tally.files for tally in totals), sum(tally.bytes for tally in totals))
+        # 清理计划任务自行按规则记录清理量
+        self.run_tasks([(self.execute_plan, [plan])], estimates=[estimate], categories=[None])
+
+    def load_and_run_plan(self):
+        """加载已保存的清理计划并执行"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择清理计划", "", "清理计划 (*.json)")
+        if not file_path:
+            return
+        try:
+            plan = CleanupPlan.load(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"加载清理计划失败: {str(e)}")
+            return
+        
+        summary = "\n".join(f"{name}: {tally.files} 个文件, 占用 {format_size(tally.allocated)}"
+                            for name, tally in plan.totals().items())
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("执行清理计划")
+        msg_box.setText(f"即将按计划清理:\n\n{summary}\n\n受保护条目: {plan.protected_count()}")
+        confirm_btn = msg_box.addButton("确认", QMessageBox.YesRole)
+        cancel_btn = msg_box.addButton("取消", QMessageBox.NoRole)
+        msg_box.setDefaultButton(cancel_btn)
+        msg_box.exec_()
+        
+        if msg_box.clickedButton() == confirm_btn:
+            self.start_plan_clean(plan)
+
+    def execute_plan(self, plan):
+        """执行清理计划（删除前校验大小和修改时间）"""
+        if self.worker:
+            self.worker.log(f"开始执行清理计划: {len(plan.entries)} 个条目")
+        
+        def on_item(path, action, detail):
+            if self.worker:
+                self.worker.log(f"{action}: {path}" + (f" ({detail})" if detail else ""))
+        
+        executor = PlanExecutor(
+            plan,
+            is_canceled=lambda: bool(self.worker and self.worker.is_canceled),
+            on_item=on_item,
+            progress=self.worker.progress_counters if self.worker else None,
+            links=self.worker.links if self.worker else None
+        )
+        result = executor.run()
+        
+        for path, reason in result.failed:
+            self.failed_files.append((path, reason))
+        if self.worker:
+            for name, tally in result.freed.items():
+                self.worker.record_freed(name, tally.files, tally.bytes, tally.allocated)
+            self.worker.log(f"清理计划执行完成: {result.summary()}")
 
     def update_disk_space_display(self):
         """更新磁盘空间显示"""
         self.disk_space_widget.update_disk_space()
 
-    def heartbeat(self):
-        """心跳响应，防止假死"""
-        QApplication.processEvents()
-
-    def update_ui(self):
-        """更新UI，防止界面卡死"""
-        QApplication.processEvents()
+    def update_progress_display(self):
+        """按固定频率采样工作线程的进度计数，更新进度条和状态栏"""
+        if not self.worker:
+            return
+        snap = self.worker.progress_counters.snapshot()
+        self.progress_bar.setValue(int(snap.fraction * 100))
+        if self.worker.canceled:
+            # 取消后保留取消提示，直到工作线程结束
+            self.status_label.setText("正在取消清理...")
+        elif snap.current:
+            # 进度按预计的文件数和字节数加权，剩余时间按实测吞吐量估算
+            self.status_label.setText(f"清理中: {snap.current} | {format_progress(snap)}")
+        else:
+            self.status_label.setText("正在准备清理...")
 
     def cancel_clean(self):
         """取消清理操作"""
@@ -1483,68 +2253,87 @@ class DiskCleanerApp(QMainWindow):
 
     def clean_temp_folders(self, force_mode=False):
         """自动扫描并清理包含'temp'的文件夹"""
-        self.scan_and_clean_pattern('temp', force_mode)
+        self.scan_and_clean_rules(["自动扫描temp文件夹"], force_mode)
 
     def clean_cache_folders(self, force_mode=False):
         """自动扫描并清理包含'cache'的文件夹"""
-        self.scan_and_clean_pattern('cache', force_mode)
+        self.scan_and_clean_rules(["自动扫描cache文件夹"], force_mode)
+
+    def get_scan_roots(self):
+        """获取自动扫描的根目录（展开配置中的环境变量）"""
+        return [os.path.expandvars(root) for root in AUTO_SCAN_CONFIG["roots"]]
 
     def scan_and_clean_pattern(self, pattern, force_mode=False):
         """扫描C盘并清理包含指定模式的文件夹"""
+        self.scan_and_clean(
+            [CleanRule(pattern, dir_keyword=pattern)],
+            force_mode
+        )
+
+    def scan_and_clean_rules(self, options, force_mode=False):
+        """一次遍历同时执行多个自动扫描选项的规则"""
+        rules = []
+        for option in options:
+            rules.extend(AUTO_SCAN_RULES.get(option, []))
+        self.scan_and_clean(rules, force_mode)
+
+    def scan_and_clean(self, rules, force_mode=False):
+        """扫描C盘，单次遍历评估所有规则并清理命中的文件夹/文件"""
+        if not rules:
+            return
+        rule_names = "、".join(rule.name for rule in rules)
         if self.worker:
-            self.worker.log(f"开始扫描包含'{pattern}'的文件夹...")
+            self.worker.log(f"开始扫描匹配规则 [{rule_names}] 的文件夹...")
         
         try:
-            # 扫描C盘根目录和主要目录
-            scan_paths = [
-                'C:\\',
-                'C:\\Users',
-                'C:\\Program Files',
-                'C:\\Program Files (x86)',
-                'C:\\Windows',
-                os.path.join(os.environ.get('LOCALAPPDATA', 'C:\\Users\\Default\\AppData\\Local')),
-                os.path.join(os.environ.get('APPDATA', 'C:\\Users\\Default\\AppData\\Roaming'))
-            ]
+            matcher = RuleMatcher(rules)
+            scanner = ParallelScanner(
+                self.get_scan_roots(),
+                match_dir=matcher.match_dir if matcher.has_dir_rules else None,
+                match_file=matcher.match_file if matcher.has_file_rules else None,
+                max_workers=AUTO_SCAN_CONFIG["max_workers"],
+                is_canceled=lambda: bool(self.worker and self.worker.is_canceled)
+            )
             
             found_count = 0
             cleaned_count = 0
             
-            for base_path in scan_paths:
-                if not os.path.exists(base_path):
-                    continue
-                    
-                for root, dirs, files in os.walk(base_path):
-                    # 检查是否被取消
-                    if self.worker and self.worker.is_canceled:
-                        return
-                    
-                    # 检查目录名是否包含目标模式（不区分大小写）
-                    for dir_name in dirs:
-                        if pattern.lower() in dir_name.lower():
-                            dir_path = os.path.join(root, dir_name)
-                            try:
-                                if self.worker:
-                                    self.worker.log(f"找到{pattern}文件夹: {dir_path}")
-                                found_count += 1
-                                
-                                # 清理文件夹内容
-                                self.clean_directory(dir_path, force_mode)
-                                cleaned_count += 1
-                                
-                            except Exception as e:
-                                if self.worker:
-                                    self.worker.log(f"清理{pattern}文件夹失败 {dir_path}: {e}")
+            # 并行遍历，匹配到的项目边找边清理
+            for match in scanner.scan():
+                # 检查是否被取消
+                if self.worker and self.worker.is_canceled:
+                    return
+                
+                rule_name = match.rule.name
+                try:
+                    found_count += 1
+                    if match.is_dir:
+                        if self.worker:
+                            self.worker.log(f"找到{rule_name}文件夹: {match.path}")
+                        # 清理文件夹内容
+                        self.clean_directory(match.path, force_mode)
+                    else:
+                        if self.worker:
+                            self.worker.log(f"找到{rule_name}文件: {match.path}")
+                        # 文件大小取自遍历时的目录项，不再单独stat
+                        try:
+                            st = match.entry.stat(follow_symlinks=False)
+                        except (AttributeError, OSError):
+                            st = None
+                        self.delete_file(match.path, force_mode, st)
+                    cleaned_count += 1
                     
-                    # 发送心跳信号，防止假死
+                except Exception as e:
                     if self.worker:
-                        self.worker.heartbeat.emit()
+                        self.worker.log(f"清理{rule_name}项目失败 {match.path}: {e}")
             
             if self.worker:
-                self.worker.log(f"扫描完成: 找到 {found_count} 个{pattern}文件夹，成功清理 {cleaned_count} 个")
+                self.worker.log(f"扫描完成: 找到 {found_count} 个匹配项，成功清理 {cleaned_count} 个")
+                self.worker.log(f"扫描统计: {scanner.stats.summary()}")
                 
         except Exception as e:
             if self.worker:
-                self.worker.log(f"扫描{pattern}文件夹时出错: {e}")
+                self.worker.log(f"扫描 [{rule_names}] 时出错: {e}")
 
     def clean_directory(self, path, force_mode=False):
         """清理指定目录"""
@@ -1565,56 +2354,75 @@ class DiskCleanerApp(QMainWindow):
             return
         
         try:
-            # 获取目录内容
-            items = os.listdir(path)
-            total_items = len(items)
-            
-            # 分批次处理，避免卡顿
-            for i in range(0, total_items, self.worker.batch_size):
-                batch = items[i:i+self.worker.batch_size]
-                for item in batch:
-                    # 定期检查是否被取消
-                    if self.worker and self.worker.is_canceled:
-                        return
-                    
-                    item_path = os.path.join(path, item)
-                    
-                    # 跳过系统关键文件（仅在非实验箱模式下）
-                    if not hasattr(self, 'force_mode_activated') or not self.force_mode_activated:
-                        system_files = [
-                            "ntoskrnl.exe", "hal.dll", "winload.exe", "winresume.exe",
-                            "bootmgr", "pagefile.sys", "hiberfil.sys", "swapfile.sys"
-                        ]
-                        
-                        if os.path.basename(item_path).lower() in system_files:
-                            if self.worker:
-                                self.worker.log(f"跳过系统关键文件: {item_path}")
-                            continue
-                    
-                    try:
-                        if os.path.isfile(item_path) or os.path.islink(item_path):
-                            # 跳过系统关键文件
-                            if item == "MEMORY.DMP" and "Windows" in path:
-                                if self.worker:
-                                    self.worker.log(f"跳过系统内存转储文件: {item_path}")
-                                continue
-                                
-                            # 尝试删除文件
-                            self.delete_file(item_path, force_mode)
-                        elif os.path.isdir(item_path):
-                            # 尝试删除目录
-                            self.delete_directory(item_path, force_mode)
-                    except Exception as e:
-                        if self.worker:
-                            self.worker.log(f"删除失败 {item_path}: {e}")
-                    
-                    # 发送心跳信号，防止假死
-                    if self.worker:
-                        self.worker.heartbeat.emit()
+            # 并发删除目录内容，目录自底向上删除
+            result = self.create_deletion_engine(force_mode).clear_directory(path)
+            self.handle_delete_failures(path, result, force_mode, remove_root=False)
+            if self.worker:
+                self.worker.log(f"清理完成 {path}: {result.summary()}")
         except Exception as e:
             if self.worker:
                 self.worker.log(f"清理路径 {path} 时出错: {e}")
 
+    def create_deletion_engine(self, force_mode=False, allow_system=None):
+        """创建并发删除引擎（沿用系统关键文件保护规则）
+
+        强力模式下删除失败的条目由工作线程直接走强制删除，各线程共享
+        打开文件索引、句柄索引、所有权缓存和延迟重试队列。
+        allow_system 为 None 时按是否已激活强力模式决定是否保护系统关键文件。
+        """
+        # 跳过系统关键文件（仅在非实验箱模式下）
+        if allow_system is None:
+            allow_system = hasattr(self, 'force_mode_activated') and self.force_mode_activated
+        
+        return DeletionEngine(
+            max_workers=DELETE_CONFIG["max_workers"],
+            is_canceled=lambda: bool(self.worker and self.worker.is_canceled),
+            protect=lambda name, parent: protection_reason(name, parent, allow_system),
+            on_item=self.on_delete_item,
+            on_error=self.force_delete_entry if force_mode else None,
+            progress=self.worker.progress_counters if self.worker else None,
+            links=self.worker.links if self.worker else None
+        )
+
+    def on_delete_item(self, path, action):
+        """删除引擎逐项回调"""
+        if self.worker:
+            self.worker.log("%s: %s", action, path, action=action, path=path)
+
+    def handle_delete_failures(self, root, result, force_mode, remove_root):
+        """逐项处理删除失败：强力模式下把仍有残留的顶层目录交给收尾时的批量删除，否则记录警告
+
+        强力模式下失败的条目已在删除线程中走过强制删除（或进入延迟重试），
+        这里不再重新遍历，只保证其所在的顶层目录在重试结束后被整体删除。
+        """
+        forced = set()
+        for item_path, kind, error in result.failed:
+            if force_mode:
+                if item_path == root and not remove_root:
+                    if self.worker:
+                        self.worker.log(f"清理路径 {root} 时出错: {error}")
+                    continue
+                
+                # 定位失败条目所属的顶层条目，同一条目只处理一次
+                top_name = os.path.relpath(item_path, root).split(os.sep)[0]
+                top_path = root if remove_root else os.path.join(root, top_name)
+                if top_path in forced:
+                    continue
+                forced.add(top_path)
+                if os.path.isdir(top_path) and not os.path.islink(top_path):
+                    self.get_force_delete_batch().add(top_path, is_dir=True)
+                continue
+            
+            if isinstance(error, PermissionError):
+                error_msg = f"权限不足: {item_path}"
+            elif kind == 'f':
+                error_msg = f"删除文件失败 {item_path}: {error}"
+            else:
+                error_msg = f"删除目录失败 {item_path}: {error}"
+            if self.worker:
+                self.worker.log(error_msg, level="WARNING", action="failed", path=item_path, error=error)
+                self.worker.warn(error_msg)
+
     def force_clean_directory(self, path):
         """强力模式清理目录 - 修复：只接受一个参数"""
         if self.worker:
@@ -1631,60 +2439,31 @@ class DiskCleanerApp(QMainWindow):
                 self.clean_prefetch(True)  # 总是使用强力模式
                 return
             
-            # 修复：使用 os.listdir 而不是 os.list
-            items = os.listdir(path)
-            total_items = len(items)
-            
-            # 分批次处理
-            for i in range(0, total_items, self.worker.batch_size):
-                batch = items[i:i+self.worker.batch_size]
-                for item in batch:
-                    # 定期检查是否被取消
-                    if self.worker and self.worker.is_canceled:
-                        return
-                    
-                    item_path = os.path.join(path, item)
-                    try:
-                        if os.path.isfile(item_path) or os.path.islink(item_path):
-                            # 跳过系统关键文件
-                            if item == "MEMORY.DMP" and "Windows" in path:
-                                if self.worker:
-                                    self.worker.log(f"跳过系统内存转储文件: {item_path}")
-                                continue
-                                
-                            # 尝试强制删除文件
-                            self.force_delete_file(item_path)
-                        elif os.path.isdir(item_path):
-                            # 尝试强制删除目录
-                            self.force_delete_directory(item_path)
-                    except Exception as e:
-                        if self.worker:
-                            self.worker.log(f"【强力模式】删除失败 {item_path}: {e}")
-                    
-                    # 发送心跳信号，防止假死
-                    if self.worker:
-                        self.worker.heartbeat.emit()
+            # 整棵目录树只遍历一次，文件交给删除线程池
+            self.force_clear_tree(path)
         except Exception as e:
             if self.worker:
                 self.worker.log(f"【强力模式】清理路径 {path} 时出错: {e}")
 
-    def delete_file(self, file_path, force_mode=False):
-        """安全删除文件 - 确保实际删除"""
+    def delete_file(self, file_path, force_mode=False, st=None):
+        """安全删除文件 - 确保实际删除（st 为已取得的stat，用于统计清理量）"""
+        allocated = 0
+        if st is not None and self.worker:
+            # 删除之前补全硬链接信息并查询占用空间（与删除引擎相同，已知只有一个链接的文件不必补全）
+            if not (st.st_ino != 0 and st.st_nlink <= 1):
+                st = self.worker.links.identify(st, file_path)
+            allocated = default_allocation().allocated(st, file_path)
         try:
-            # 尝试直接删除
-            os.unlink(file_path)
-            if self.worker:
-                self.worker.log(f"已删除文件: {file_path} (普通删除方法)")
-                
-            # 验证文件是否被删除
-            if os.path.exists(file_path):
+            # 直接删除，依据错误码判断结果，无需再次检查文件是否存在
+            if unlink_path(file_path):
                 if self.worker:
-                    self.worker.log(f"文件删除后仍然存在: {file_path}")
-                if force_mode:
-                    # 如果强力模式激活，尝试强制删除
-                    self.force_delete_file(file_path)
-                else:
-                    raise Exception("文件删除后仍然存在")
+                    if st is not None and self.worker.links.release(st):
+                        self.worker.progress_counters.add_file(st.st_size, allocated)
+                    else:
+                        self.worker.progress_counters.add_file(0, 0)
+                    self.worker.log(f"已删除文件: {file_path} (普通删除方法)")
+            elif self.worker:
+                self.worker.log(f"文件已不存在: {file_path}")
         except PermissionError:
             if force_mode:
                 # 如果强力模式激活，尝试强制删除
@@ -1692,82 +2471,94 @@ class DiskCleanerApp(QMainWindow):
             else:
                 error_msg = f"权限不足: {file_path}"
                 if self.worker:
-                    self.worker.log(error_msg)
-                    self.worker.warning.emit(error_msg)
+                    self.worker.log(error_msg, level="WARNING", action="failed", path=file_path)
+                    self.worker.warn(error_msg)
         except Exception as e:
             error_msg = f"删除文件失败 {file_path}: {e}"
             if self.worker:
-                self.worker.log(error_msg)
-                self.worker.warning.emit(error_msg)
+                self.worker.log(error_msg, level="WARNING", action="failed", path=file_path, error=e)
+                self.worker.warn(error_msg)
 
     def delete_directory(self, dir_path, force_mode=False):
         """安全删除目录 - 确保实际删除"""
         try:
-            # 尝试直接删除
-            shutil.rmtree(dir_path)
-            if self.worker:
+            # 并发删除目录内容，完成后删除目录本身
+            result = self.create_deletion_engine(force_mode).clear_directory(dir_path, remove_root=True)
+            if result.failed:
+                self.handle_delete_failures(dir_path, result, force_mode, remove_root=True)
+            elif self.worker and not result.skipped:
                 self.worker.log(f"已删除目录: {dir_path} (普通删除方法)")
-                
-            # 验证目录是否被删除
-            if os.path.exists(dir_path):
-                if self.worker:
-                    self.worker.log(f"目录删除后仍然存在: {dir_path}")
-                if force_mode:
-                    # 如果强力模式激活，尝试强制删除
-                    self.force_delete_directory(dir_path)
-                else:
-                    raise Exception("目录删除后仍然存在")
-        except PermissionError:
-            if force_mode:
-                # 如果强力模式激活，尝试强制删除
-                self.force_delete_directory(dir_path)
-            else:
-                error_msg = f"权限不足: {dir_path}"
-                if self.worker:
-                    self.worker.log(error_msg)
-                    self.worker.warning.emit(error_msg)
         except Exception as e:
             error_msg = f"删除目录失败 {dir_path}: {e}"
             if self.worker:
-                self.worker.log(error_msg)
-                self.worker.warning.emit(error_msg)
+                self.worker.log(error_msg, level="WARNING", action="failed", path=dir_path, error=e)
+                self.worker.warn(error_msg)
+
+    def reset_run_state(self):
+        """丢弃上一次运行的打开文件索引、句柄索引、批量删除队列、方法缓存、重试队列和所有权缓存"""
+        with self.force_state_lock:
+            self.open_file_index = None
+            self.handle_index = None
+            self.force_delete_batch = None
+            self.strategy_cache = None
+            self.retry_queue = None
+            self.ownership = None
+
+    def prepare_force_state(self):
+        """在工作线程启动前建立强力模式各线程共享的对象"""
+        self.get_open_file_index()
+        self.get_handle_index()
+        self.get_force_delete_batch()
+        self.get_strategy_cache()
+        self.get_retry_queue()
+        try:
+            self.get_ownership()
+        except Exception as e:
+            # 账户SID解析失败时在获取所有权时再报告
+            print(f"初始化所有权管理器失败: {e}")
+
+    def get_ownership(self):
+        """获取本次运行的所有权管理器（账户SID和安全描述符只解析一次）"""
+        with self.force_state_lock:
+            if self.ownership is None:
+                self.ownership = OwnershipManager(Win32SecurityBackend(), os.getenv("USERNAME"))
+            return self.ownership
 
     def take_ownership(self, file_path):
-        """获取文件所有权并设置完全控制权限"""
+        """获取文件所有权并设置完全控制权限
+
+        先获取所在目录的所有权（每个目录一次），同一目录中其他删除失败的文件
+        不再逐个设置；目录无法获取时只处理该文件。
+        """
+        self.take_directory_ownership(os.path.dirname(os.path.abspath(file_path)))
         try:
-            # 获取文件安全描述符
-            sd = win32security.GetFileSecurity(file_path, win32security.OWNER_SECURITY_INFORMATION)
-            user, domain, _ = win32security.LookupAccountName("", os.getenv("USERNAME"))
-            
-            # 设置新的所有者
-            sd.SetSecurityDescriptorOwner(user, False)
-            
-            # 设置新的DACL - 修复：使用正确的权限常量
-            dacl = win32security.ACL()
-            
-            # 使用 GENERIC_ALL 而不是 FILE_ALL_ACCESS
-            # GENERIC_ALL 包括所有标准权限
-            dacl.AddAccessAllowedAce(win32security.ACL_REVISION, win32con.GENERIC_ALL, user)
-            
-            sd.SetSecurityDescriptorDacl(1, dacl, 0)
-            
-            # 应用新的安全描述符
-            win32security.SetFileSecurity(file_path, win32security.DACL_SECURITY_INFORMATION | win32security.OWNER_SECURITY_INFORMATION, sd)
-            
+            self.get_ownership().take(file_path)
             return True
         except Exception as e:
             if self.worker:
                 self.worker.log(f"获取文件所有权失败: {file_path} - {e}")
             return False
 
+    def take_directory_ownership(self, dir_path):
+        """以可继承的权限获取目录的所有权，目录中的直接子项无需再逐个设置"""
+        try:
+            if self.get_ownership().take_directory(dir_path) and self.worker:
+                self.worker.log(f"已获取目录所有权: {dir_path}")
+            return True
+        except Exception as e:
+            if self.worker:
+                self.worker.log(f"获取目录所有权失败: {dir_path} - {e}")
+            return False
+
     def force_delete_file(self, file_path):
         """强制删除文件 - 使用IRP操作，确保实际删除"""
         if self.worker and self.worker.is_canceled:
             return
         
+        budget = self.worker.file_budget() if self.worker else TimeBudget()
         try:
             if self.worker:
-                self.worker.log(f"【强力模式】尝试强制删除文件: {file_path}")
+                self.worker.log("【强力模式】尝试强制删除文件: %s", file_path, level="DEBUG", path=file_path)
             
             # 检查文件是否被占用
             if self.is_file_running(file_path):
@@ -1778,8 +2569,9 @@ class DiskCleanerApp(QMainWindow):
                 if self.kill_processes_using_file(file_path):
                     if self.worker:
                         self.worker.log(f"成功结束占用文件的进程: {file_path}")
-                    # 给系统一点时间释放资源
-                    time.sleep(1)
+                    # 系统释放资源需要时间，放入延迟重试队列，继续处理其他文件
+                    self.get_retry_queue().add(file_path)
+                    return
                 else:
                     if self.worker:
                         self.worker.log(f"无法结束占用文件的进程: {file_path}")
@@ -1788,196 +2580,210 @@ class DiskCleanerApp(QMainWindow):
                     if self.unlock_file(file_path):
                         if self.worker:
                             self.worker.log(f"成功解除文件锁定: {file_path}")
-                        # 给系统一点时间释放资源
-                        time.sleep(1)
-            
-            # 获取文件所有权并设置权限
-            try:
-                self.take_ownership(file_path)
-                if self.worker:
-                    self.worker.log(f"已获取文件所有权: {file_path}")
-            except Exception as e:
-                if self.worker:
-                    self.worker.log(f"获取文件所有权失败: {file_path} - {e}")
+                        # 系统释放资源需要时间，放入延迟重试队列，继续处理其他文件
+                        self.get_retry_queue().add(file_path)
+                        return
             
-            # 方法1: 使用重命名后删除（最可靠）
-            try:
-                # 生成随机临时文件名
-                temp_dir = os.path.dirname(file_path)
-                temp_name = f".{uuid.uuid4().hex[:8]}.tmp"
-                temp_path = os.path.join(temp_dir, temp_name)
-                
-                # 重命名文件
-                os.rename(file_path, temp_path)
-                
-                # 删除重命名后的文件
-                os.unlink(temp_path)
-                
+            if self.attempt_force_delete(file_path, budget=budget) is None and budget.expired():
+                # 超出时间预算，跳过此文件继续处理下一个
                 if self.worker:
-                    self.worker.log(f"【强力模式】重命名后删除成功: {file_path}")
-                
-                # 验证文件是否被删除
-                if os.path.exists(file_path) or os.path.exists(temp_path):
-                    if self.worker:
-                        self.worker.log(f"【强力模式】重命名删除后文件仍存在: {file_path}")
-                    raise Exception("重命名删除后文件仍存在")
+                    self.worker.skip(file_path, budget.reason())
                 else:
-                    return  # 成功删除，不再尝试其他方法
-            except Exception as e:
-                if self.worker:
-                    self.worker.log(f"【强力模式】重命名删除失败: {e}")
+                    self.failed_files.append((file_path, budget.reason()))
+        except Exception as e:
+            error_msg = f"【强力模式】强制删除文件失败: {file_path} - {e}"
+            if self.worker:
+                self.worker.log(error_msg)
+            self.failed_files.append((file_path, str(e)))
             
-            # 方法2: 使用FILE_FLAG_DELETE_ON_CLOSE
-            try:
-                # 获取文件句柄，并设置删除标志 - 修复权限问题
-                # 使用 GENERIC_READ | GENERIC_WRITE 而不是 FILE_ALL_ACCESS
-                handle = win32file.CreateFile(
-                    file_path,
-                    win32file.GENERIC_READ | win32file.GENERIC_WRITE,
-                    win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
-                    None,
-                    win32file.OPEN_EXISTING,
-                    win32file.FILE_ATTRIBUTE_NORMAL | win32file.FILE_FLAG_DELETE_ON_CLOSE,
-                    None
-                )
-                win32file.CloseHandle(handle)
-                if self.worker:
-                    self.worker.log(f"【强力模式】文件标记为关闭时删除: {file_path}")
-                
-                # 验证文件是否被删除
-                if os.path.exists(file_path):
-                    if self.worker:
-                        self.worker.log(f"【强力模式】FILE_FLAG_DELETE_ON_CLOSE未生效: {file_path}")
-                    raise Exception("FILE_FLAG_DELETE_ON_CLOSE未生效")
-                else:
-                    return
-            except Exception as e:
+    def attempt_force_delete(self, file_path, allow_batch=True, budget=None):
+        """获取所有权后依次尝试各删除方法，返回成功（或加入批量删除）的方法名，
+        全部失败或时间预算耗尽时返回None"""
+        # 获取文件所有权并设置权限
+        try:
+            self.take_ownership(file_path)
+            if self.worker:
+                self.worker.log("已获取文件所有权: %s", file_path, level="DEBUG", path=file_path)
+        except Exception as e:
+            if self.worker:
+                self.worker.log(f"获取文件所有权失败: {file_path} - {e}")
+        
+        # 按 (错误类别, 目录) 缓存的成功方法优先尝试，方法4为命令行批量删除
+        parent = normalize_path(os.path.dirname(file_path))
+        cache = self.get_strategy_cache()
+        error_class = cache.last_error(parent)
+        methods, preferred = FORCE_DELETE_METHODS, None
+        if error_class:
+            methods, preferred = cache.order(error_class, parent, FORCE_DELETE_METHODS)
+        
+        for method in methods:
+            if budget is not None and budget.expired():
+                return None
+            if method == "batch":
+                if not allow_batch:
+                    continue
+                # 方法4: 使用命令行强制删除（使用takeown和icacls），收集后按目录批量执行
+                self.get_force_delete_batch().add(file_path)
                 if self.worker:
-                    self.worker.log(f"【强力模式】使用FILE_FLAG_DELETE_ON_CLOSE删除失败: {e}")
+                    self.worker.log(f"【强力模式】已加入命令行批量删除: {file_path}")
+            else:
+                try:
+                    getattr(self, f"force_delete_by_{method}")(file_path)
+                except Exception as e:
+                    if error_class is None:
+                        error_class = cache.classify(e)
+                        cache.note_error(parent, error_class)
+                    continue
             
-            # 方法3: 使用SetFileInformationByHandle设置删除标志
-            try:
-                # 获取文件句柄 - 修复权限问题
-                # 使用 GENERIC_WRITE 而不是 GENERIC_ALL
-                handle = win32file.CreateFile(
-                    file_path,
-                    win32file.GENERIC_WRITE,
-                    win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
-                    None,
-                    win32file.OPEN_EXISTING,
-                    win32file.FILE_FLAG_BACKUP_SEMANTICS | win32file.FILE_FLAG_OPEN_REPARSE_POINT,
-                    None
-                )
-                
-                # 设置文件删除标志
-                delete_flag = ctypes.c_byte(1)
-                
-                # 调用Windows API设置删除标志
-                result = SetFileInformationByHandle(
-                    handle.handle,
-                    FileDispositionInfo,
-                    ctypes.byref(delete_flag),
-                    ctypes.sizeof(delete_flag)
+            if error_class:
+                cache.record(error_class, parent, method, preferred)
+            return method
+        return None
+
+    def retry_force_delete(self, file_path):
+        """延迟重试队列的处理函数：文件已不存在或直接删除方法成功时返回True"""
+        if not os.path.lexists(file_path):
+            return True
+        budget = self.worker.file_budget() if self.worker else None
+        return self.attempt_force_delete(file_path, allow_batch=False, budget=budget) is not None
+
+    def get_retry_queue(self):
+        """获取本次运行的延迟重试队列"""
+        with self.force_state_lock:
+            if self.retry_queue is None:
+                self.retry_queue = RetryQueue(
+                    self.retry_force_delete,
+                    base_delay=RETRY_CONFIG["base_delay"],
+                    max_delay=RETRY_CONFIG["max_delay"],
+                    max_attempts=RETRY_CONFIG["max_attempts"]
                 )
-                
-                if not result:
-                    error_code = ctypes.windll.kernel32.GetLastError()
-                    raise ctypes.WinError(error_code)
-                
-                win32file.CloseHandle(handle)
-                if self.worker:
-                    self.worker.log(f"【强力模式】文件标记为删除: {file_path}")
-                
-                # 验证文件是否被删除
-                if os.path.exists(file_path):
-                    if self.worker:
-                        self.worker.log(f"【强力模式】SetFileInformationByHandle未生效: {file_path}")
-                    raise Exception("SetFileInformationByHandle未生效")
-                else:
-                    return
-            except Exception as e:
-                if self.worker:
-                    self.worker.log(f"【强力模式】SetFileInformationByHandle删除失败: {e}")
+            return self.retry_queue
+
+    def process_due_retries(self):
+        """在任务间隙处理已到期的重试项，达到上限的交给命令行批量删除"""
+        if self.retry_queue is None:
+            return
+        for file_path in self.retry_queue.process_due():
+            self.get_force_delete_batch().add(file_path)
+
+    def force_delete_by_rename(self, file_path):
+        """方法1: 使用重命名后删除（最可靠）"""
+        try:
+            # 生成随机临时文件名
+            temp_dir = os.path.dirname(file_path)
+            temp_name = f".{uuid.uuid4().hex[:8]}.tmp"
+            temp_path = os.path.join(temp_dir, temp_name)
             
-            # 方法4: 使用命令行强制删除（使用takeown和icacls）
-            try:
-                # 创建批处理文件
-                batch_content = f"""
-                @echo off
-                :loop
-                takeown /f "{file_path}" >nul 2>&1
-                icacls "{file_path}" /grant administrators:F >nul 2>&1
-                del /f /q "{file_path}" >nul 2>&1
-                if exist "{file_path}" (
-                    timeout /t 1 /nobreak >nul
-                    goto loop
-                )
-                """
-                batch_path = os.path.join(os.environ['TEMP'], f"del_{uuid.uuid4().hex[:8]}.bat")
-                with open(batch_path, "w", encoding="gbk") as f:
-                    f.write(batch_content)
-                
-                # 直接运行批处理（增加超时处理）
-                subprocess.run(f'cmd /c "{batch_path}"', shell=True, timeout=30)
-                os.unlink(batch_path)
-                
-                if self.worker:
-                    self.worker.log(f"【强力模式】命令行强制删除成功: {file_path}")
-                
-                # 验证文件是否被删除
-                if os.path.exists(file_path):
-                    if self.worker:
-                        self.worker.log(f"【强力模式】命令行删除后文件仍存在: {file_path}")
-                    raise Exception("命令行删除后文件仍存在")
-            except subprocess.TimeoutExpired:
-                if self.worker:
-                    self.worker.log(f"【强力模式】命令行强制删除超时: {file_path}")
-                raise Exception("命令行强制删除超时")
-            except Exception as e:
-                if self.worker:
-                    self.worker.log(f"【强力模式】命令行强制删除失败: {e}")
+            # 重命名文件
+            os.rename(file_path, temp_path)
             
-            # 方法5: 重启后删除
-            try:
-                # 使用MoveFileEx设置重启后删除
-                MOVEFILE_DELAY_UNTIL_REBOOT = 0x4
-                ctypes.windll.kernel32.MoveFileExW(file_path, None, MOVEFILE_DELAY_UNTIL_REBOOT)
+            # 删除重命名后的文件
+            os.unlink(temp_path)
+            
+            if self.worker:
+                self.worker.log(f"【强力模式】重命名后删除成功: {file_path}")
+            
+            # 验证文件是否被删除
+            if os.path.exists(file_path) or os.path.exists(temp_path):
                 if self.worker:
-                    self.worker.log(f"【强力模式】文件将在重启后删除: {file_path}")
-                self.failed_files.append((file_path, "文件将在系统重启后删除"))
-            except Exception as e:
+                    self.worker.log(f"【强力模式】重命名删除后文件仍存在: {file_path}")
+                raise Exception("重命名删除后文件仍存在")
+        except Exception as e:
+            if self.worker:
+                self.worker.log(f"【强力模式】重命名删除失败: {e}")
+            raise
+
+    def force_delete_by_delete_on_close(self, file_path):
+        """方法2: 使用FILE_FLAG_DELETE_ON_CLOSE"""
+        try:
+            # 获取文件句柄，并设置删除标志 - 修复权限问题
+            # 使用 GENERIC_READ | GENERIC_WRITE 而不是 FILE_ALL_ACCESS
+            handle = win32file.CreateFile(
+                file_path,
+                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
+                None,
+                win32file.OPEN_EXISTING,
+                win32file.FILE_ATTRIBUTE_NORMAL | win32file.FILE_FLAG_DELETE_ON_CLOSE,
+                None
+            )
+            win32file.CloseHandle(handle)
+            if self.worker:
+                self.worker.log(f"【强力模式】文件标记为关闭时删除: {file_path}")
+            
+            # 验证文件是否被删除
+            if os.path.exists(file_path):
                 if self.worker:
-                    self.worker.log(f"【强力模式】设置重启删除失败: {e}")
-                raise
+                    self.worker.log(f"【强力模式】FILE_FLAG_DELETE_ON_CLOSE未生效: {file_path}")
+                raise Exception("FILE_FLAG_DELETE_ON_CLOSE未生效")
         except Exception as e:
-            error_msg = f"【强力模式】强制删除文件失败: {file_path} - {e}"
             if self.worker:
-                self.worker.log(error_msg)
-            self.failed_files.append((file_path, str(e)))
-        finally:
-            # 发送心跳信号，防止假死
+                self.worker.log(f"【强力模式】使用FILE_FLAG_DELETE_ON_CLOSE删除失败: {e}")
+            raise
+
+    def force_delete_by_disposition(self, file_path):
+        """方法3: 使用SetFileInformationByHandle设置删除标志"""
+        try:
+            # 获取文件句柄 - 修复权限问题
+            # 使用 GENERIC_WRITE 而不是 GENERIC_ALL
+            handle = win32file.CreateFile(
+                file_path,
+                win32file.GENERIC_WRITE,
+                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
+                None,
+                win32file.OPEN_EXISTING,
+                win32file.FILE_FLAG_BACKUP_SEMANTICS | win32file.FILE_FLAG_OPEN_REPARSE_POINT,
+                None
+            )
+            
+            # 设置文件删除标志
+            delete_flag = ctypes.c_byte(1)
+            
+            # 调用Windows API设置删除标志
+            result = SetFileInformationByHandle(
+                handle.handle,
+                FileDispositionInfo,
+                ctypes.byref(delete_flag),
+                ctypes.sizeof(delete_flag)
+            )
+            
+            if not result:
+                error_code = ctypes.windll.kernel32.GetLastError()
+                raise ctypes.WinError(error_code)
+            
+            win32file.CloseHandle(handle)
             if self.worker:
-                self.worker.heartbeat.emit()
+                self.worker.log(f"【强力模式】文件标记为删除: {file_path}")
             
+            # 验证文件是否被删除
+            if os.path.exists(file_path):
+                if self.worker:
+                    self.worker.log(f"【强力模式】SetFileInformationByHandle未生效: {file_path}")
+                raise Exception("SetFileInformationByHandle未生效")
+        except Exception as e:
+            if self.worker:
+                self.worker.log(f"【强力模式】SetFileInformationByHandle删除失败: {e}")
+            raise
+
+    def get_strategy_cache(self):
+        """获取本次运行的删除方法缓存"""
+        with self.force_state_lock:
+            if self.strategy_cache is None:
+                self.strategy_cache = StrategyCache()
+            return self.strategy_cache
+
+    def get_open_file_index(self):
+        """获取本次运行的打开文件索引（首次调用时在后台建立）"""
+        with self.force_state_lock:
+            if self.open_file_index is None:
+                self.open_file_index = OpenFileIndex(ttl=OPEN_FILE_INDEX_CONFIG["ttl"])
+                self.open_file_index.refresh_async()
+            return self.open_file_index
+
     def is_file_running(self, file_path):
         """检查文件是否被进程使用"""
         try:
-            file_path = os.path.abspath(file_path).lower()
-            for proc in psutil.process_iter(['pid', 'name', 'exe', 'open_files']):
-                try:
-                    # 检查可执行文件本身
-                    if proc.info.get('exe') and os.path.abspath(proc.info['exe']).lower() == file_path:
-                        return True
-                    
-                    # 检查打开的文件
-                    files = proc.info.get('open_files')
-                    if files:
-                        for f in files:
-                            if os.path.abspath(f.path).lower() == file_path:
-                                return True
-                except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
-                    continue
-            return False
+            return bool(self.get_open_file_index().pids_for(file_path))
         except Exception as e:
             if self.worker:
                 self.worker.log(f"检查文件是否运行时出错: {e}")
@@ -1986,49 +2792,42 @@ class DiskCleanerApp(QMainWindow):
     def kill_processes_using_file(self, file_path):
         """结束使用指定文件的进程"""
         try:
-            file_path = os.path.abspath(file_path).lower()
-            killed = False
-            
-            for proc in psutil.process_iter(['pid', 'name', 'exe', 'open_files']):
-                try:
-                    pid = proc.pid
-                    name = proc.info.get('name', '未知进程')
-                    
-                    # 跳过系统关键进程
-                    if name.lower() in ['system', 'svchost.exe', 'explorer.exe', 'wininit.exe', 'csrss.exe']:
-                        continue
-                    
-                    # 检查可执行文件本身
-                    exe_path = proc.info.get('exe')
-                    if exe_path and os.path.abspath(exe_path).lower() == file_path:
-                        proc.kill()
-                        if self.worker:
-                            self.worker.log(f"已结束进程 {pid} ({name}) 使用文件: {file_path}")
-                        killed = True
-                        continue
-                    
-                    # 检查打开的文件
-                    files = proc.info.get('open_files')
-                    if files:
-                        for f in files:
-                            if os.path.abspath(f.path).lower() == file_path:
-                                proc.kill()
-                                if self.worker:
-                                    self.worker.log(f"已结束进程 {pid} ({name}) 使用文件: {file_path}")
-                                killed = True
-                                break
-                except (psutil.AccessDenied, psutil.NoSuchProcess):
-                    continue
-                except Exception as e:
-                    if self.worker:
-                        self.worker.log(f"结束进程 {pid} 时出错: {e}")
-            
-            return killed
+            index = self.get_open_file_index()
+            return self.kill_processes(index.pids_for(file_path), file_path)
         except Exception as e:
             if self.worker:
                 self.worker.log(f"结束进程时出错: {e}")
             return False
 
+    def kill_processes(self, pids, file_path):
+        """结束指定的进程（跳过系统关键进程），并从打开文件索引中移除"""
+        index = self.get_open_file_index()
+        killed_pids = set()
+        exited_pids = set()
+        for pid in pids:
+            name = index.process_name(pid)
+            
+            # 跳过系统关键进程
+            if name.lower() in CRITICAL_PROCESSES:
+                continue
+            
+            try:
+                psutil.Process(pid).kill()
+                killed_pids.add(pid)
+                if self.worker:
+                    self.worker.log(f"已结束进程 {pid} ({name}) 使用文件: {file_path}")
+            except psutil.NoSuchProcess:
+                # 进程已退出，不再占用文件
+                exited_pids.add(pid)
+            except psutil.AccessDenied:
+                continue
+            except Exception as e:
+                if self.worker:
+                    self.worker.log(f"结束进程 {pid} 时出错: {e}")
+        
+        index.discard_pids(killed_pids | exited_pids)
+        return bool(killed_pids)
+
     def unlock_file(self, file_path):
         """使用特殊技术解除文件锁定"""
         try:
@@ -2049,187 +2848,247 @@ class DiskCleanerApp(QMainWindow):
                 self.worker.log(f"解除文件锁定时出错: {e}")
             return False
 
+    def find_handle_exe(self):
+        """查找handle.exe（优先使用tools目录，其次是临时目录中的工具）"""
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        tools_dir = os.path.join(base_dir, "tools")
+        if not os.path.exists(tools_dir):
+            tools_dir = os.path.join(os.environ['TEMP'], "adsCleanerTools")
+        
+        for name in ("handle.exe", "handle64.exe"):
+            handle_exe = os.path.join(tools_dir, name)
+            if os.path.exists(handle_exe):
+                return handle_exe
+        return None
+
+    def get_handle_index(self):
+        """获取本次运行的句柄索引，未找到handle.exe时返回None"""
+        with self.force_state_lock:
+            if self.handle_index is None:
+                handle_exe = self.find_handle_exe()
+                if not handle_exe:
+                    return None
+                self.handle_index = HandleIndex(handle_exe, scope=HANDLE_CONFIG["scope"])
+            return self.handle_index
+
+    def close_handles(self, entries):
+        """批量关闭句柄并记录日志，返回是否关闭了至少一个句柄"""
+        closed = self.handle_index.close(entries)
+        for entry in closed:
+            self.worker.log(f"已关闭句柄 {entry.handle} ({entry.process} {entry.pid}): {entry.path}")
+        return bool(closed)
+
     def try_unlock_with_handle(self, file_path):
         """使用Sysinternals的handle.exe解除文件锁定"""
         try:
-            # 检查handle.exe是否可用
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            tools_dir = os.path.join(base_dir, "tools")
-            if not os.path.exists(tools_dir):
-                tools_dir = os.path.join(os.environ['TEMP'], "adsCleanerTools")
-            
-            handle_exe = os.path.join(tools_dir, "handle.exe")
-            
-            if not os.path.exists(handle_exe):
-                # 尝试64位版本
-                handle_exe = os.path.join(tools_dir, "handle64.exe")
-            
-            if not os.path.exists(handle_exe):
+            index = self.get_handle_index()
+            if index is None:
                 self.worker.log("未找到handle.exe，跳过此方法")
                 return False
             
             self.worker.log(f"使用handle.exe解除文件锁定: {file_path}")
             
-            # 查找文件句柄
-            result = subprocess.run(
-                [handle_exe, '-accepteula', file_path],
-                capture_output=True,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            
-            if result.returncode != 0:
-                self.worker.log(f"handle.exe执行失败: {result.stderr}")
-                return False
-                
-            if "No matching handles found" in result.stdout:
+            # 查找文件句柄（同一目录只运行一次handle.exe）
+            entries = index.handles_for(file_path)
+            if not entries:
                 self.worker.log("未找到匹配的文件句柄")
                 return False
-                
+            
             # 关闭所有相关句柄
-            subprocess.run(
-                [handle_exe, '-accepteula', '-c', file_path, '-y'],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            if not self.close_handles(entries):
+                return False
             self.worker.log("已使用handle.exe关闭文件句柄")
             return True
         except Exception as e:
             self.worker.log(f"使用handle.exe解锁失败: {e}")
             return False
 
-    def force_delete_directory(self, dir_path):
-        """强制删除目录 - 使用IRP操作"""
-        if self.worker and self.worker.is_canceled:
-            return
-        
+    def unlock_directory_handles(self, dir_path):
+        """一次查询并关闭目录下所有文件的句柄"""
         try:
+            index = self.get_handle_index()
+            if index is None:
+                return False
+            entries = index.handles_under(dir_path)
+            return bool(entries) and self.close_handles(entries)
+        except Exception as e:
             if self.worker:
-                self.worker.log(f"【强力模式】尝试强制删除目录: {dir_path}")
-            
-            # 先删除目录内容
-            for root, dirs, files in os.walk(dir_path, topdown=False):
-                for name in files:
-                    if self.worker and self.worker.is_canceled:
-                        return
-                    file_path = os.path.join(root, name)
-                    self.force_delete_file(file_path)
-                    
-                    # 发送心跳信号，防止假死
-                    if self.worker:
-                        self.worker.heartbeat.emit()
-                
-                for name in dirs:
-                    if self.worker and self.worker.is_canceled:
-                        return
-                    subdir_path = os.path.join(root, name)
-                    self.force_delete_directory(subdir_path)
-                    
-                    # 发送心跳信号，防止假死
-                    if self.worker:
-                        self.worker.heartbeat.emit()
-            
-            # 然后删除目录本身
-            try:
-                # 使用IRP删除目录
-                handle = win32file.CreateFile(
-                    dir_path,
-                    win32file.GENERIC_WRITE,
-                    win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
-                    None,
-                    win32file.OPEN_EXISTING,
-                    win32file.FILE_FLAG_BACKUP_SEMANTICS | win32file.FILE_FLAG_OPEN_REPARSE_POINT,
-                    None
-                )
+                self.worker.log(f"使用handle.exe解锁目录失败: {dir_path} - {e}")
+            return False
+
+    def get_force_delete_batch(self):
+        """获取本次运行的命令行批量删除队列"""
+        with self.force_state_lock:
+            if self.force_delete_batch is None:
+                base_dir = os.path.dirname(os.path.abspath(__file__))
+                tools_dir = os.path.join(base_dir, "tools")
+                if not os.path.exists(tools_dir):
+                    tools_dir = os.path.join(os.environ['TEMP'], "adsCleanerTools")
                 
-                # 设置目录删除标志
-                delete_flag = ctypes.c_byte(1)  # 1表示删除目录
+                # 有psexec时以SYSTEM权限运行脚本
+                launcher = []
+                psexec_path = os.path.join(tools_dir, "PsExec64.exe" if sys.maxsize > 2**32 else "PsExec.exe")
+                if os.path.exists(psexec_path):
+                    launcher = [psexec_path, '-accepteula', '-s']
                 
-                # 调用Windows API设置删除标志
-                result = SetFileInformationByHandle(
-                    handle.handle,  # 获取底层HANDLE
-                    FileDispositionInfo,
-                    ctypes.byref(delete_flag),
-                    ctypes.sizeof(delete_flag)
+                self.force_delete_batch = ForceDeleteBatch(
+                    launcher=launcher,
+                    shard_size=FORCE_BATCH_CONFIG["shard_size"],
+                    timeout=FORCE_BATCH_CONFIG["timeout"]
                 )
-                
-                if not result:
-                    error_code = ctypes.windll.kernel32.GetLastError()
-                    raise ctypes.WinError(error_code)
-                
-                win32file.CloseHandle(handle)
+            return self.force_delete_batch
+
+    def finish_force_mode(self):
+        """强力模式收尾：处理剩余的重试项，执行批量命令行删除并记录统计"""
+        if self.worker and self.worker.canceled:
+            # 用户取消时不再执行批量删除或设置重启后删除，排队的项直接丢弃
+            pending = (len(self.retry_queue) if self.retry_queue is not None else 0,
+                       len(self.force_delete_batch) if self.force_delete_batch is not None else 0)
+            if any(pending):
+                self.worker.log(f"清理已取消，丢弃 {pending[0]} 个待重试项和 {pending[1]} 个待批量删除项")
+            self.reset_run_state()
+            return
+        if self.retry_queue is not None:
+            exhausted = self.retry_queue.drain(is_canceled=lambda: self.worker and self.worker.is_canceled)
+            # 重试仍然失败的文件交给命令行批量删除，最终失败的才设置为重启后删除
+            for file_path in exhausted:
+                self.get_force_delete_batch().add(file_path)
+            if self.worker:
+                self.worker.log(self.retry_queue.summary())
+        self.flush_force_delete_batch()
+        if self.strategy_cache is not None and self.worker:
+            self.worker.log(self.strategy_cache.summary())
+        if self.ownership is not None and self.worker:
+            self.worker.log(self.ownership.summary())
+
+    def flush_force_delete_batch(self):
+        """执行收集到的命令行删除，仍然失败的路径设置为重启后删除"""
+        batch = self.force_delete_batch
+        if batch is None or not len(batch):
+            return
+        
+        if self.worker:
+            self.worker.log(f"【强力模式】命令行批量删除 {len(batch)} 项")
+        results = batch.run(
+            is_canceled=lambda: self.worker and self.worker.is_canceled,
+            budget=self.worker.task_budget if self.worker else None
+        )
+        
+        for path, deleted in results.items():
+            if deleted:
+                if self.worker:
+                    self.worker.log(f"【强力模式】命令行强制删除成功: {path}")
+                continue
+            
+            if self.worker:
+                self.worker.log(f"【强力模式】命令行删除后仍存在: {path}")
+            # 重启后删除
+            try:
+                # 使用MoveFileEx设置重启后删除
+                MOVEFILE_DELAY_UNTIL_REBOOT = 0x4
+                if not ctypes.windll.kernel32.MoveFileExW(path, None, MOVEFILE_DELAY_UNTIL_REBOOT):
+                    raise ctypes.WinError()
                 if self.worker:
-                    self.worker.log(f"【强力模式】目录标记为删除: {dir_path}")
+                    self.worker.log(f"【强力模式】将在重启后删除: {path}")
+                self.failed_files.append((path, "将在系统重启后删除"))
             except Exception as e:
                 if self.worker:
-                    self.worker.log(f"【强力模式】IRP删除目录失败: {e}")
-                
-                # 方法2: 使用命令行强制删除（提权到SYSTEM）
-                try:
-                    # 创建批处理文件
-                    batch_content = f"""
-                    @echo off
-                    :loop
-                    takeown /f "{dir_path}" /r /d y >nul 2>&1
-                    icacls "{dir_path}" /grant administrators:F /t /c >nul 2>&1
-                    rd /s /q "{dir_path}" >nul 2>&1
-                    if exist "{dir_path}" (
-                        timeout /t 1 /nobreak >nul
-                        goto loop
-                    )
-                    """
-                    batch_path = os.path.join(os.environ['TEMP'], f"rd_{uuid.uuid4().hex[:8]}.bat")
-                    with open(batch_path, "w", encoding="gbk") as f:
-                        f.write(batch_content)
-                    
-                    # 使用psexec以SYSTEM权限运行
-                    base_dir = os.path.dirname(os.path.abspath(__file__))
-                    tools_dir = os.path.join(base_dir, "tools")
-                    if not os.path.exists(tools_dir):
-                        tools_dir = os.path.join(os.environ['TEMP'], "adsCleanerTools")
-                    
-                    psexec_path = os.path.join(tools_dir, "PsExec64.exe" if sys.maxsize > 2**32 else "PsExec.exe")
-                    
-                    if os.path.exists(psexec_path):
-                        # 以SYSTEM权限运行
-                        subprocess.run(f'"{psexec_path}" -accepteula -s -d cmd /c "{batch_path}"', shell=True, timeout=60)
-                    else:
-                        # 如果没有psexec，尝试直接运行
-                        subprocess.run(f'cmd /c "{batch_path}"', shell=True, timeout=60)
-                    
-                    os.unlink(batch_path)
-                    if self.worker:
-                        self.worker.log(f"【强力模式】命令行强制删除目录成功: {dir_path}")
-                except subprocess.TimeoutExpired:
-                    if self.worker:
-                        self.worker.log(f"【强力模式】命令行强制删除目录超时: {dir_path}")
-                    raise Exception("命令行强制删除目录超时")
-                except Exception as e2:
-                    if self.worker:
-                        self.worker.log(f"【强力模式】命令行强制删除目录失败: {e2}")
-                    
-                    # 方法3: 重启后删除
-                    try:
-                        # 使用MoveFileEx设置重启后删除
-                        MOVEFILE_DELAY_UNTIL_REBOOT = 0x4
-                        ctypes.windll.kernel32.MoveFileExW(dir_path, None, MOVEFILE_DELAY_UNTIL_REBOOT)
-                        if self.worker:
-                            self.worker.log(f"【强力模式】目录将在重启后删除: {dir_path}")
-                        self.failed_files.append((dir_path, "目录将在系统重启后删除"))
-                    except Exception as e3:
-                        if self.worker:
-                            self.worker.log(f"【强力模式】设置重启删除失败: {e3}")
-                        raise
+                    self.worker.log(f"【强力模式】设置重启删除失败: {path} - {e}")
+                self.failed_files.append((path, str(e)))
+
+    def force_delete_directory(self, dir_path):
+        """强制删除目录 - 整棵目录树只遍历一次，失败的条目在删除线程中走强制删除"""
+        if self.worker and self.worker.is_canceled:
+            return
+        
+        try:
+            if self.worker:
+                self.worker.log(f"【强力模式】尝试强制删除目录: {dir_path}")
+            
+            self.force_clear_tree(dir_path, remove_root=True)
         except Exception as e:
             error_msg = f"【强力模式】强制删除目录失败: {dir_path} - {e}"
             if self.worker:
                 self.worker.log(error_msg)
             self.failed_files.append((dir_path, str(e)))
-        finally:
-            # 发送心跳信号，防止假死
+
+    def force_clear_tree(self, path, remove_root=False):
+        """强力模式删除目录树：占用检查、句柄关闭和所有权按整棵树处理一次，
+        遍历交给并发删除引擎，失败的条目在工作线程中走强制删除"""
+        # 一次性结束占用目录内文件的进程，避免逐个文件查询
+        try:
+            locked = self.get_open_file_index().pids_under(path)
+            for locked_path, pids in locked.items():
+                self.kill_processes(pids, locked_path)
+        except Exception as e:
             if self.worker:
-                self.worker.heartbeat.emit()
+                self.worker.log(f"检查目录占用时出错: {path} - {e}")
+        
+        # 批量关闭仍然打开的文件句柄
+        self.unlock_directory_handles(path)
+        
+        # 删除整个目录时在目录范围获取一次所有权，代替逐个文件设置
+        if remove_root:
+            self.take_directory_ownership(path)
+        
+        # 与原先的强制删除目录一致，目录树内不再保护系统关键文件
+        engine = self.create_deletion_engine(force_mode=True, allow_system=True)
+        result = engine.clear_directory(path, remove_root=remove_root)
+        self.handle_delete_failures(path, result, True, remove_root)
+        if self.worker:
+            self.worker.log(f"【强力模式】清理完成 {path}: {result.summary()}")
+        return result
+
+    def force_delete_entry(self, path, kind, error):
+        """删除引擎的失败回调：强制删除文件或空目录，返回条目是否已不存在"""
+        if kind == 'f':
+            self.force_delete_file(path)
+        else:
+            self.force_remove_directory(path)
+        # 顺便处理已到期的延迟重试
+        self.process_due_retries()
+        return not os.path.lexists(path)
+
+    def force_remove_directory(self, dir_path):
+        """强制删除（内容已清空的）目录本身 - 使用IRP操作，失败时交给命令行批量删除"""
+        try:
+            # 使用IRP删除目录
+            handle = win32file.CreateFile(
+                dir_path,
+                win32file.GENERIC_WRITE,
+                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
+                None,
+                win32file.OPEN_EXISTING,
+                win32file.FILE_FLAG_BACKUP_SEMANTICS | win32file.FILE_FLAG_OPEN_REPARSE_POINT,
+                None
+            )
+            
+            # 设置目录删除标志
+            delete_flag = ctypes.c_byte(1)  # 1表示删除目录
+            
+            # 调用Windows API设置删除标志
+            result = SetFileInformationByHandle(
+                handle.handle,  # 获取底层HANDLE
+                FileDispositionInfo,
+                ctypes.byref(delete_flag),
+                ctypes.sizeof(delete_flag)
+            )
+            
+            if not result:
+                error_code = ctypes.windll.kernel32.GetLastError()
+                raise ctypes.WinError(error_code)
+            
+            win32file.CloseHandle(handle)
+            if self.worker:
+                self.worker.log(f"【强力模式】目录标记为删除: {dir_path}")
+        except Exception as e:
+            if self.worker:
+                self.worker.log(f"【强力模式】IRP删除目录失败: {e}")
+            
+            # 方法2: 使用命令行强制删除（提权到SYSTEM），收集后按目录批量执行
+            self.get_force_delete_batch().add(dir_path, is_dir=True)
+            if self.worker:
+                self.worker.log(f"【强力模式】已加入命令行批量删除: {dir_path}")
 
     def clean_prefetch(self, force_mode=False):
         """清理预读取文件（需要特殊处理）"""
@@ -2437,31 +3296,42 @@ class DiskCleanerApp(QMainWindow):
         """清理完成处理"""
         self.clean_btn.setEnabled(True)
         self.cancel_btn.setEnabled(False)
+        self.budget_timer.stop()
+        self.budget_label.setText("")
+        self.progress_timer.stop()
+        self.update_progress_display()
+        if self.worker:
+            self.status_label.setText("清理已取消!" if self.worker.canceled else "清理完成!")
         
-        # 更新磁盘空间统计
-        self.disk_space_widget.update_cleaned_space()
+        # 更新磁盘空间统计（本次清理量来自删除时累加的文件大小）
+        self.disk_space_widget.update_disk_space()
+        if self.worker:
+            self.disk_space_widget.show_cleaned_space(self.worker.freed)
         
         # 更新日志对话框标题
         if self.log_dialog:
             self.log_dialog.setWindowTitle("清理日志 - 已完成")
         
-        # 收集并显示日志
-        logs = ""
+        # 把无法清理的文件写入运行日志，报告直接从日志文件读取
+        journal = self.worker.journal if self.worker else None
         if self.worker:
-            logs = self.worker.get_logs()
-        
-        # 如果有失败的文件，添加到日志
-        if self.failed_files:
-            logs += "\n\n无法清理的文件:\n"
+            # 因时间预算耗尽而跳过的项同样列入报告
+            self.failed_files.extend(self.worker.skipped)
+        if journal is not None:
             for file_path, reason in self.failed_files:
-                logs += f"- {file_path}: {reason}\n"
-            
+                journal.write("ERROR", "无法清理: %s: %s", file_path, reason, action="unclean", path=file_path)
             if any("将在系统重启后删除" in r for _, r in self.failed_files):
-                logs += "\n注意: 部分文件将在系统重启后删除"
-        
-        # 在日志对话框中显示最终结果
+                journal.write("WARNING", "注意: 部分文件将在系统重启后删除")
+            
+            # 最终结果同样写入日志，在日志对话框中显示
+            journal.write("INFO", "=" * 50)
+            journal.write("INFO", "清理完成!")
+            if self.failed_files:
+                journal.write("INFO", "无法清理 %d 项", len(self.failed_files))
+            journal.write("INFO", "完整日志: %s", journal.path)
+            journal.close()
         if self.log_dialog:
-            self.log_dialog.text_edit.append("\n\n" + "="*50 + "\n清理完成!\n" + "="*50)
+            self.log_dialog.append_log()
         
         # 重置强力模式状态
         self.force_mode_activated = False
@@ -2483,7 +3353,7 @@ class DiskCleanerApp(QMainWindow):
     
     def show_warning(self, msg):
         """显示警告信息"""
-        self.status_label.setText(f"警告: {msg}")
+        self.warning_label.setText(f"警告: {msg}")
 
     def show_about(self):
         """显示关于对话框"""
@@ -0,0 +1,29 @@
+"""SizeEstimator 预统计：多路径分类"""
+from clean_engine import SizeEstimator
+
+
+def _tree(root, count, size=100):
+    root.mkdir()
+    for i in range(count):
+        (root / f"{i}.tmp").write_bytes(b"x" * size)
+    return str(root)
+
+
+def test_category_with_several_paths(tmp_path):
+    first, second = _tree(tmp_path / "a", 2), _tree(tmp_path / "b", 3)
+    estimator = SizeEstimator({"Office": [first, second], "单路径": first}, track_links=False)
+    results = estimator.run()
+    assert set(results["Office"]) == {first, second}
+    totals = estimator.totals()
+    assert (totals["Office"].files, totals["Office"].bytes) == (5, 500)
+    assert (totals["单路径"].files, totals["单路径"].bytes) == (2, 200)
+
+
+def test_nested_path_lists_are_flattened(tmp_path):
+    # 界面中多路径分类的任务路径可能是 [[a, b]]
+    first, second = _tree(tmp_path / "a", 2), _tree(tmp_path / "b", 3)
+    estimator = SizeEstimator({0: [[first, second]], 1: [first, None]})
+    estimator.run()
+    totals = estimator.totals()
+    assert totals[0].files == 5
+    assert set(estimator.results[1]) == {first}
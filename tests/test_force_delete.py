@@ -0,0 +1,95 @@
+"""强力模式批处理删除：脚本生成、结果解析，以及用替身 runner 模拟执行"""
+import os
+import re
+import time
+
+from clean_engine import CommandResult, ForceDeleteBatch, TimeBudget
+
+
+class ScriptRunner:
+    """替身 runner：不启动 cmd，按脚本中的路径是否在 deleted 中写结果文件"""
+    def __init__(self, deleted=(), fail=False):
+        self.deleted = set(deleted)
+        self.fail = fail
+        self.scripts = []
+
+    def run(self, args, timeout=None):
+        with open(args[-1], encoding="utf-8", newline="") as f:
+            script = f.read()
+        self.scripts.append((args, script))
+        if self.fail:
+            raise TimeoutError("script timed out")
+        result_path = re.search(r'^type nul > "(.+)"\r$', script, re.M).group(1)
+        lines = []
+        for line in script.split("\r\n"):
+            match = re.match(r'^if exist "(.+)" \(.*echo FAIL (\d+)\)', line)
+            if match:
+                path = match.group(1).replace("%%", "%")
+                lines.append(f"{'OK' if path in self.deleted else 'FAIL'} {match.group(2)}")
+        with open(result_path, "w", encoding="utf-8") as f:
+            f.write("\r\n".join(lines) + "\r\n")
+        return CommandResult(0, "", "")
+
+
+def test_render_script_quotes_and_escapes():
+    script = ForceDeleteBatch.render_script(
+        [("C:\\Temp\\100%.tmp", False), ("C:\\Temp\\sub dir", True)], "C:\\Temp\\r.txt")
+    lines = script.split("\r\n")
+    assert lines[:3] == ["@echo off", "chcp 65001 >nul", 'type nul > "C:\\Temp\\r.txt"']
+    assert 'del /f /q /a "C:\\Temp\\100%%.tmp" >nul 2>&1' in lines
+    assert 'rd /s /q "C:\\Temp\\sub dir" >nul 2>&1' in lines
+    assert ('if exist "C:\\Temp\\sub dir" (>>"C:\\Temp\\r.txt" echo FAIL 1) '
+            'else (>>"C:\\Temp\\r.txt" echo OK 1)') in lines
+    assert script.endswith("\r\n")
+
+
+def test_parse_results_missing_and_garbage_lines():
+    items = [("a", False), ("b", False), ("c", True)]
+    text = "OK 0\r\nFAIL 1\r\nOK 7\r\nnoise\r\n"
+    assert ForceDeleteBatch.parse_results(text, items) == {"a": True, "b": False, "c": False}
+
+
+def test_shards_children_first_and_split(tmp_path):
+    batch = ForceDeleteBatch(shard_size=2)
+    sub = tmp_path / "sub"
+    for path, is_dir in [(tmp_path / "sub", True), (tmp_path / "x", False),
+                         (sub / "1", False), (sub / "2", False), (sub / "3", False)]:
+        batch.add(str(path), is_dir)
+    batch.add(str(tmp_path / "x"))
+    assert len(batch) == 5
+    shards = batch.shards()
+    assert [len(shard) for shard in shards] == [2, 1, 2]
+    assert {path for path, _ in shards[0] + shards[1]} == {str(sub / n) for n in "123"}
+    # 同一目录中文件排在子目录之前
+    assert shards[2] == [(str(tmp_path / "x"), False), (str(sub), True)]
+
+
+def test_run_collects_results_and_cleans_up(tmp_path):
+    paths = [str(tmp_path / name) for name in ("a.tmp", "b.tmp", "c%1.tmp")]
+    runner = ScriptRunner(deleted=paths[::2])
+    batch = ForceDeleteBatch(runner=runner, launcher=["psexec", "-s"], script_dir=str(tmp_path))
+    for path in paths:
+        batch.add(path)
+    assert batch.run() == {paths[0]: True, paths[1]: False, paths[2]: True}
+    assert len(batch) == 0
+    assert len(runner.scripts) == 1
+    assert runner.scripts[0][0][:4] == ["psexec", "-s", "cmd", "/c"]
+    # 脚本和结果文件都已删除
+    assert os.listdir(tmp_path) == []
+
+
+def test_run_failure_and_canceled(tmp_path):
+    batch = ForceDeleteBatch(runner=ScriptRunner(fail=True), script_dir=str(tmp_path))
+    batch.add(str(tmp_path / "a.tmp"))
+    assert batch.run() == {str(tmp_path / "a.tmp"): False}
+    assert os.listdir(tmp_path) == []
+
+    runner = ScriptRunner()
+    batch = ForceDeleteBatch(runner=runner, script_dir=str(tmp_path))
+    batch.add(str(tmp_path / "b.tmp"))
+    assert batch.run(is_canceled=lambda: True) == {str(tmp_path / "b.tmp"): False}
+    batch.add(str(tmp_path / "c.tmp"))
+    budget = TimeBudget(0.001)
+    time.sleep(0.01)
+    assert batch.run(budget=budget) == {str(tmp_path / "c.tmp"): False}
+    assert runner.scripts == []
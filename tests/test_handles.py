@@ -0,0 +1,149 @@
+"""handle.exe 输出解析和 HandleIndex（使用录制的 handle.exe 输出和替身 CommandRunner）"""
+import os
+import threading
+import time
+
+import pytest
+
+from clean_engine import CommandResult, HandleEntry, HandleIndex, parse_handle_output
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# 录制输出时 handle.exe 查询的目录
+CAPTURED_ROOT = "C:\\Temp\\cache"
+
+
+def load_fixture(name, root=None):
+    """读取录制的输出；给出 root 时把录制目录换成本机目录，路径分隔符换成本机分隔符"""
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        text = f.read()
+    if root is not None:
+        text = text.replace(CAPTURED_ROOT, str(root)).replace("\\", os.sep)
+    return text
+
+
+class StubRunner:
+    """按调用顺序返回预置结果的 CommandRunner 替身，记录收到的命令"""
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def run(self, args, timeout=None):
+        self.calls.append(list(args))
+        if not self.results:
+            return CommandResult(0, "", "")
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class StubCloser:
+    """HandleCloser 替身：只能关闭 closable 中的 (pid, 句柄)"""
+    def __init__(self, closable=()):
+        self.closable = set(closable)
+        self.calls = []
+
+    def close(self, pid, handles):
+        self.calls.append((pid, list(handles)))
+        return [handle for handle in handles if (pid, handle) in self.closable]
+
+
+def test_parse_directory_output():
+    entries = parse_handle_output(load_fixture("handle_directory.txt"))
+    assert entries == [
+        HandleEntry("chrome.exe", 1234, "1A4", "C:\\Temp\\cache\\a.tmp"),
+        HandleEntry("chrome.exe", 1234, "1B0", "C:\\Temp\\cache\\sub\\b.log"),
+        HandleEntry("explorer.exe", 5678, "2C8", "C:\\Temp\\cache\\a.tmp"),
+        HandleEntry("Code Helper.exe", 9012, "D4", "C:\\Temp\\cache\\my files\\c.dat"),
+    ]
+
+
+def test_parse_output_with_user_column():
+    entries = parse_handle_output(load_fixture("handle_all_users.txt"))
+    assert [(e.process, e.pid, e.handle) for e in entries] == [
+        ("System", 4, "1F0"), ("svchost.exe", 1520, "5A0"), ("chrome.exe", 1234, "1A4")]
+    assert entries[1].path == "C:\\Windows\\System32\\LogFiles\\e.log"
+
+
+def test_parse_no_match():
+    assert parse_handle_output(load_fixture("handle_no_match.txt")) == []
+
+
+def test_index_runs_handle_once_per_directory(tmp_path):
+    runner = StubRunner(CommandResult(0, load_fixture("handle_directory.txt", tmp_path), ""))
+    index = HandleIndex("handle.exe", runner=runner)
+    assert [e.pid for e in index.handles_for(tmp_path / "a.tmp")] == [1234, 5678]
+    assert [e.handle for e in index.handles_for(tmp_path / "sub" / "b.log")] == ["1B0"]
+    assert index.handles_for(tmp_path / "missing.tmp") == []
+    assert len(index.handles_under(tmp_path)) == 4
+    assert index.lookups == 1
+    assert runner.calls == [["handle.exe", "-accepteula", "-nobanner", os.path.normcase(str(tmp_path))]]
+
+
+def test_index_run_scope_lists_all_handles_once(tmp_path):
+    runner = StubRunner(CommandResult(0, load_fixture("handle_all_users.txt", tmp_path), ""))
+    index = HandleIndex("handle.exe", runner=runner, scope="run")
+    assert [e.pid for e in index.handles_for(tmp_path / "d.etl")] == [4]
+    assert [e.pid for e in index.handles_under(tmp_path)] == [4, 1234]
+    index.handles_for(tmp_path / "other" / "x.tmp")
+    assert index.lookups == 1
+    assert runner.calls == [["handle.exe", "-accepteula", "-nobanner"]]
+
+
+def test_index_no_match_is_not_an_error(tmp_path):
+    runner = StubRunner(CommandResult(1, load_fixture("handle_no_match.txt"), ""))
+    index = HandleIndex("handle.exe", runner=runner)
+    assert index.handles_under(tmp_path) == []
+    assert index.lookups == 1
+
+
+def test_index_failure_raises(tmp_path):
+    runner = StubRunner(CommandResult(2, "", "Initialization error"))
+    index = HandleIndex("handle.exe", runner=runner)
+    with pytest.raises(RuntimeError, match="Initialization error"):
+        index.handles_under(tmp_path)
+
+
+def test_close_removes_closed_handles(tmp_path):
+    runner = StubRunner(CommandResult(0, load_fixture("handle_directory.txt", tmp_path), ""))
+    index = HandleIndex("handle.exe", runner=runner, closer=StubCloser())
+    entries = index.handles_for(tmp_path / "a.tmp")
+    # chrome.exe 的句柄关闭成功，explorer.exe 的失败
+    runner.results = [CommandResult(0, "", ""), CommandResult(1, "", "Access is denied")]
+    closed = index.close(entries + entries[:1])
+    assert [e.pid for e in closed] == [1234]
+    assert [e.pid for e in index.handles_for(tmp_path / "a.tmp")] == [5678]
+    assert index.lookups == 1
+
+
+def test_close_batches_per_pid(tmp_path):
+    runner = StubRunner(CommandResult(0, load_fixture("handle_directory.txt", tmp_path), ""))
+    closer = StubCloser({(1234, "1A4"), (1234, "1B0")})
+    index = HandleIndex("handle.exe", runner=runner, closer=closer)
+    entries = index.handles_under(tmp_path)
+    # closer 关闭不了的句柄才交给 handle.exe
+    runner.results = [CommandResult(0, "", ""), CommandResult(1, "", "Access is denied")]
+    closed = index.close(entries)
+    assert sorted(closer.calls) == [(1234, ["1A4", "1B0"]), (5678, ["2C8"]), (9012, ["D4"])]
+    assert [call[3:7] for call in runner.calls[1:]] == [["-c", "2C8", "-p", "5678"], ["-c", "D4", "-p", "9012"]]
+    assert sorted((e.pid, e.handle) for e in closed) == [(1234, "1A4"), (1234, "1B0"), (5678, "2C8")]
+    assert [e.pid for e in index.handles_under(tmp_path)] == [9012]
+
+
+def test_concurrent_lookups_run_handle_once(tmp_path):
+    class SlowRunner(StubRunner):
+        def run(self, args, timeout=None):
+            time.sleep(0.05)
+            return super().run(args, timeout)
+
+    runner = SlowRunner(CommandResult(0, load_fixture("handle_directory.txt", tmp_path), ""))
+    index = HandleIndex("handle.exe", runner=runner)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(len(index.handles_under(tmp_path))))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [4, 4, 4, 4]
+    assert len(runner.calls) == 1
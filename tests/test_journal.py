@@ -0,0 +1,36 @@
+"""运行日志的写入、索引和筛选"""
+from clean_engine import JournalIndex, RunJournal
+
+
+def _journal(tmp_path, records):
+    journal = RunJournal(str(tmp_path / "run.jsonl"), level="DEBUG")
+    for level, msg, path in records:
+        journal.write(level, msg, path=path)
+    journal.close()
+    index = JournalIndex(journal.path)
+    index.refresh()
+    return index
+
+
+def test_filter_matches_escaped_paths(tmp_path):
+    index = _journal(tmp_path, [
+        ("INFO", "已删除文件", "C:\\Temp\\Cache\\a.tmp"),
+        ("WARNING", "删除失败", "C:\\Temp\\other\\b.tmp"),
+        ("INFO", '名称含"引号"', "D:\\x\\\"q\".log"),
+    ])
+    assert list(index.filter(path_substring="temp\\cache")) == [0]
+    assert list(index.filter(path_substring="C:\\TEMP")) == [0, 1]
+    assert list(index.filter(path_substring='"q"')) == [2]
+    assert list(index.filter(min_level="WARNING", path_substring="\\temp\\")) == [1]
+    index.close()
+
+
+def test_filter_non_ascii_ignores_case(tmp_path):
+    index = _journal(tmp_path, [
+        ("INFO", "已删除文件", "C:\\Users\\Äsa\\临时\\a.tmp"),
+        ("INFO", "已删除文件", "C:\\Users\\bob\\a.tmp"),
+    ])
+    assert list(index.filter(path_substring="äsa\\临时")) == [0]
+    assert list(index.filter(path_substring="临时")) == [0]
+    assert list(index.filter(start=1)) == [1]
+    index.close()
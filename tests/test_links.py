@@ -0,0 +1,111 @@
+"""硬链接去重：LinkTracker、SizeEstimator 跨分类统计和 DeletionEngine 释放字节数"""
+import os
+
+import pytest
+
+from clean_engine import DeletionEngine, LinkTracker, SizeEstimator
+
+SIZE = 10000
+
+
+def _write(path, size=SIZE):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+
+
+@pytest.fixture
+def linked(tmp_path):
+    """a/data 和 b/data 是同一个文件的两个硬链接，a/single 只有一个链接"""
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+    _write(first / "data")
+    _write(first / "single", 100)
+    try:
+        os.link(first / "data", second / "data")
+    except (OSError, NotImplementedError) as e:
+        pytest.skip(f"文件系统不支持硬链接: {e}")
+    return first, second
+
+
+def test_tracker_counts_last_link_only(linked):
+    first, second = linked
+    tracker = LinkTracker()
+    st_a = tracker.identify(os.lstat(first / "data"), str(first / "data"))
+    st_b = tracker.identify(os.lstat(second / "data"), str(second / "data"))
+    assert st_a.st_nlink == 2
+    assert tracker.release(st_a) is False
+    assert len(tracker) == 1
+    assert tracker.release(st_b) is True
+    assert len(tracker) == 0
+
+
+def test_tracker_single_link_not_registered(linked):
+    first, _ = linked
+    tracker = LinkTracker()
+    assert tracker.release(os.lstat(first / "single")) is True
+    assert len(tracker) == 0
+
+
+def test_tracker_full_table_underreports(linked):
+    first, second = linked
+    tracker = LinkTracker(max_entries=0)
+    assert tracker.release(os.lstat(first / "data")) is False
+    assert tracker.release(os.lstat(second / "data")) is False
+    assert tracker.untracked == 2
+
+
+def test_estimator_dedups_across_categories(linked):
+    first, second = linked
+    estimator = SizeEstimator({"A": [str(first)], "B": [str(second)]})
+    estimator.run()
+    totals = estimator.totals()
+    assert totals["A"].files + totals["B"].files == 3
+    assert totals["A"].bytes + totals["B"].bytes == SIZE + 100
+
+
+def test_estimator_without_links_counts_every_link(linked):
+    first, second = linked
+    estimator = SizeEstimator({"A": [str(first)], "B": [str(second)]}, track_links=False)
+    estimator.run()
+    totals = estimator.totals()
+    assert totals["A"].bytes + totals["B"].bytes == 2 * SIZE + 100
+
+
+def test_deletion_freed_bytes_counts_last_link(linked):
+    first, second = linked
+    links = LinkTracker()
+    engine = DeletionEngine(max_workers=2, links=links)
+    result = engine.clear_directory(str(first))
+    # b/data 仍然存在，a/data 的空间并未释放
+    assert result.files_deleted == 2
+    assert result.bytes_deleted == 100
+    result = engine.clear_directory(str(second))
+    assert result.files_deleted == 1
+    assert result.bytes_deleted == SIZE
+    assert not os.listdir(first) and not os.listdir(second)
+
+
+def test_deletion_without_links_counts_st_size(linked):
+    first, _ = linked
+    result = DeletionEngine(max_workers=2).clear_directory(str(first))
+    assert result.bytes_deleted == SIZE + 100
+
+
+def test_tracker_resolves_unknown_link_count(linked):
+    # Windows 目录项的 st_ino/st_nlink/st_dev 均为0，需要用 lstat 补全后才能去重
+    first, second = linked
+    resolved = []
+
+    def resolve(path):
+        resolved.append(path)
+        return os.lstat(path)
+
+    tracker = LinkTracker(resolve=resolve)
+    results = []
+    for path in (str(first / "data"), str(second / "data")):
+        real = os.lstat(path)
+        blank = os.stat_result((real.st_mode, 0, 0, 0, 0, 0, real.st_size, 0, 0, 0))
+        results.append(tracker.release(tracker.identify(blank, path)))
+    assert resolved == [str(first / "data"), str(second / "data")]
+    assert results == [False, True]
@@ -0,0 +1,71 @@
+"""OwnershipManager：用记录调用的 SecurityBackend 替身验证缓存、目录覆盖和计数"""
+import os
+import threading
+
+from clean_engine import OwnershipManager, SecurityBackend
+
+
+class FakeBackend(SecurityBackend):
+    def __init__(self):
+        self.lookups = []
+        self.built = []
+        self.applied = []
+
+    def lookup_sid(self, username):
+        self.lookups.append(username)
+        return f"SID-{username}"
+
+    def build_descriptor(self, sid, inherit=False):
+        self.built.append((sid, inherit))
+        return (sid, inherit)
+
+    def apply(self, path, descriptor):
+        self.applied.append((path, descriptor[1]))
+
+
+def test_sid_and_descriptors_built_once(tmp_path):
+    backend = FakeBackend()
+    manager = OwnershipManager(backend, "tester")
+    for i in range(3):
+        manager.take(str(tmp_path / f"{i}.tmp"))
+    manager.take_directory(str(tmp_path / "a"))
+    manager.take_directory(str(tmp_path / "b"))
+    assert backend.lookups == ["tester"]
+    assert backend.built == [("SID-tester", False), ("SID-tester", True)]
+    assert manager.applied == 5 and manager.skipped == 0
+
+
+def test_directory_covers_direct_children_only(tmp_path):
+    backend = FakeBackend()
+    manager = OwnershipManager(backend, "tester")
+    root, sub = tmp_path / "root", tmp_path / "root" / "sub"
+    assert manager.take_directory(str(root)) is True
+    # 同一目录只处理一次
+    assert manager.take_directory(str(root)) is False
+    assert manager.take(str(root / "a.tmp")) is False
+    assert manager.take(str(root / "b.tmp")) is False
+    # 更深层的文件不在覆盖范围内，子目录本身仍需以继承方式处理
+    assert manager.take(str(sub / "c.tmp")) is True
+    assert manager.take_directory(str(sub)) is True
+    assert manager.take(str(sub / "d.tmp")) is False
+    assert backend.applied == [(str(root), True), (str(sub / "c.tmp"), False), (str(sub), True)]
+    assert (manager.applied, manager.skipped) == (3, 3)
+    assert manager.summary() == "所有权设置: 实际设置 3 次, 因目录已处理跳过 3 次"
+
+
+def test_counters_are_thread_safe(tmp_path):
+    manager = OwnershipManager(FakeBackend(), "tester")
+    manager.take_directory(str(tmp_path))
+
+    def work(index):
+        for i in range(200):
+            manager.take(str(tmp_path / f"{index}-{i}.tmp"))
+            manager.take(os.path.join(str(tmp_path), "other", f"{index}-{i}.tmp"))
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert manager.skipped == 800
+    assert manager.applied == 801
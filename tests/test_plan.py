@@ -0,0 +1,55 @@
+"""清理计划：生成、保存/加载，以及执行前的校验（计划后变化的条目不删除）"""
+import os
+
+from clean_engine import CleanupPlan, PlanBuilder, PlanExecutor
+
+
+def _write(path, data=b"x" * 100):
+    path.write_bytes(data)
+
+
+def _build(root):
+    return PlanBuilder({"缓存": [str(root)]}, max_workers=1).run()
+
+
+def test_changed_entries_are_not_deleted(tmp_path):
+    root = tmp_path / "cache"
+    (root / "sub").mkdir(parents=True)
+    for name in ("a.tmp", "b.tmp", "sub/c.tmp", "sub/d.tmp"):
+        _write(root / name)
+    plan = _build(root)
+    assert plan.totals()["缓存"].files == 4
+
+    # 生成计划后：b 的内容变化，d 只有修改时间变化，sub 中新增 e
+    _write(root / "b.tmp", b"y" * 200)
+    st = os.lstat(root / "sub" / "d.tmp")
+    os.utime(root / "sub" / "d.tmp", ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    _write(root / "sub" / "e.tmp")
+
+    items = []
+    result = PlanExecutor(plan, on_item=lambda path, action, detail: items.append((path, action))).run()
+
+    assert sorted(os.listdir(root)) == ["b.tmp", "sub"]
+    assert sorted(os.listdir(root / "sub")) == ["d.tmp", "e.tmp"]
+    assert result.deleted.files == 2 and result.deleted.bytes == 200
+    assert result.skipped["计划后已变化"] == 2
+    assert result.skipped["目录非空"] >= 1
+    assert result.failed == []
+    skipped = {path for path, action in items if action == "跳过"}
+    assert skipped == {str(root / "b.tmp"), str(root / "sub" / "d.tmp")}
+
+
+def test_missing_entries_and_saved_plan(tmp_path):
+    root = tmp_path / "cache"
+    root.mkdir()
+    _write(root / "a.tmp")
+    _write(root / "b.tmp")
+    plan_path = tmp_path / "plan.json"
+    _build(root).save(str(plan_path))
+    os.unlink(root / "a.tmp")
+
+    result = PlanExecutor(CleanupPlan.load(str(plan_path))).run()
+    assert result.skipped == {"已不存在": 1}
+    assert result.deleted.files == 1
+    assert result.freed["缓存"].bytes == 100
+    assert os.listdir(root) == []
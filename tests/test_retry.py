@@ -0,0 +1,40 @@
+"""RetryQueue：退避重试、次数上限和多线程计数"""
+import threading
+
+from clean_engine import RetryQueue
+
+
+def test_retry_until_success_or_exhausted():
+    attempts = {}
+
+    def process(item):
+        attempts[item] = attempts.get(item, 0) + 1
+        return item == "ok" and attempts[item] >= 2
+
+    retry = RetryQueue(process, base_delay=0, max_attempts=3)
+    retry.add("ok")
+    retry.add("bad")
+    assert retry.drain() == ["bad"]
+    assert attempts == {"ok": 2, "bad": 3}
+    assert (retry.retries, retry.succeeded) == (5, 1)
+    assert len(retry) == 0
+
+
+def test_counters_from_several_threads():
+    retry = RetryQueue(lambda item: True, base_delay=0)
+    for i in range(4000):
+        retry.add(i)
+    threads = [threading.Thread(target=retry.process_due) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (retry.retries, retry.succeeded) == (4000, 4000)
+
+
+def test_drain_canceled_returns_remaining():
+    retry = RetryQueue(lambda item: False, base_delay=60)
+    retry.add("a")
+    retry.add("b")
+    assert sorted(retry.drain(is_canceled=lambda: True)) == ["a", "b"]
+    assert retry.retries == 0
@@ -0,0 +1,48 @@
+"""StrategyCache：按 (错误类别, 目录) 记住成功的删除方法"""
+import errno
+
+from clean_engine import StrategyCache
+
+METHODS = ["irp", "movefile", "rename", "batch"]
+
+
+def test_classify():
+    assert StrategyCache.classify(PermissionError(errno.EACCES, "denied")) == f"PermissionError:{errno.EACCES}"
+    assert StrategyCache.classify(RuntimeError("x")) == "RuntimeError"
+
+
+def test_order_prefers_last_winner_per_directory():
+    cache = StrategyCache()
+    assert cache.order("PermissionError:13", "/a", METHODS) == (METHODS, None)
+    cache.record("PermissionError:13", "/a", "rename")
+
+    order, preferred = cache.order("PermissionError:13", "/a", METHODS)
+    assert order == ["rename", "irp", "movefile", "batch"]
+    assert preferred == "rename"
+    # 其他目录或其他错误类别不受影响
+    assert cache.order("PermissionError:13", "/b", METHODS) == (METHODS, None)
+    assert cache.order("OSError:32", "/a", METHODS) == (METHODS, None)
+    # 首选方法不在候选列表中时按原顺序
+    assert cache.order("PermissionError:13", "/a", ["irp", "batch"]) == (["irp", "batch"], None)
+
+
+def test_hit_and_miss_counters():
+    cache = StrategyCache()
+    cache.record("E", "/a", "irp")  # 没有首选方法：未命中
+    _, preferred = cache.order("E", "/a", METHODS)
+    cache.record("E", "/a", "irp", preferred)  # 首选方法成功：命中
+    _, preferred = cache.order("E", "/a", METHODS)
+    cache.record("E", "/a", "batch", preferred)  # 首选方法失败，其他方法成功：未命中并改记新方法
+    assert cache.order("E", "/a", METHODS)[1] == "batch"
+    assert (cache.hits, cache.misses, cache.lookups) == (1, 2, 3)
+    assert cache.summary() == "删除方法缓存: 命中 1 次, 未命中 2 次 (命中率 33%), 已学习 1 个目录/错误组合"
+
+
+def test_last_error_per_directory():
+    cache = StrategyCache()
+    assert cache.last_error("/a") is None
+    cache.note_error("/a", "OSError:32")
+    cache.note_error("/b", "PermissionError:5")
+    cache.note_error("/a", "PermissionError:5")
+    assert cache.last_error("/a") == "PermissionError:5"
+    assert cache.last_error("/b") == "PermissionError:5"